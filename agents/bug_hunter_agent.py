@@ -1,32 +1,45 @@
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.tools import tool
+# Heavy imports (langchain, Gemini) are deferred into `create_bug_hunter_agent`,
+# so importing this module is cheap. The executor is built on first use.
+import asyncio
+
+from agents.context import page_digest
+from agents.llm import create_llm
+from agents.registry import registry
+from agents.routing import ainvoke_agent, executor_limits
+from agents.tooling import make_tool
+from agents.tracing import console, is_verbose
 
 # --- 1. Import This Agent's Specific Tools ---
-# NOW IT HAS TWO TOOLS: ONE FOR HTML, ONE FOR CSS
-from tools.web_inspector import get_element_color, get_html_content
+# ONE TOOL TO FIND THE SELECTOR, ONE FOR CSS (AND A PAGE DIGEST AS A FALLBACK)
+from tools.web_inspector import find_element_selectors, get_element_color
+from tools.color_judge import judge_report
 
 # --- 2. Wrap the Tools for the Agent ---
-@tool
+# These are plain functions; they are turned into LangChain tools in the factory.
+def find_selector(element_description: str) -> str:
+    """
+    Finds the CSS selector for an element described in plain English
+    (e.g., 'Contact us button') and returns ranked candidates, best first.
+    Use this tool FIRST to find the selector.
+    """
+    console(f"\n--- [Bug-Hunter Tool] Finding selector for: {element_description} ---")
+    return find_element_selectors(element_description)
+
 def read_html_file() -> str:
     """
-    Reads and returns the entire content of the 'index.html' file.
-    Use this tool FIRST to inspect the HTML and find the
-    correct CSS selector for a given element.
+    Returns a digest of 'index.html': one line per visible or interactive element
+    (tag, id, classes, text). Only use this if `find_selector` could not find the element.
     """
-    print(f"\n--- [Bug-Hunter Tool] Reading index.html ---")
-    return get_html_content()
+    console(f"\n--- [Bug-Hunter Tool] Reading index.html ---")
+    return page_digest()
 
-@tool
 def inspect_element_color(selector_text: str) -> str:
     """
-    Finds a specific CSS rule by its selector (e.q., '.contact-button')
-    and returns its 'background-color' property.
+    Finds the element a CSS selector matches (e.q., '.contact-button') and returns
+    the 'background-color' it actually gets, plus the rule that set it.
     Use this tool SECOND, *after* you have found the selector.
     """
-    print(f"\n--- [Bug-Hunter Tool] Inspecting CSS for: {selector_text} ---")
+    console(f"\n--- [Bug-Hunter Tool] Inspecting CSS for: {selector_text} ---")
     return get_element_color(selector_text)
 
 
@@ -37,8 +50,9 @@ You are a "Bug-Hunter Agent." Your one and only job is to validate if a user's b
 
 You MUST use a 2-step process to find the bug:
 1.  **FIND SELECTOR:** The user's report is in plain English (e.g., "Contact us button").
-    You MUST call the `read_html_file` tool first to get the site's HTML.
-    Then, you must analyze this HTML to find the *exact* CSS selector for the element the user is describing.
+    You MUST call the `find_selector` tool first with the element the user is describing.
+    It returns ranked CSS selectors; use the top-ranked one.
+    Only if it finds nothing, call `read_html_file` and find the *exact* CSS selector in the page digest yourself.
 2.  **INSPECT COLOR:** After you have the selector, you MUST call the `inspect_element_color` tool with that selector.
 
 Finally, compare the user's claim with the tool's finding to make your judgment.
@@ -50,11 +64,11 @@ Finally, compare the user's claim with the tool's finding to make your judgment.
 
 EXAMPLE:
 - Bug Report: "The Contact us button is blue, it should be red."
-- Step 1 (Action): `read_html_file()`
-- Step 1 (Observation): (HTML content is returned...)
-- Step 1 (Thought): "The HTML for 'Contact Us' is `<button class="contact-button">`. The selector is `.contact-button`."
+- Step 1 (Action): `find_selector(element_description='Contact us button')`
+- Step 1 (Observation): "1. .contact-button (score 1.30) -> <button class="contact-button"> 'Contact Us'"
+- Step 1 (Thought): "The top-ranked selector is `.contact-button`."
 - Step 2 (Action): `inspect_element_color(selector_text='.contact-button')`
-- Step 2 (Observation): "Found color: #007bff"
+- Step 2 (Observation): "Found color: #007bff\nSet by: .contact-button in style.css"
 - Step 2 (Judgment): "VALIDATED. The user's report is accurate. The element .contact-button is #007bff (blue)."
 """
 
@@ -64,13 +78,16 @@ def create_bug_hunter_agent():
     """
     Factory function to create and return the Bug-Hunter Agent executor.
     """
-    print("Initializing Bug-Hunter Agent (v2)...") # Updated print
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate
+
+    console("Initializing Bug-Hunter Agent (v2)...") # Updated print
     
     # Use the model you've found to be stable
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite")
+    llm = create_llm("gemini-2.0-flash-lite", role="bug_hunter")
     
-    # *** IMPORTANT: Give the agent BOTH tools ***
-    tools = [read_html_file, inspect_element_color]
+    # *** IMPORTANT: Give the agent the selector finder, the inspector and the page-digest fallback ***
+    tools = [make_tool(find_selector), make_tool(inspect_element_color), make_tool(read_html_file, compact=False)]
     
     prompt = ChatPromptTemplate.from_messages(
         [
@@ -82,23 +99,55 @@ def create_bug_hunter_agent():
     
     agent = create_tool_calling_agent(llm, tools, prompt)
     
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=is_verbose(), name="bug_hunter_agent",
+                                   **executor_limits("bug_hunter"))
     
-    print("Bug-Hunter Agent (v2) is ready.")
+    console("Bug-Hunter Agent (v2) is ready.")
     return agent_executor
 
 # --- 5. Define the `run` function for the Triage Agent ---
-bug_hunter_executor = create_bug_hunter_agent()
+# The executor is built lazily by the registry the first time `run` is called.
+registry.register("bug_hunter", create_bug_hunter_agent)
+
+def __getattr__(name):
+    # Keeps `bug_hunter_agent.bug_hunter_executor` working, without eager construction.
+    if name == "bug_hunter_executor":
+        return registry.get("bug_hunter")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def run(bug_description: str) -> str:
     """
     The main entry point for the Bug-Hunter Agent.
     """
-    print(f"Bug-Hunter Agent (v2) received report: '{bug_description}'")
+    console(f"Bug-Hunter Agent (v2) received report: '{bug_description}'")
+    
+    # Plain color reports are judged by rule; the LLM agent only handles the rest
+    verdict = judge_report(bug_description)
+    if verdict is not None:
+        console(f"--- [Bug-Hunter Agent] Rule-based verdict (no LLM): {verdict} ---")
+        return verdict
+    
+    response = registry.get("bug_hunter").invoke({
+        "input": bug_description
+    })
+    
+    # Return just the final output string
+    return response['output']
+
+async def arun(bug_description: str) -> str:
+    """
+    The async entry point for the Bug-Hunter Agent (uses `ainvoke`).
+    """
+    console(f"Bug-Hunter Agent (v2) received report: '{bug_description}'")
+    
+    verdict = await asyncio.to_thread(judge_report, bug_description)
+    if verdict is not None:
+        console(f"--- [Bug-Hunter Agent] Rule-based verdict (no LLM): {verdict} ---")
+        return verdict
     
-    response = bug_hunter_executor.invoke({
+    response = await ainvoke_agent(registry.get("bug_hunter"), {
         "input": bug_description
     })
     
     # Return just the final output string
-    return response['output']
\ No newline at end of file
+    return response['output']
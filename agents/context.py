@@ -0,0 +1,147 @@
+import contextlib
+import contextvars
+import math
+import threading
+
+# --- 1. The Context Budget ---
+# Every tool observation stays in an agent's scratchpad for all of its later LLM
+# turns, so a big one is paid for again on every turn. Observations are kept under
+# a token budget: the page is sent as a digest of its elements instead of raw HTML,
+# and any other oversized observation is cut down to its head and tail.
+
+# About 4 characters per token, as for English text and code
+CHARS_PER_TOKEN = 4
+DEFAULT_CONTEXT_BUDGET = 1500
+
+_budget = DEFAULT_CONTEXT_BUDGET
+
+def estimate_tokens(text: str) -> int:
+    """
+    A rough token count of `text`.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def set_context_budget(max_tokens: int):
+    """
+    Sets the most tokens one tool observation may take. 0 turns compaction off
+    (the raw HTML and every observation are sent in full).
+    """
+    global _budget
+    _budget = max(0, int(max_tokens))
+
+def context_budget() -> int:
+    return _budget
+
+
+# --- 2. Recording What Compaction Saved ---
+
+class ContextSavings:
+    """
+    The tool observations compacted inside one `record_context_savings()` block
+    (or in the whole process), and the tokens that saved.
+    """
+    __slots__ = ("observations", "compacted", "tokens_in", "tokens_sent", "_lock")
+
+    def __init__(self):
+        self.observations = 0
+        self.compacted = 0
+        self.tokens_in = 0
+        self.tokens_sent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_sent
+
+    def add(self, original_tokens: int, sent_tokens: int):
+        with self._lock:
+            self.observations += 1
+            self.compacted += sent_tokens < original_tokens
+            self.tokens_in += original_tokens
+            self.tokens_sent += sent_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "observations": self.observations,
+                "compacted": self.compacted,
+                "tokens_in": self.tokens_in,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_in - self.tokens_sent,
+            }
+
+
+_totals = ContextSavings()
+_current_savings = contextvars.ContextVar("context_savings", default=None)
+
+@contextlib.contextmanager
+def record_context_savings():
+    """
+    Records the tokens compaction saved in the current pipeline (thread / task), e.g.:
+
+        with record_context_savings() as savings:
+            triage_agent.run(report)
+        print(savings.tokens_saved)
+    """
+    savings = ContextSavings()
+    token = _current_savings.set(savings)
+    try:
+        yield savings
+    finally:
+        _current_savings.reset(token)
+
+def note_observation(original_tokens: int, sent_tokens: int):
+    _totals.add(original_tokens, sent_tokens)
+    savings = _current_savings.get()
+    if savings is not None:
+        savings.add(original_tokens, sent_tokens)
+
+def context_stats() -> dict:
+    """
+    Returns how many tool observations were compacted in this process and the
+    tokens that saved.
+    """
+    return _totals.stats()
+
+
+# --- 3. Compacting Observations ---
+
+def compact_observation(text: str, max_tokens: int = None) -> str:
+    """
+    Returns `text` if it fits the budget, else its first and last lines with a note
+    of what was left out (about two thirds of the budget go to the head).
+    """
+    max_tokens = context_budget() if max_tokens is None else max_tokens
+    original = estimate_tokens(text)
+    if not max_tokens or original <= max_tokens:
+        note_observation(original, original)
+        return text
+    # Leaves room for the note
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - 100)
+    head_end = text.rfind("\n", 0, limit * 2 // 3)
+    head_end = head_end if head_end > 0 else limit * 2 // 3
+    tail_start = text.find("\n", len(text) - limit // 3)
+    tail_start = tail_start + 1 if tail_start > 0 else len(text) - limit // 3
+    omitted = text[head_end:tail_start]
+    compacted = (f"{text[:head_end]}\n[... {len(omitted):,} characters (~{estimate_tokens(omitted):,} tokens) "
+                 f"omitted to fit the context budget ...]\n{text[tail_start:]}")
+    note_observation(original, estimate_tokens(compacted))
+    return compacted
+
+def page_digest() -> str:
+    """
+    The current site's index.html as an element digest (tools/element_index.py)
+    within the context budget, or the raw HTML if compaction is off. Its tool is
+    built with `make_tool(..., compact=False)`, as it is already within budget.
+    """
+    from tools.web_inspector import get_html_content, get_page_digest
+
+    html = sent = get_html_content()
+    budget = context_budget()
+    if budget and not html.startswith("Error"):
+        digest = get_page_digest(budget * CHARS_PER_TOKEN)
+        # A tiny page is cheaper to send as it is
+        if estimate_tokens(digest) < estimate_tokens(html):
+            sent = digest
+    note_observation(estimate_tokens(html), estimate_tokens(sent))
+    return sent
@@ -1,37 +1,67 @@
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.tools import tool
+# Heavy imports (langchain, Gemini) are deferred into `create_dev_agent`,
+# so importing this module is cheap. The executor is built on first use.
+import asyncio
+import json
+
+from agents.llm import create_llm
+from agents.registry import registry
+from agents.routing import ainvoke_agent, executor_limits
+from agents.tooling import make_tool
+from agents.tracing import console, is_verbose
 
 # --- 1. Import This Agent's Specific Tools ---
-# This agent gets the "powerful" tools: read, write, and update memory.
-from tools.file_manager import read_css_file, write_css_file, update_procedural_memory
+# This agent gets the "powerful" tools: find, patch, and update memory.
+# Fixes are property-level patches; the agent never rewrites the whole file.
+from tools.css_patch import get_css_rule, set_css_properties as patch_css_properties
+from tools.css_patch import set_css_property as patch_css_property
+from tools.file_manager import update_procedural_memory, update_procedural_memory_many
+from tools.memory_search import similar_fixes
+from tools.web_inspector import find_element_selectors
 
 # --- 2. Wrap the Tools for the Agent ---
 # We make the tools available for this agent to use.
+# These are plain functions; they are turned into LangChain tools in the factory.
+
+def find_selector(element_description: str) -> str:
+    """
+    Use this tool FIRST to find the CSS selector for the element in the bug report.
+    Input is a description of the element (e.g., "the contact button").
+    Output is a ranked list of candidate selectors; the first is the best match.
+    """
+    console(f"\n--- [Dev Agent Tool] Finding selector for: {element_description} ---")
+    return find_element_selectors(element_description)
+
+def read_css_rule(selector_text: str) -> str:
+    """
+    Returns the current CSS rule for one selector (e.g., ".contact-button").
+    Optional: use it if you need to see the rule before changing it.
+    """
+    console(f"\n--- [Dev Agent Tool] Reading rule: {selector_text} ---")
+    return get_css_rule(selector_text)
 
-@tool
-def get_current_css_code() -> str:
+def set_css_property(selector_text: str, property_name: str, value: str) -> str:
     """
-    Reads and returns the entire content of the 'style.css' file.
-    Use this tool FIRST to understand the current state of the code.
+    Use this tool SECOND to apply the fix: sets ONE property on ONE rule in 'style.css'.
+    Example: set_css_property(".contact-button", "background-color", "#ff0000").
+    Output is a short diff of the change, or an error message.
     """
-    print(f"\n--- [Dev Agent Tool] Reading from style.css ---")
-    return read_css_file()
+    console(f"\n--- [Dev Agent Tool] Patching style.css: {selector_text} {{ {property_name}: {value} }} ---")
+    return patch_css_property(selector_text, property_name, value)
 
-@tool
-def apply_css_fix(new_css_content: str) -> str:
+def set_css_properties(changes_json: str) -> str:
     """
-    Overwrites the 'style.css' file with new, corrected content.
-    Use this tool SECOND, after you have generated the complete, fixed CSS.
-    The 'new_css_content' argument must be a string containing the ENTIRE
-    contents of the CSS file, not just the changed part.
+    Applies several property changes in one write, all or nothing.
+    Input is a JSON list like
+    [{"selector": ".contact-button", "property": "background-color", "value": "#ff0000"}].
+    Output is a short diff of the changes, or an error message.
     """
-    print(f"\n--- [Dev Agent Tool] Writing to style.css ---")
-    return write_css_file(new_css_content)
+    console(f"\n--- [Dev Agent Tool] Patching style.css ({changes_json}) ---")
+    try:
+        changes = json.loads(changes_json)
+    except json.JSONDecodeError as e:
+        return f"Error: changes_json is not valid JSON ({e})."
+    return patch_css_properties(changes)
 
-@tool
 def save_fix_to_memory(bug_description: str, fix_applied: str) -> str:
     """
     Use this tool LAST, after successfully applying a fix.
@@ -40,60 +70,144 @@ def save_fix_to_memory(bug_description: str, fix_applied: str) -> str:
         bug_description: The original bug report (e.g., "button is blue").
         fix_applied: A short description of the fix (e.g., "Changed .contact-button background-color to #ff0000").
     """
-    print(f"\n--- [Dev Agent Tool] Writing to procedural_memory.json ---")
+    console(f"\n--- [Dev Agent Tool] Writing to procedural_memory.jsonl ---")
     return update_procedural_memory(bug_description, fix_applied)
 
+def save_fixes_to_memory(fixes_json: str) -> str:
+    """
+    Use this instead of `save_fix_to_memory` when you fixed several bug reports at once:
+    saves all of them with one write.
+    Input is a JSON list like
+    [{"bug": "<exact bug report>", "fix": "Changed .contact-button background-color to #ff0000"}].
+    """
+    console(f"\n--- [Dev Agent Tool] Writing several fixes to procedural_memory.jsonl ---")
+    try:
+        entries = json.loads(fixes_json)
+    except json.JSONDecodeError as e:
+        return f"Error: fixes_json is not valid JSON ({e})."
+    if not isinstance(entries, list):
+        return "Error: fixes_json must be a JSON list."
+    return update_procedural_memory_many(entries)
+
 # --- 3. Define the Agent's "Constitution" (System Prompt) ---
 # This is a complex prompt for our "coder" agent.
 prompt_template = """
 You are an expert "Dev Agent," an autonomous front-end developer.
 Your goal is to fix bugs in the website's CSS.
 
-You have one core task: READ the code, WRITE the fix, and REMEMBER the fix.
-You *must* call all three tools in sequence to complete your job.
+You have one core task: FIND the rule, PATCH the property, and REMEMBER the fix.
+You *must* call these three tools in sequence to complete your job.
 
 Workflow:
-1.  **READ:** You MUST start by calling `get_current_css_code` to read the entire `style.css` file.
-2.  **WRITE:** Based on the user's bug report and the code you just read, you MUST generate the new,
-    complete CSS content with the bug fixed. Then you MUST call `apply_css_fix` with this new content.
-3.  **REMEMBER:** After the fix is successfully applied, you MUST call `save_fix_to_memory`
-    to record what you did.
+1.  **FIND:** You MUST start by calling `find_selector` with the element named in the bug report.
+    Use the FIRST selector it returns.
+2.  **PATCH:** You MUST call `set_css_property` with that selector, the property to change
+    (e.g., `background-color`) and the new value (e.g., `#ff0000`). Only that one value changes;
+    never try to rewrite the whole file. If several properties must change together, call
+    `set_css_properties` once instead. Use `read_css_rule` only if you need to see the rule first.
+3.  **REMEMBER:** After the patch is successfully applied, you MUST call `save_fix_to_memory`
+    to record what you did, in the form "Changed <selector> <property> to <value>".
 
 This is not optional. You must follow all three steps.
 Do not stop until `save_fix_to_memory` has been called.
 
 EXAMPLE:
 - Bug Report: "The contact button is blue, it should be red."
-- Step 1: Call `get_current_css_code()`.
-- Step 2: (Receive code) -> Generate new code with `background-color: #ff0000;` -> Call `apply_css_fix(...)`.
-- Step 3: (Receive success) -> Call `save_fix_to_memory(...)`.
+- Step 1: Call `find_selector("the contact button")` -> ".contact-button".
+- Step 2: Call `set_css_property(".contact-button", "background-color", "#ff0000")`.
+- Step 3: (Receive diff) -> Call `save_fix_to_memory(..., "Changed .contact-button background-color to #ff0000")`.
 
 EXAMPLE 2:
 - Bug Report: "The contact button is red, it should be blue."
-- Step 1: Call `get_current_css_code()`.
-- Step 2: (Receive code) -> Generate new code with `background-color: #007bff;` -> Call `apply_css_fix(...)`.
-- Step 3: (Receive success) -> Call `save_fix_to_memory(...)`.
+- Step 1: Call `find_selector("the contact button")` -> ".contact-button".
+- Step 2: Call `set_css_property(".contact-button", "background-color", "#007bff")`.
+- Step 3: (Receive diff) -> Call `save_fix_to_memory(..., "Changed .contact-button background-color to #007bff")`.
+
+IMPORTANT: Your final, final response to me (the Triage Agent) MUST be a single, short sentence: "FIX APPLIED."
+Do not say anything else. Just "FIX APPLIED."
+{examples}"""
+
+# The same job for a numbered list of bug reports, fixed as ONE change set.
+# A separate prompt, so single fixes don't pay for these instructions on every turn.
+batch_prompt_template = """
+You are an expert "Dev Agent," an autonomous front-end developer.
+Your goal is to fix SEVERAL bugs in the website's CSS as ONE change set.
+
+Workflow:
+1.  **FIND:** Call `find_selector` for the element named in EVERY bug report (you may call it
+    for all of them at once). Use the FIRST selector each call returns.
+2.  **PATCH:** Call `set_css_properties` ONCE, with one change per bug report.
+3.  **REMEMBER:** Call `save_fixes_to_memory` ONCE, with one entry per bug report: its exact text
+    as "bug" and "Changed <selector> <property> to <value>" as "fix".
+
+EXAMPLE:
+- Bug Reports: "1. The contact button is blue, it should be red." "2. The submit button is red, it should be blue."
+- Step 1: Call `find_selector("the contact button")` and `find_selector("the submit button")`.
+- Step 2: Call `set_css_properties('[{{"selector": ".contact-button", "property": "background-color", "value": "#ff0000"}},
+  {{"selector": ".submit-button", "property": "background-color", "value": "#007bff"}}]')`.
+- Step 3: Call `save_fixes_to_memory` with both fixes.
 
 IMPORTANT: Your final, final response to me (the Triage Agent) MUST be a single, short sentence: "FIX APPLIED."
 Do not say anything else. Just "FIX APPLIED."
 """
 
+# Past fixes for similar reports, from the procedural memory's similarity index.
+# A remembered selector for the same element lets the agent skip FIND.
+FEW_SHOT_EXAMPLES = 3
+
+def few_shot_examples(bug_description: str) -> str:
+    """
+    Returns the `{examples}` block of the prompt: up to FEW_SHOT_EXAMPLES remembered
+    fixes for similar reports, one line each, or "" if nothing similar is remembered.
+    """
+    matches = similar_fixes(bug_description, FEW_SHOT_EXAMPLES)
+    if not matches:
+        return ""
+    lines = ["", "PAST FIXES FOR SIMILAR REPORTS (if one is for the same element, you may use its",
+             "selector and skip `find_selector`; still follow the other steps):"]
+    for match in matches:
+        bug = match.bug.splitlines()[0]
+        if len(bug) > 120:
+            bug = bug[:117] + "..."
+        lines.append(f'- "{bug}" -> {match.fix}')
+    return "\n".join(lines) + "\n"
+
 # --- 4. Create the Agent ---
 
-def create_dev_agent():
+def create_dev_agent(batch: bool = False):
     """
     Factory function to create and return the Dev Agent executor.
+
+    Args:
+        batch: Build the change-set variant (several bug reports, one write).
     """
-    print("Initializing Dev Agent...")
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate
+
+    console("Initializing Dev Agent...")
     
     # We use a powerful model for our "coder" agent
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash") # Using flash as you suggested
+    llm = create_llm("gemini-2.0-flash", role="dev") # Using flash as you suggested
     
-    tools = [get_current_css_code, apply_css_fix, save_fix_to_memory]
+    if batch:
+        tools = [
+            make_tool(find_selector),
+            make_tool(read_css_rule),
+            make_tool(set_css_properties),
+            make_tool(save_fixes_to_memory),
+        ]
+    else:
+        tools = [
+            make_tool(find_selector),
+            make_tool(read_css_rule),
+            make_tool(set_css_property),
+            make_tool(set_css_properties),
+            make_tool(save_fix_to_memory),
+        ]
     
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", prompt_template),
+            ("system", batch_prompt_template if batch else prompt_template),
             ("human", "{input}"),
             ("placeholder", "{agent_scratchpad}"),
         ]
@@ -101,24 +215,71 @@ def create_dev_agent():
     
     agent = create_tool_calling_agent(llm, tools, prompt)
     
-    # [cite_start]verbose=True gives us the "Observability Trace" (Day 4) [cite: 2196-2198, 2213]
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    # The "Observability Trace" (Day 4): structured spans via agents.tracing,
+    # plus the console narration unless it was turned off with --quiet
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=is_verbose(), name="dev_agent",
+                                   **executor_limits("dev"))
     
-    print("Dev Agent is ready.")
+    console("Dev Agent is ready.")
     return agent_executor
 
 # --- 5. Define the `run` function for the Triage Agent ---
-dev_agent_executor = create_dev_agent()
+# The executor is built lazily by the registry the first time `run` is called.
+registry.register("dev", create_dev_agent)
+registry.register("dev_batch", lambda: create_dev_agent(batch=True))
+
+def __getattr__(name):
+    # Keeps `dev_agent.dev_agent_executor` working, without eager construction.
+    if name == "dev_agent_executor":
+        return registry.get("dev")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def run(bug_description: str) -> str:
     """
     The main entry point for the Dev Agent.
     """
-    print(f"Dev Agent received report: '{bug_description}'")
+    console(f"Dev Agent received report: '{bug_description}'")
+    
+    response = registry.get("dev").invoke({
+        "input": bug_description,
+        "examples": few_shot_examples(bug_description),
+    })
+    
+    # Return just the final output string
+    return response['output']
+
+async def arun(bug_description: str) -> str:
+    """
+    The async entry point for the Dev Agent (uses `ainvoke`).
+    """
+    console(f"Dev Agent received report: '{bug_description}'")
     
-    response = dev_agent_executor.invoke({
-        "input": bug_description
+    # The first lookup loads the site's index; keep that off the event loop
+    examples = await asyncio.to_thread(few_shot_examples, bug_description)
+    response = await ainvoke_agent(registry.get("dev"), {
+        "input": bug_description,
+        "examples": examples,
     })
     
     # Return just the final output string
-    return response['output']
\ No newline at end of file
+    return response['output']
+
+def change_set_input(bug_descriptions: list) -> str:
+    """
+    The Dev Agent's input for fixing several bug reports as one change set.
+    """
+    numbered = "\n".join(f"{n}. {bug}" for n, bug in enumerate(bug_descriptions, 1))
+    return f"Fix ALL of these bug reports as ONE change set:\n{numbered}"
+
+def run_many(bug_descriptions: list) -> str:
+    """
+    Runs one Dev Agent session that fixes several bug reports with a single
+    `set_css_properties` write and a single memory append.
+    """
+    console(f"Dev Agent received {len(bug_descriptions)} reports as one change set")
+
+    response = registry.get("dev_batch").invoke({
+        "input": change_set_input(bug_descriptions)
+    })
+
+    return response['output']
@@ -0,0 +1,146 @@
+import contextlib
+import contextvars
+import threading
+
+# --- 1. One Place To Build LLM Clients ---
+# Every agent builds its chat model through `create_llm`, so cross-cutting
+# concerns (like counting LLM calls per pipeline) are added in one spot.
+
+# Optional replacement for ChatGoogleGenerativeAI (e.g., a local stub for benchmarks).
+_llm_factory = None
+
+# The shared on-disk response cache: built on first use, None when disabled.
+_USE_DEFAULT_CACHE = object()
+_response_cache = _USE_DEFAULT_CACHE
+_response_cache_lock = threading.Lock()
+
+def set_llm_factory(factory):
+    """
+    Makes `create_llm` build models with `factory(model=..., role=...)` instead
+    of calling Gemini. Pass None to go back to Gemini. Agents that were already
+    built keep their model, so call `registry.reset()` afterwards.
+    """
+    global _llm_factory
+    _llm_factory = factory
+
+def create_llm(model: str, role: str):
+    """
+    Builds the chat model for an agent. With model routing on (the default; see
+    agents/routing.py), `model` is replaced by the role's route of models.
+
+    Args:
+        model: The Gemini model name (e.g., 'gemini-2.0-flash').
+        role: Which agent it is for ('triage', 'bug_hunter', 'dev' or 'qa').
+    """
+    from agents.routing import get_route
+
+    route = get_route(role)
+    if route is not None:
+        # One logical model per role; the router picks the real one for each call
+        from agents.routing import routed_llm
+        llm = routed_llm(role, route, lambda name: _client(name, role, route.call_timeout))
+    else:
+        llm = _client(model, role)
+    llm.callbacks = list(llm.callbacks or []) + [_llm_call_counter()]
+
+    store = get_llm_cache()
+    if store is not None:
+        from agents.llm_cache import make_langchain_cache
+        llm.cache = make_langchain_cache(store, model)
+    return llm
+
+def _client(model: str, role: str, timeout: float = None):
+    if _llm_factory is not None:
+        return _llm_factory(model=model, role=role)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    if timeout is None:
+        return ChatGoogleGenerativeAI(model=model)
+    # The router retries (on another model) and enforces time budgets itself
+    return ChatGoogleGenerativeAI(model=model, timeout=timeout, max_retries=0)
+
+def set_llm_cache(store):
+    """
+    Makes `create_llm` cache responses in `store` (an `agents.llm_cache.ResponseCacheStore`).
+    Pass None to turn response caching off. Like `set_llm_factory`, this only
+    affects agents built afterwards, so call `registry.reset()` too.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = store
+
+def get_llm_cache():
+    """
+    Returns the shared response cache store (opening memory/llm_cache.sqlite3
+    on first use), or None if caching is turned off.
+    """
+    global _response_cache
+    if _response_cache is _USE_DEFAULT_CACHE:
+        with _response_cache_lock:
+            if _response_cache is _USE_DEFAULT_CACHE:
+                from agents.llm_cache import ResponseCacheStore
+                _response_cache = ResponseCacheStore()
+    return _response_cache
+
+
+# --- 2. Counting LLM Calls Per Pipeline ---
+
+class LLMCallCount:
+    """
+    The number of LLM calls made inside one `count_llm_calls()` block.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.calls += 1
+
+
+_current_count = contextvars.ContextVar("llm_call_count", default=None)
+
+@contextlib.contextmanager
+def count_llm_calls():
+    """
+    Counts the LLM calls made by the current pipeline (thread / task), e.g.:
+
+        with count_llm_calls() as count:
+            triage_agent.run(report)
+        print(count.calls)
+    """
+    count = LLMCallCount()
+    token = _current_count.set(count)
+    try:
+        yield count
+    finally:
+        _current_count.reset(token)
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+def _llm_call_counter():
+    """
+    Returns the shared callback handler that feeds `count_llm_calls()`.
+    Built lazily so langchain is only imported when an LLM is.
+    """
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                from langchain_core.callbacks import BaseCallbackHandler
+
+                class LLMCallCounter(BaseCallbackHandler):
+                    def on_chat_model_start(self, serialized, messages, **kwargs):
+                        count = _current_count.get()
+                        if count is not None:
+                            count.increment()
+
+                    def on_llm_start(self, serialized, prompts, **kwargs):
+                        count = _current_count.get()
+                        if count is not None:
+                            count.increment()
+
+                _handler = LLMCallCounter()
+    return _handler
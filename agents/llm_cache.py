@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- 1. What A Cached Response Depends On ---
+# A response is reused only for the exact same request: model and its settings,
+# the bound tool schemas, every message (system prompt, bug text, tool observations)
+# *and* the current content of the world files. Once style.css or index.html
+# change, old responses are never served again (until the files change back).
+
+LLM_CACHE_PATH = os.path.join("memory", "llm_cache.sqlite3")
+WORLD_DIR = "world"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+class WorldFingerprint:
+    """
+    A content hash of every file in the world directory (by default, the current
+    site's). Files are only re-read after the file watcher saw them change.
+    """
+
+    def __init__(self, world_dir: str = None):
+        self.world_dir = world_dir
+
+    def current(self) -> str:
+        from tools.site import current_site
+        from tools.world_watch import world_files
+
+        world_dir = self.world_dir or current_site().world_dir
+        if not os.path.isdir(world_dir):
+            return "no-world"
+        return world_files.snapshot_dir(world_dir).fingerprint()
+
+
+# --- 2. Serializing Responses ---
+
+def _encode(generations) -> str:
+    from langchain_core.messages import message_to_dict
+
+    items = []
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        if message is not None:
+            items.append({"message": message_to_dict(message), "info": generation.generation_info})
+        else:
+            items.append({"text": generation.text, "info": generation.generation_info})
+    return json.dumps(items)
+
+def _decode(payload: str) -> list:
+    from langchain_core.messages import messages_from_dict
+    from langchain_core.outputs import ChatGeneration, Generation
+
+    generations = []
+    for item in json.loads(payload):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item["info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["info"]))
+    return generations
+
+
+def _strip_message_ids(prompt: str) -> str:
+    """
+    LangChain gives every AI message a fresh run id (and marks cached ones with zero
+    usage), and earlier AI turns are part of the next prompt. Drop that bookkeeping
+    so identical conversations get identical keys.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    for message in messages:
+        if isinstance(message, dict) and isinstance(message.get("kwargs"), dict):
+            for field in ("id", "usage_metadata", "response_metadata"):
+                message["kwargs"].pop(field, None)
+    return json.dumps(messages, sort_keys=True)
+
+
+# --- 3. The SQLite Store ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    world TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ResponseCacheStore:
+    """
+    A content-addressed LLM response cache in SQLite, shared by every thread and
+    process that opens the same file (WAL mode, so readers never block writers).
+
+    Entries older than `ttl_seconds` are expired; when the cache holds more than
+    `max_bytes` or `max_entries`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 world: WorldFingerprint = None):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.world = world or WorldFingerprint()
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # World fingerprint seen at lookup time, per request, so a response is filed
+        # under the state it was generated from even if the files change meanwhile
+        self._pending_world = {}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite connections must not be shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str, world: str) -> str:
+        prompt = _strip_message_ids(prompt)
+        return hashlib.sha256(f"{llm_string}\0{prompt}\0{world}".encode('utf-8')).hexdigest()
+
+    def _count(self, db, name: str):
+        db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, prompt: str, llm_string: str):
+        """
+        Returns the cached generations for this request, or None.
+        """
+        world = self.world.current()
+        key = self.make_key(prompt, llm_string, world)
+        now = time.time()
+        db = self._connect()
+        row = db.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+
+        if row is not None and now - row[1] > self.ttl_seconds:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+                if len(self._pending_world) > 4096:
+                    self._pending_world.clear()  # lookups whose LLM call never finished
+                self._pending_world[self.make_key(prompt, llm_string, "")] = world
+            else:
+                self.hits += 1
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if row is not None:
+                db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._count(db, "hits" if row is not None else "misses")
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return _decode(row[0]) if row is not None else None
+
+    def put(self, prompt: str, llm_string: str, generations, model: str = ""):
+        """
+        Stores the generations for this request, then evicts down to the limits.
+        """
+        with self._stats_lock:
+            world = self._pending_world.pop(self.make_key(prompt, llm_string, ""), None)
+        if world is None:
+            world = self.world.current()
+        key = self.make_key(prompt, llm_string, world)
+        payload = _encode(generations)
+        now = time.time()
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, world, payload, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, world, payload, len(payload), now, now))
+            evicted = self._evict(db, now)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def _evict(self, db, now: float) -> int:
+        evicted = db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return evicted
+
+        # Walk from least to most recently used until we are under both limits
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        return evicted + len(doomed)
+
+    def purge_stale(self) -> int:
+        """
+        Deletes every entry recorded against a different world state. Returns how many.
+        """
+        db = self._connect()
+        return db.execute("DELETE FROM responses WHERE world != ?", (self.world.current(),)).rowcount
+
+    def clear(self):
+        db = self._connect()
+        db.execute("DELETE FROM responses")
+        db.execute("DELETE FROM counters")
+        with self._stats_lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Hit-rate statistics for this process, plus lifetime totals shared by all processes.
+        """
+        db = self._connect()
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        with self._stats_lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        lifetime_hits, lifetime_misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "evictions": evictions,
+            "entries": count,
+            "bytes": total,
+            "lifetime_hits": lifetime_hits,
+            "lifetime_misses": lifetime_misses,
+            "lifetime_hit_rate": round(lifetime_hits / (lifetime_hits + lifetime_misses), 3)
+            if lifetime_hits + lifetime_misses else 0.0,
+        }
+
+
+# --- 4. Plugging Into LangChain ---
+
+_cache_class = None
+
+def _langchain_cache_class():
+    """
+    Builds the BaseCache adapter lazily, so langchain is only imported when an LLM is.
+    """
+    global _cache_class
+    if _cache_class is None:
+        from langchain_core.caches import BaseCache
+
+        class SQLiteResponseCache(BaseCache):
+            def __init__(self, store: ResponseCacheStore, model: str):
+                self.store = store
+                self.model = model
+
+            def lookup(self, prompt: str, llm_string: str):
+                return self.store.get(prompt, llm_string)
+
+            def update(self, prompt: str, llm_string: str, return_val):
+                self.store.put(prompt, llm_string, return_val, model=self.model)
+
+            def clear(self, **kwargs):
+                self.store.clear()
+
+        _cache_class = SQLiteResponseCache
+    return _cache_class
+
+def make_langchain_cache(store: ResponseCacheStore, model: str = ""):
+    """
+    Wraps a ResponseCacheStore as a LangChain `BaseCache` (for `llm.cache`).
+    `model` is only recorded alongside each entry; the key already covers it.
+    """
+    return _langchain_cache_class()(store, model)
@@ -1,32 +1,46 @@
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.tools import tool
+# Heavy imports (langchain, Gemini) are deferred into `create_qa_agent`,
+# so importing this module is cheap. The executor is built on first use.
+import asyncio
+import re
+
+from agents.context import page_digest
+from agents.llm import create_llm
+from agents.registry import registry
+from agents.routing import ainvoke_agent, executor_limits
+from agents.tooling import make_tool
+from agents.tracing import console, is_verbose
 
 # --- 1. Import This Agent's Specific Tools ---
-# GIVE THE QA AGENT THE NEW "EYES"
-from tools.web_inspector import get_element_color, get_html_content
+# GIVE THE QA AGENT THE NEW "EYES" (SELECTOR FINDER + CSS INSPECTOR)
+from tools.web_inspector import find_element_selectors, get_element_color
+from tools.color_judge import collateral_changes, judge_fix
 
 # --- 2. Wrap the Tools for the Agent ---
-@tool
+# These are plain functions; they are turned into LangChain tools in the factory.
+def find_selector(element_description: str) -> str:
+    """
+    Finds the CSS selector for an element described in plain English
+    (e.g., 'Contact us button') and returns ranked candidates, best first.
+    Use this tool FIRST to find the selector.
+    """
+    console(f"\n--- [QA Agent Tool] Finding selector for: {element_description} ---")
+    return find_element_selectors(element_description)
+
 def read_html_file() -> str:
     """
-    Reads and returns the entire content of the 'index.html' file.
-    Use this tool FIRST to inspect the HTML and find the
-    correct CSS selector for a given element.
+    Returns a digest of 'index.html': one line per visible or interactive element
+    (tag, id, classes, text). Only use this if `find_selector` could not find the element.
     """
-    print(f"\n--- [QA Agent Tool] Reading index.html ---")
-    return get_html_content()
+    console(f"\n--- [QA Agent Tool] Reading index.html ---")
+    return page_digest()
 
-@tool
 def verify_element_color(selector_text: str) -> str:
     """
-    Finds a specific CSS rule by its selector (e.g., '.contact-button')
-    and returns its 'background-color' property.
+    Finds the element a CSS selector matches (e.g., '.contact-button') and returns
+    the 'background-color' it actually gets, plus the rule that set it.
     Use this tool SECOND, *after* you have found the selector.
     """
-    print(f"\n--- [QA Agent Tool] Verifying CSS for: {selector_text} ---")
+    console(f"\n--- [QA Agent Tool] Verifying CSS for: {selector_text} ---")
     return get_element_color(selector_text)
 
 
@@ -41,8 +55,9 @@ This tells you the *INTENDED_STATE* (it "should be red").
 
 You MUST use a 2-step process to find the *ACTUAL_STATE*:
 1.  **FIND SELECTOR:** The user's report is in plain English (e.g., "Contact us button").
-    You MUST call the `read_html_file` tool first to get the site's HTML.
-    Then, you must analyze this HTML to find the *exact* CSS selector for the element the user is describing.
+    You MUST call the `find_selector` tool first with the element the user is describing.
+    It returns ranked CSS selectors; use the top-ranked one.
+    Only if it finds nothing, call `read_html_file` and find the *exact* CSS selector in the page digest yourself.
 2.  **INSPECT COLOR:** After you have the selector, you MUST call the `verify_element_color` tool with that selector.
 
 Finally, compare the *ACTUAL_STATE* (from the tool) with the *INTENDED_STATE* (from the bug report).
@@ -52,31 +67,60 @@ Finally, compare the *ACTUAL_STATE* (from the tool) with the *INTENDED_STATE* (f
 EXAMPLE:
 - Bug Report: "The Contact us button is blue, it should be red."
 - (INTENDED_STATE is 'red')
-- Step 1 (Action): `read_html_file()`
-- Step 1 (Observation): (HTML content is returned...)
-- Step 1 (Thought): "The HTML for 'Contact Us' is `<button class="contact-button">`. The selector is `.contact-button`."
+- Step 1 (Action): `find_selector(element_description='Contact us button')`
+- Step 1 (Observation): "1. .contact-button (score 1.30) -> <button class="contact-button"> 'Contact Us'"
+- Step 1 (Thought): "The top-ranked selector is `.contact-button`."
 - Step 2 (Action): `verify_element_color(selector_text='.contact-button')`
-- Step 2 (Observation): "Found color: #ff0000"
+- Step 2 (Observation): "Found color: #ff0000\nSet by: .contact-button in style.css"
 - Step 2 (Judgment): "PASS. The .contact-button background-color is now #ff0000, which is red."
 """
 
+# Appended for a numbered list of reports verified in one pass (a fix batch);
+# single verifications don't pay for it on every turn.
+batch_prompt_suffix = """
+SEVERAL REPORTS AT ONCE:
+You are given a numbered list of bug reports. Check each one with the same 2 steps
+(you may call each tool for all of them at once) and answer with one line per report,
+in order: "1. PASS. [rationale]" or "1. FAIL. [rationale]".
+"""
+
+# Added to the input when the rule-level diff of the fix is known, so the agent
+# checks the changed selectors instead of searching the whole page.
+changes_note = """
+
+THE FIX CHANGED ONLY THESE DECLARATIONS IN style.css:
+{changes}
+Verify the reported element through these selectors: call `verify_element_color` on
+the one for it (you don't need `find_selector` or `read_html_file`). If any change is
+for a different element than the one reported, answer FAIL and name that change.
+"""
+
+def _with_changes(text: str, changes) -> str:
+    return text + changes_note.format(changes=changes.describe()) if changes else text
+
 # --- 4. Create the Agent ---
 
-def create_qa_agent():
+def create_qa_agent(batch: bool = False):
     """
     Factory function to create and return the QA Agent executor.
+
+    Args:
+        batch: Build the variant that verifies a numbered list of reports in one pass.
     """
-    print("Initializing QA Agent (v2)...") # Updated print
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate
+
+    console("Initializing QA Agent (v2)...") # Updated print
     
     # Use the model you've found to be stable
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite")
+    llm = create_llm("gemini-2.0-flash-lite", role="qa")
     
-    # *** IMPORTANT: Give the agent BOTH tools ***
-    tools = [read_html_file, verify_element_color]
+    # *** IMPORTANT: Give the agent the selector finder, the inspector and the page-digest fallback ***
+    tools = [make_tool(find_selector), make_tool(verify_element_color), make_tool(read_html_file, compact=False)]
     
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", prompt_template),
+            ("system", prompt_template + batch_prompt_suffix if batch else prompt_template),
             ("human", "{input}"),
             ("placeholder", "{agent_scratchpad}"),
         ]
@@ -84,23 +128,103 @@ def create_qa_agent():
     
     agent = create_tool_calling_agent(llm, tools, prompt)
     
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=is_verbose(), name="qa_agent",
+                                   **executor_limits("qa"))
     
-    print("QA Agent (v2) is ready.")
+    console("QA Agent (v2) is ready.")
     return agent_executor
 
 # --- 5. Define the `run` function for the Triage Agent ---
-qa_agent_executor = create_qa_agent()
+# The executor is built lazily by the registry the first time `run` is called.
+registry.register("qa", create_qa_agent)
+registry.register("qa_batch", lambda: create_qa_agent(batch=True))
 
-def run(bug_description: str) -> str:
+def __getattr__(name):
+    # Keeps `qa_agent.qa_agent_executor` working, without eager construction.
+    if name == "qa_agent_executor":
+        return registry.get("qa")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def run(bug_description: str, changes=None) -> str:
     """
     The main entry point for the QA Agent.
+
+    Args:
+        changes: The CSSDiff of what the fix wrote, if known (tools/css_diff.py).
+            Only its selectors are checked, and edits to other elements' rules fail.
     """
-    print(f"QA Agent (v2) received report to verify: '{bug_description}'")
+    console(f"QA Agent (v2) received report to verify: '{bug_description}'")
     
-    response = qa_agent_executor.invoke({
-        "input": bug_description
+    # Plain color reports are judged by rule; the LLM agent only handles the rest
+    verdict = judge_fix(bug_description, changes)
+    if verdict is not None:
+        console(f"--- [QA Agent] Rule-based verdict (no LLM): {verdict} ---")
+        return verdict
+    
+    response = registry.get("qa").invoke({
+        "input": _with_changes(bug_description, changes)
     })
     
     # Return just the final output string
-    return response['output']
\ No newline at end of file
+    return response['output']
+
+async def arun(bug_description: str, changes=None) -> str:
+    """
+    The async entry point for the QA Agent (uses `ainvoke`).
+    """
+    console(f"QA Agent (v2) received report to verify: '{bug_description}'")
+    
+    verdict = await asyncio.to_thread(judge_fix, bug_description, changes)
+    if verdict is not None:
+        console(f"--- [QA Agent] Rule-based verdict (no LLM): {verdict} ---")
+        return verdict
+    
+    response = await ainvoke_agent(registry.get("qa"), {
+        "input": _with_changes(bug_description, changes)
+    })
+    
+    # Return just the final output string
+    return response['output']
+
+# One "<number>. PASS/FAIL ..." line per report in a multi-report answer
+_NUMBERED_VERDICT_RE = re.compile(r"^\s*(\d+)[.)]\s*((?:PASS|FAIL)\b.*)$", re.IGNORECASE | re.MULTILINE)
+
+def run_many(bug_descriptions: list, changes=None) -> list:
+    """
+    Verifies several fixes in one QA pass and returns one "PASS. ..." / "FAIL. ..."
+    verdict per report, in order. Reports the rule-based judge can check never
+    reach the LLM; the rest share a single agent session.
+
+    Args:
+        changes: The CSSDiff of the whole change set, if known. If it also changed
+            rules that apply to none of the reported elements, every report fails
+            (those edits can't be pinned on one of them).
+    """
+    console(f"QA Agent (v2) received {len(bug_descriptions)} reports to verify")
+
+    collateral = collateral_changes(changes, bug_descriptions) if changes else []
+    if collateral:
+        note = (f"FAIL. The change set also changed rules for other elements, which no report asked for: "
+                f"{'; '.join(str(change) for change in collateral)}.")
+        console(f"--- [QA Agent] Rule-based verdict (no LLM) for all {len(bug_descriptions)} reports: {note} ---")
+        return [note] * len(bug_descriptions)
+
+    verdicts = [judge_fix(bug, changes, bug_descriptions) for bug in bug_descriptions]
+    for bug, verdict in zip(bug_descriptions, verdicts):
+        if verdict is not None:
+            console(f"--- [QA Agent] Rule-based verdict (no LLM) for '{bug}': {verdict} ---")
+
+    pending = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if len(pending) == 1:
+        verdicts[pending[0]] = registry.get("qa").invoke({
+            "input": _with_changes(bug_descriptions[pending[0]], changes)
+        })['output']
+    elif pending:
+        numbered = "\n".join(f"{n}. {bug_descriptions[i]}" for n, i in enumerate(pending, 1))
+        output = registry.get("qa_batch").invoke({
+            "input": _with_changes(f"Verify each of these bug fixes:\n{numbered}", changes)
+        })['output']
+        answers = {int(number): verdict.strip() for number, verdict in _NUMBERED_VERDICT_RE.findall(output)}
+        for n, i in enumerate(pending, 1):
+            verdicts[i] = answers.get(n) or "FAIL. The QA Agent gave no verdict for this report."
+    return verdicts
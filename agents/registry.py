@@ -0,0 +1,137 @@
+import importlib
+import threading
+import time
+
+# --- 1. The Lazy Agent Registry ---
+# Agents used to build their LLM client and AgentExecutor at import time.
+# Now each agent module only *registers* its factory here, and the executor
+# is built the first time someone actually needs it (and then reused).
+
+class AgentRegistry:
+    """
+    Builds each agent executor on first use and memoizes it.
+    Also records how long each construction took.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._executors = {}
+        self._lock = threading.Lock()
+        self._setup = []
+        self.build_times = {}
+        self.setup_times = {}
+
+    def register(self, name: str, factory):
+        """
+        Registers a factory function (e.g., `create_dev_agent`) under `name`.
+        Nothing is built yet.
+        """
+        self._factories[name] = factory
+
+    def before_first_build(self, name: str, callback):
+        """
+        Runs `callback()` just before the first agent is built, or now if one
+        already was. For setup that needs langchain (e.g., the tracing hook), so a
+        run that never builds an agent never imports it.
+        """
+        with self._lock:
+            if not self._executors:
+                self._setup.append((name, callback))
+                return
+        callback()
+
+    def get(self, name: str):
+        """
+        Returns the executor for `name`, building it on the first call.
+        """
+        executor = self._executors.get(name)
+        if executor is not None:
+            return executor
+
+        with self._lock:
+            # Another thread may have built it while we waited for the lock
+            if name not in self._executors:
+                while self._setup:
+                    setup_name, callback = self._setup.pop(0)
+                    start = time.perf_counter()
+                    callback()
+                    self.setup_times[setup_name] = time.perf_counter() - start
+                start = time.perf_counter()
+                self._executors[name] = self._factories[name]()
+                self.build_times[name] = time.perf_counter() - start
+            return self._executors[name]
+
+    def reset(self):
+        """
+        Forgets every built executor, so the next `get` builds them again.
+        """
+        with self._lock:
+            self._executors.clear()
+            self.build_times.clear()
+
+    def is_built(self, name: str) -> bool:
+        return name in self._executors
+
+    def names(self) -> list:
+        return list(self._factories)
+
+
+# The single shared registry all agent modules register with.
+registry = AgentRegistry()
+
+
+# --- 2. The Startup Profiler ---
+# The heavy third-party modules, in the order an agent run first pulls them in.
+HEAVY_MODULES = [
+    "google.generativeai",
+    "langchain_core.prompts",
+    "langchain_core.tools",
+    "langchain.agents",
+    "langchain_google_genai",
+    "cssutils",
+    "bs4",
+]
+
+def profile_startup() -> str:
+    """
+    Measures import time for each heavy module and construction time for each
+    agent, and returns a printable report. Used by `main.py --profile-startup`.
+    """
+    lines = ["--- Startup Profile ---", "Imports:"]
+    total = 0.0
+
+    for module_name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module_name)
+            status = ""
+        except Exception as e:
+            status = f"  (failed: {e})"
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        lines.append(f"  {module_name:<28}{elapsed * 1000:9.1f} ms{status}")
+
+    # Importing the agent modules registers every factory without building anything
+    from agents import triage_agent  # noqa: F401
+
+    lines.append("Agent construction:")
+    # Setup deferred to the first build (e.g., tracing) is listed on its own
+    first = True
+    for name in registry.names():
+        try:
+            registry.get(name)
+            elapsed = registry.build_times[name]
+            status = ""
+        except Exception as e:
+            elapsed = 0.0
+            status = f"  (failed: {e})"
+        if first:
+            for setup_name, seconds in registry.setup_times.items():
+                total += seconds
+                lines.append(f"  {f'({setup_name})':<28}{seconds * 1000:9.1f} ms")
+            first = False
+        total += elapsed
+        lines.append(f"  {name:<28}{elapsed * 1000:9.1f} ms{status}")
+
+    lines.append(f"Total: {total * 1000:.1f} ms")
+    return "\n".join(lines)
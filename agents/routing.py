@@ -0,0 +1,521 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- 1. Time Budgets ---
+# A pipeline and each of its steps run under a deadline. Every LLM call is cut
+# off at the nearest one, so one slow API response can't stall a pipeline for
+# longer than its budget. Deadlines nest: an inner budget can only shorten them.
+
+DEFAULT_STEP_SECONDS = 90.0
+DEFAULT_PIPELINE_SECONDS = 300.0
+
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+
+class LLMTimeout(TimeoutError):
+    """
+    Raised when an LLM call (with its hedges and retries) doesn't finish within
+    the route's call timeout or the remaining time budget.
+    """
+
+
+@contextlib.contextmanager
+def time_budget(seconds: float = None):
+    """
+    Runs the block under a deadline `seconds` from now (None: no new deadline).
+    LLM calls inside give up once it has passed (see `remaining_time`).
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.perf_counter() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time():
+    """
+    Seconds left before the nearest deadline (may be negative), or None if there is none.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.perf_counter()
+
+
+_budgets = {"step": DEFAULT_STEP_SECONDS, "pipeline": DEFAULT_PIPELINE_SECONDS}
+
+def set_time_budgets(step_seconds: float = DEFAULT_STEP_SECONDS,
+                     pipeline_seconds: float = DEFAULT_PIPELINE_SECONDS):
+    """
+    Sets the time budget of each Triage step and of a whole pipeline (None: unlimited).
+    """
+    _budgets["step"] = step_seconds
+    _budgets["pipeline"] = pipeline_seconds
+
+def step_budget():
+    return _budgets["step"]
+
+def pipeline_budget():
+    return _budgets["pipeline"]
+
+
+# AgentExecutor's async loop turns any TimeoutError into a "stopped" answer, which
+# would hide an LLMTimeout from the Triage Agent; async agent runs re-raise it.
+_async_timeouts = contextvars.ContextVar("async_llm_timeouts", default=None)
+
+def _note_timeout(error: LLMTimeout) -> LLMTimeout:
+    timeouts = _async_timeouts.get()
+    if timeouts is not None:
+        timeouts.append(error)
+    return error
+
+async def ainvoke_agent(agent, inputs: dict) -> dict:
+    """
+    `await agent.ainvoke(inputs)`, but raises LLMTimeout if an LLM call inside ran
+    out of time, as the sync `invoke` does.
+    """
+    timeouts = []
+    token = _async_timeouts.set(timeouts)
+    try:
+        response = await agent.ainvoke(inputs)
+    finally:
+        _async_timeouts.reset(token)
+    if timeouts:
+        raise timeouts[0]
+    return response
+
+
+# --- 2. Routes ---
+# Each agent role may use any of several models, cheapest first. A call goes to
+# the cheapest one whose recent p95 latency meets the role's SLO and that has
+# been succeeding; if it hasn't answered by its own p95, a hedged duplicate goes
+# to the next model and the first answer wins.
+
+class Route:
+    """
+    The models one agent role may use, and the limits its calls run under.
+
+    Args:
+        models: Acceptable models, cheapest first.
+        slo_seconds: The p95 latency a model must keep to be picked.
+        call_timeout: Hard limit for one call, including hedges and retries.
+        max_attempts: Requests per call, counting hedges and failovers.
+        max_iterations: The agent's AgentExecutor iteration limit.
+        min_success_rate: A model that failed more often than this is skipped.
+    """
+    __slots__ = ("models", "slo_seconds", "call_timeout", "max_attempts", "max_iterations",
+                 "min_success_rate")
+
+    def __init__(self, models, slo_seconds: float, call_timeout: float, max_attempts: int = 3,
+                 max_iterations: int = 8, min_success_rate: float = 0.9):
+        self.models = tuple(models)
+        self.slo_seconds = slo_seconds
+        self.call_timeout = call_timeout
+        self.max_attempts = max_attempts
+        self.max_iterations = max_iterations
+        self.min_success_rate = min_success_rate
+
+
+DEFAULT_ROUTES = {
+    # The final report is short prose: the cheapest model is good enough
+    "triage": Route(["gemini-2.0-flash-lite", "gemini-2.0-flash"], slo_seconds=4.0, call_timeout=20.0),
+    "bug_hunter": Route(["gemini-2.0-flash-lite", "gemini-2.0-flash"], slo_seconds=4.0, call_timeout=20.0,
+                        max_iterations=6),
+    # The coder keeps the stronger model; 2.5 is its fallback, not a cheaper option
+    "dev": Route(["gemini-2.0-flash", "gemini-2.5-flash"], slo_seconds=8.0, call_timeout=30.0,
+                 max_iterations=12),
+    "qa": Route(["gemini-2.0-flash-lite", "gemini-2.0-flash"], slo_seconds=4.0, call_timeout=20.0,
+                max_iterations=6),
+}
+
+_routes = dict(DEFAULT_ROUTES)
+_routing_enabled = True
+
+def set_routing(enabled: bool = True, routes: dict = None):
+    """
+    Turns model routing on or off, optionally replacing routes ({role: Route}).
+    With routing off, each agent uses its one hard-coded model with no timeouts.
+    Only agents built afterwards are affected, so call `registry.reset()` too.
+    """
+    global _routing_enabled
+    _routing_enabled = enabled
+    if routes is not None:
+        _routes.update(routes)
+
+def get_route(role: str):
+    """
+    Returns the Route for `role`, or None if routing is off or the role has none.
+    """
+    return _routes.get(role) if _routing_enabled else None
+
+def executor_limits(role: str) -> dict:
+    """
+    AgentExecutor keyword arguments for `role`: its iteration limit and the step
+    time budget (checked between iterations; LLM calls are cut off by the router).
+    """
+    route = get_route(role)
+    if route is None:
+        return {}
+    return {"max_iterations": route.max_iterations, "max_execution_time": step_budget()}
+
+
+# --- 3. Rolling Latency And Success Statistics ---
+
+STATS_WINDOW = 200           # calls kept per (role, model)
+STATS_HORIZON = 600.0        # seconds; older calls are forgotten, so a slow model gets retried
+MIN_SAMPLES = 5              # below this, a model counts as unknown and is tried
+
+
+class ModelStats:
+    """
+    The recent calls of one model for one role: (time, seconds, ok).
+    """
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        self.calls = collections.deque(maxlen=STATS_WINDOW)
+
+    def record(self, seconds: float, ok: bool):
+        self.calls.append((time.monotonic(), seconds, ok))
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - STATS_HORIZON
+        while self.calls and self.calls[0][0] < cutoff:
+            self.calls.popleft()
+        return list(self.calls)
+
+    def summary(self) -> dict:
+        recent = self._recent()
+        latencies = sorted(seconds for _, seconds, ok in recent if ok)
+        return {
+            "samples": len(recent),
+            "success_rate": sum(ok for _, _, ok in recent) / len(recent) if recent else 1.0,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+        }
+
+
+def _percentile(ordered: list, p: float):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * p / 100) - 1)]
+
+
+class Router:
+    """
+    Per (role, model) statistics, and the routing decisions made from them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.counters = collections.Counter()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.counters.clear()
+
+    def record(self, role: str, model: str, seconds: float, ok: bool):
+        with self._lock:
+            self._stats.setdefault((role, model), ModelStats()).record(seconds, ok)
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _summary(self, role: str, model: str) -> dict:
+        stats = self._stats.get((role, model))
+        return stats.summary() if stats is not None else {"samples": 0, "success_rate": 1.0,
+                                                          "p50": None, "p95": None}
+
+    def plan(self, role: str, route: Route):
+        """
+        Returns (models in the order to try them, seconds to wait before hedging).
+        """
+        with self._lock:
+            summaries = {model: self._summary(role, model) for model in route.models}
+        primary = None
+        for model in route.models:
+            s = summaries[model]
+            if s["samples"] < MIN_SAMPLES:
+                primary = model  # unknown (or forgotten): give it a chance
+                break
+            if s["success_rate"] >= route.min_success_rate and s["p95"] is not None \
+                    and s["p95"] <= route.slo_seconds:
+                primary = model
+                break
+        if primary is None:
+            # Nothing meets the SLO: take the most reliable, then the fastest
+            primary = min(route.models, key=lambda m: (summaries[m]["success_rate"] < route.min_success_rate,
+                                                       summaries[m]["p95"] or route.slo_seconds))
+        order = [primary] + [model for model in route.models if model != primary]
+        s = summaries[primary]
+        hedge_after = s["p95"] if s["samples"] >= MIN_SAMPLES and s["p95"] else route.slo_seconds
+        return order, min(hedge_after, route.slo_seconds)
+
+    def stats(self) -> dict:
+        """
+        Returns {role: {model: p50/p95/success rate/samples}}, plus call counters
+        (hedges sent and won, failovers, timeouts).
+        """
+        with self._lock:
+            keys = sorted(self._stats)
+            roles = {}
+            for role, model in keys:
+                s = self._stats[(role, model)].summary()
+                roles.setdefault(role, {})[model] = {
+                    "samples": s["samples"],
+                    "success_rate": round(s["success_rate"], 3),
+                    "p50_seconds": round(s["p50"], 3) if s["p50"] is not None else None,
+                    "p95_seconds": round(s["p95"], 3) if s["p95"] is not None else None,
+                }
+            return {"roles": roles, **{name: self.counters[name] for name in
+                                       ("calls", "hedges", "hedge_wins", "failovers", "timeouts")}}
+
+
+# The one router every routed model reports to.
+router = Router()
+
+def routing_stats() -> dict:
+    return router.stats()
+
+
+# --- 4. The Routed Chat Model ---
+# A LangChain chat model that stands in for one agent role. It builds the real
+# clients (Gemini, or a stub) per model on first use and calls their `_generate`
+# directly, so callbacks, the response cache and spans see one logical call.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _request_pool() -> ThreadPoolExecutor:
+    # Sync calls run here, so the caller can wait on a request and its hedge at once
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-request")
+    return _pool
+
+def _call_timeout(route: Route) -> float:
+    remaining = remaining_time()
+    return route.call_timeout if remaining is None else min(route.call_timeout, remaining)
+
+def _tag(result, model: str):
+    for generation in result.generations:
+        message = getattr(generation, "message", None)
+        if message is not None:
+            message.response_metadata = {**(message.response_metadata or {}), "routed_model": model}
+    return result
+
+
+_routed_class = None
+
+def _routed_model_class():
+    """
+    Builds the RoutedChatModel class lazily, so langchain is only imported when an LLM is.
+    """
+    global _routed_class
+    if _routed_class is not None:
+        return _routed_class
+
+    from typing import Any
+
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from pydantic import PrivateAttr
+
+    class RoutedChatModel(BaseChatModel):
+        role: str
+        route: Any
+        build: Any                 # model name -> chat model
+        tools: list = []
+        tool_kwargs: dict = {}
+        _clients: dict = PrivateAttr(default_factory=dict)
+        _clients_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+        @property
+        def _llm_type(self) -> str:
+            return "routed"
+
+        @property
+        def _identifying_params(self) -> dict:
+            return {"role": self.role, "models": list(self.route.models),
+                    "tools": [getattr(tool, "name", str(tool)) for tool in self.tools]}
+
+        def bind_tools(self, tools, **kwargs):
+            copy = self.model_copy(update={"tools": list(tools), "tool_kwargs": kwargs})
+            copy._clients = {}
+            copy._clients_lock = threading.Lock()
+            return copy
+
+        def _client(self, model: str):
+            # (chat model, bound kwargs): each model formats the tool schemas its own way
+            with self._clients_lock:
+                client = self._clients.get(model)
+                if client is None:
+                    llm = self.build(model)
+                    bound, kwargs = llm, {}
+                    if self.tools:
+                        bound = llm.bind_tools(self.tools, **self.tool_kwargs)
+                        kwargs = dict(getattr(bound, "kwargs", {}))
+                        bound = getattr(bound, "bound", bound)
+                    client = self._clients[model] = (bound, kwargs)
+                return client
+
+        def _request(self, model: str, messages, stop, kwargs):
+            llm, bound = self._client(model)
+            return llm._generate(messages, stop=stop, **bound, **kwargs)
+
+        async def _arequest(self, model: str, messages, stop, kwargs):
+            llm, bound = self._client(model)
+            return await llm._agenerate(messages, stop=stop, **bound, **kwargs)
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            route = self.route
+            order, hedge_after = router.plan(self.role, route)
+            timeout = _call_timeout(route)
+            router.count("calls")
+            if timeout <= 0:
+                router.count("timeouts")
+                raise LLMTimeout(f"No time left in the budget for the {self.role} agent's LLM call.")
+            start = time.perf_counter()
+            deadline = start + timeout
+            pool = _request_pool()
+            pending = {}
+            attempts, hedged, last_error = 0, False, None
+
+            def launch(model):
+                nonlocal attempts
+                future = pool.submit(self._request, model, messages, stop, kwargs)
+                pending[future] = (model, time.perf_counter())
+                attempts += 1
+
+            def abandon(future, model, started):
+                # A losing request still finishes in the background; its latency is real data
+                def record(done):
+                    router.record(self.role, model, time.perf_counter() - started, done.exception() is None)
+                future.add_done_callback(record)
+
+            launch(order[0])
+            while pending:
+                now = time.perf_counter()
+                wake = deadline
+                if not hedged and attempts < route.max_attempts:
+                    wake = min(wake, start + hedge_after)
+                done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    model, started = pending.pop(future)
+                    elapsed = time.perf_counter() - started
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        router.record(self.role, model, elapsed, False)
+                        last_error = e
+                        if attempts < route.max_attempts:
+                            router.count("failovers")
+                            launch(order[attempts % len(order)])
+                        continue
+                    router.record(self.role, model, elapsed, True)
+                    if hedged and model != order[0]:
+                        router.count("hedge_wins")
+                    for other, (other_model, other_started) in pending.items():
+                        abandon(other, other_model, other_started)
+                    return _tag(result, model)
+                if done:
+                    continue
+                if time.perf_counter() >= deadline:
+                    break
+                if not hedged and attempts < route.max_attempts:
+                    hedged = True
+                    router.count("hedges")
+                    launch(order[attempts % len(order)])
+
+            if pending:
+                router.count("timeouts")
+                for model, started in pending.values():
+                    router.record(self.role, model, time.perf_counter() - started, False)
+                raise LLMTimeout(f"The {self.role} agent's LLM call took longer than {timeout:.1f}s.")
+            raise last_error
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            route = self.route
+            order, hedge_after = router.plan(self.role, route)
+            timeout = _call_timeout(route)
+            router.count("calls")
+            if timeout <= 0:
+                router.count("timeouts")
+                raise _note_timeout(LLMTimeout(f"No time left in the budget for the {self.role} agent's LLM call."))
+            start = time.perf_counter()
+            deadline = start + timeout
+            pending = {}
+            attempts, hedged, last_error = 0, False, None
+
+            def launch(model):
+                nonlocal attempts
+                task = asyncio.ensure_future(self._arequest(model, messages, stop, kwargs))
+                pending[task] = (model, time.perf_counter())
+                attempts += 1
+
+            launch(order[0])
+            try:
+                while pending:
+                    now = time.perf_counter()
+                    wake = deadline
+                    if not hedged and attempts < route.max_attempts:
+                        wake = min(wake, start + hedge_after)
+                    done, _ = await asyncio.wait(list(pending), timeout=max(0.0, wake - now),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        model, started = pending.pop(task)
+                        elapsed = time.perf_counter() - started
+                        if task.exception() is not None:
+                            router.record(self.role, model, elapsed, False)
+                            last_error = task.exception()
+                            if attempts < route.max_attempts:
+                                router.count("failovers")
+                                launch(order[attempts % len(order)])
+                            continue
+                        router.record(self.role, model, elapsed, True)
+                        if hedged and model != order[0]:
+                            router.count("hedge_wins")
+                        return _tag(task.result(), model)
+                    if done:
+                        continue
+                    if time.perf_counter() >= deadline:
+                        break
+                    if not hedged and attempts < route.max_attempts:
+                        hedged = True
+                        router.count("hedges")
+                        launch(order[attempts % len(order)])
+
+                if pending:
+                    router.count("timeouts")
+                    for model, started in pending.values():
+                        router.record(self.role, model, time.perf_counter() - started, False)
+                    raise _note_timeout(LLMTimeout(f"The {self.role} agent's LLM call took longer than {timeout:.1f}s."))
+                raise last_error
+            finally:
+                # Async requests can really be cancelled: the losers stop here
+                for task in pending:
+                    task.cancel()
+
+    _routed_class = RoutedChatModel
+    return _routed_class
+
+def routed_llm(role: str, route: Route, build):
+    """
+    Returns a chat model for `role` that routes each call across `route.models`.
+
+    Args:
+        build: Builds the real chat model for a model name (called once per model, on first use).
+    """
+    return _routed_model_class()(role=role, route=route, build=build)
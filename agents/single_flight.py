@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+# --- 1. Single-Flight Calls ---
+# The first caller for a key runs the work; callers that arrive with the same key
+# while it is running wait for it and get the same result (or the same exception).
+# Sync and async callers share one table, so a thread can wait on a pipeline that
+# an event loop is running, and the other way around.
+
+
+class _Flight:
+    __slots__ = ("future", "started", "followers")
+
+    def __init__(self):
+        self.future = Future()
+        self.started = time.perf_counter()
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key, and counts how much that saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.runs = 0
+        self.shared = 0
+        self.seconds_saved = 0.0
+
+    def _join(self, key):
+        # Returns (flight, True) for the caller that must run the work
+        with self._lock:
+            self.calls += 1
+            if key is None:
+                self.runs += 1
+                return None, True
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.shared += 1
+                return flight, False
+            flight = self._in_flight[key] = _Flight()
+            self.runs += 1
+            return flight, True
+
+    def _land(self, key, flight: _Flight, result=None, error: BaseException = None):
+        if flight is None:
+            return
+        # Leave the table first: a caller arriving from now on starts a fresh run
+        with self._lock:
+            del self._in_flight[key]
+            # Each follower would otherwise have run the work itself
+            self.seconds_saved += flight.followers * (time.perf_counter() - flight.started)
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(result)
+
+    def do(self, key, func, *args):
+        """
+        Runs `func(*args)`, unless a call with the same key is already running, in
+        which case it waits for that call instead. A key of None never coalesces.
+
+        Returns:
+            (result, shared): shared is True if the result came from another caller's run.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.future.result(), True
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result, False
+
+    async def ado(self, key, func, *args):
+        """
+        Async version of `do`: `func(*args)` must return an awaitable.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(flight.future), True
+        try:
+            result = await func(*args)
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result, False
+
+    def stats(self) -> dict:
+        """
+        Returns call counts, the coalescing ratio (the share of calls that were
+        served by another caller's run) and the run time those calls didn't spend.
+        """
+        with self._lock:
+            calls, runs, shared, saved = self.calls, self.runs, self.shared, self.seconds_saved
+        return {
+            "calls": calls,
+            "runs": runs,
+            "coalesced": shared,
+            "coalescing_ratio": round(shared / calls, 3) if calls else 0.0,
+            "seconds_saved": round(saved, 3),
+        }
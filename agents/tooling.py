@@ -0,0 +1,48 @@
+import asyncio
+import functools
+
+from agents.context import compact_observation
+
+# --- Turning Plain Functions Into Agent Tools ---
+# Every tool gets both a sync and an async implementation. On the async path,
+# blocking file I/O and parsing run in a worker thread, so they never stall
+# the event loop while other pipelines are waiting on the network. What a tool
+# returns is kept within the context budget (agents/context.py).
+
+def make_tool(func, coroutine=None, compact: bool = True):
+    """
+    Wraps `func` as a LangChain tool (name, schema and description come from
+    the function itself).
+
+    Args:
+        func: The sync implementation.
+        coroutine: An async implementation. Defaults to running `func` in a thread.
+        compact: Cut observations over the context budget down to their head and tail.
+    """
+    from langchain_core.tools import StructuredTool
+
+    if compact:
+        func = _compacting(func)
+        if coroutine is not None:
+            coroutine = _compacting_async(coroutine)
+
+    if coroutine is None:
+        async def coroutine(*args, **kwargs):
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    return StructuredTool.from_function(func=func, coroutine=coroutine)
+
+def _compacted(observation):
+    return compact_observation(observation) if isinstance(observation, str) else observation
+
+def _compacting(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return _compacted(func(*args, **kwargs))
+    return wrapper
+
+def _compacting_async(coroutine):
+    @functools.wraps(coroutine)
+    async def wrapper(*args, **kwargs):
+        return _compacted(await coroutine(*args, **kwargs))
+    return wrapper
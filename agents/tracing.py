@@ -0,0 +1,378 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from tools.memory_store import FileLock
+
+# --- 1. Console Output ---
+# The agents used to narrate every step on stdout (AgentExecutor verbose=True plus
+# a banner per tool). That narration is now optional; spans are the real trace.
+
+_verbose = True
+
+def set_verbose(enabled: bool):
+    """
+    Turns the console narration (executor traces and tool banners) on or off.
+    Agents that were already built keep their setting, so call `registry.reset()` too.
+    """
+    global _verbose
+    _verbose = enabled
+
+def is_verbose() -> bool:
+    return _verbose
+
+def console(*args, **kwargs):
+    """
+    `print`, but only when console narration is on.
+    """
+    if _verbose:
+        print(*args, **kwargs)
+
+
+# --- 2. Writing Spans ---
+
+SPANS_PATH = os.path.join("logs", "spans.jsonl")
+
+class RotatingJsonlWriter:
+    """
+    Appends JSON lines to `path`, rotating to path.1 ... path.N once it grows past
+    `max_bytes`. Lines are buffered and written with a single append, so
+    several processes can share one file.
+    """
+
+    def __init__(self, path: str = SPANS_PATH, max_bytes: int = 10 * 1024 * 1024,
+                 backups: int = 5, buffer_lines: int = 256):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_lines = buffer_lines
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._rotate_lock = FileLock(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def write(self, record: dict):
+        with self._lock:
+            self._buffer.append(json.dumps(record, default=str))
+            if len(self._buffer) >= self.buffer_lines:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        data = ("\n".join(self._buffer) + "\n").encode('utf-8')
+        self._buffer = []
+        with self._rotate_lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and size + len(data) > self.max_bytes:
+                self._rotate()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+# --- 3. Prometheus Textfile Export ---
+
+class PrometheusTextfileExporter:
+    """
+    Aggregates finished spans into counters and writes them in the Prometheus text
+    format, for node_exporter's textfile collector. The file is replaced atomically.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._tokens = {"input": 0, "output": 0}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def observe(self, span: dict):
+        key = (span["kind"], span["name"])
+        with self._lock:
+            count, seconds, errors = self._spans.get(key, (0, 0.0, 0))
+            self._spans[key] = (count + 1, seconds + span["duration_ms"] / 1000,
+                                errors + (span["status"] == "error"))
+            self._tokens["input"] += span.get("input_tokens") or 0
+            self._tokens["output"] += span.get("output_tokens") or 0
+
+    def export(self):
+        with self._lock:
+            spans, tokens = dict(self._spans), dict(self._tokens)
+        lines = [
+            "# HELP agentic_spans_total Finished spans by kind and name.",
+            "# TYPE agentic_spans_total counter",
+        ]
+        lines += [f'agentic_spans_total{{kind="{k}",name="{n}"}} {v[0]}' for (k, n), v in sorted(spans.items())]
+        lines += [
+            "# HELP agentic_span_seconds_total Wall time spent in spans by kind and name.",
+            "# TYPE agentic_span_seconds_total counter",
+        ]
+        lines += [f'agentic_span_seconds_total{{kind="{k}",name="{n}"}} {v[1]:.6f}' for (k, n), v in sorted(spans.items())]
+        lines += [
+            "# HELP agentic_span_errors_total Spans that ended with an error.",
+            "# TYPE agentic_span_errors_total counter",
+        ]
+        lines += [f'agentic_span_errors_total{{kind="{k}",name="{n}"}} {v[2]}' for (k, n), v in sorted(spans.items())]
+        lines += [
+            "# HELP agentic_llm_tokens_total LLM tokens by direction.",
+            "# TYPE agentic_llm_tokens_total counter",
+        ]
+        lines += [f'agentic_llm_tokens_total{{direction="{d}"}} {n}' for d, n in sorted(tokens.items())]
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
+
+
+# --- 4. The Span Tracer ---
+# Nesting comes from LangChain's run ids: pipeline -> agent (an AgentExecutor)
+# -> llm / tool -> (sub-agent started by a Triage tool) -> ...
+# LangChain's internal chains (prompt, parser, sequence) are followed for
+# parentage but not written out.
+
+def _size(payload) -> int:
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        return len(payload.encode('utf-8'))
+    try:
+        return len(json.dumps(payload, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return len(str(payload).encode('utf-8'))
+
+
+class SpanTracer:
+    """
+    Turns LangChain callbacks (and `pipeline_span` blocks) into finished span
+    records for a writer and, optionally, a Prometheus exporter.
+    """
+
+    def __init__(self, writer: RotatingJsonlWriter, exporter: PrometheusTextfileExporter = None):
+        self.writer = writer
+        self.exporter = exporter
+        self.enabled = True
+        self._open = {}
+        self._lock = threading.Lock()
+
+    # Span bookkeeping
+    def start(self, span_id, parent_id, kind: str, name: str, payload=None, emit: bool = True):
+        parent = self._open.get(parent_id)
+        if parent_id is None:
+            parent_id = _current_pipeline.get()
+            parent = self._open.get(parent_id)
+        # Spans that are not written out hand their children to their own parent
+        if parent is not None and not parent["emit"]:
+            parent_id = parent["_parent"]
+            parent = self._open.get(parent_id)
+        span = {
+            "span_id": str(span_id),
+            "parent_id": str(parent_id) if parent_id is not None else None,
+            "trace_id": parent["trace_id"] if parent else str(span_id),
+            "kind": kind,
+            "name": name,
+            "emit": emit,
+            "_parent": parent_id,
+            "start": time.time(),
+            "_t0": time.perf_counter(),
+            "input_bytes": _size(payload),
+        }
+        with self._lock:
+            self._open[span_id] = span
+        return span
+
+    def end(self, span_id, payload=None, error=None, **fields):
+        with self._lock:
+            span = self._open.pop(span_id, None)
+        if span is None or not span["emit"] or not self.enabled:
+            return
+        record = {k: v for k, v in span.items() if not k.startswith("_") and k != "emit"}
+        record["duration_ms"] = round((time.perf_counter() - span["_t0"]) * 1000, 3)
+        record["output_bytes"] = _size(payload)
+        record["status"] = "error" if error is not None else "ok"
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        record.update(fields)
+        self.writer.write(record)
+        if self.exporter is not None:
+            self.exporter.observe(record)
+        if record["parent_id"] is None:
+            # A whole trace is done: push it out
+            self.flush()
+
+    def flush(self):
+        self.writer.flush()
+        if self.exporter is not None:
+            self.exporter.export()
+
+
+_current_pipeline = contextvars.ContextVar("current_pipeline_span", default=None)
+
+_AGENT_SUFFIX = "_agent"
+
+def _handler_class():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class SpanCallbackHandler(BaseCallbackHandler):
+        """
+        Feeds LangChain run events into a SpanTracer.
+        """
+
+        # Handle async runs' events in order, on the loop, instead of in a thread pool
+        run_inline = True
+
+        def __init__(self, tracer: SpanTracer):
+            self.tracer = tracer
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+            name = kwargs.get("name") or ""
+            # Only the agents' executors are spans; other chains just carry parentage
+            is_agent = name.endswith(_AGENT_SUFFIX)
+            self.tracer.start(run_id, parent_run_id, "agent" if is_agent else "chain", name,
+                              inputs if is_agent else None, emit=is_agent)
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self.tracer.end(run_id, outputs)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self.tracer.end(run_id, error=error)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+            name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+            self.tracer.start(run_id, parent_run_id, "tool", name, input_str)
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self.tracer.end(run_id, getattr(output, "content", output))
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self.tracer.end(run_id, error=error)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+            model = (kwargs.get("metadata") or {}).get("ls_model_name") or "llm"
+            payload = [[getattr(m, "content", m) for m in batch] for batch in messages]
+            self.tracer.start(run_id, parent_run_id, "llm", model, payload)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+            model = (kwargs.get("metadata") or {}).get("ls_model_name") or "llm"
+            self.tracer.start(run_id, parent_run_id, "llm", model, prompts)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            usage, texts = {}, []
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    usage = getattr(message, "usage_metadata", None) or usage
+                    texts.append(generation.text)
+                    if getattr(message, "tool_calls", None):
+                        texts.append(message.tool_calls)
+            self.tracer.end(run_id, texts,
+                            input_tokens=usage.get("input_tokens"),
+                            output_tokens=usage.get("output_tokens"))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self.tracer.end(run_id, error=error)
+
+    return SpanCallbackHandler
+
+
+# --- 5. Turning Tracing On ---
+
+_tracer = None
+
+def configure_tracing(path: str = SPANS_PATH, prometheus_path: str = None,
+                      max_bytes: int = 10 * 1024 * 1024, backups: int = 5) -> SpanTracer:
+    """
+    Starts recording spans for every LangChain run in this process (all four
+    agents, their LLM calls and tool calls) to a rotating JSONL file. The
+    LangChain callback hook is installed when the first agent is built, so a run
+    that never builds one doesn't import langchain for it.
+
+    Args:
+        path: The span log (rotated to path.1 ... path.N).
+        prometheus_path: If set, also keep a Prometheus textfile up to date there.
+    """
+    global _tracer
+    exporter = PrometheusTextfileExporter(prometheus_path) if prometheus_path else None
+    tracer = SpanTracer(RotatingJsonlWriter(path, max_bytes, backups), exporter)
+
+    if _tracer is None:
+        from agents.registry import registry
+        registry.before_first_build("tracing", _install_hook)
+        atexit.register(lambda: _tracer and _tracer.flush())
+        _tracer = tracer
+    else:
+        # Hooks can't be unregistered; point the existing handler at the new tracer
+        _tracer.flush()
+        _tracer.writer, _tracer.exporter, _tracer.enabled = tracer.writer, tracer.exporter, True
+    return _tracer
+
+def _install_hook():
+    from langchain_core.tracers.context import register_configure_hook
+    # A context variable whose *default* is the handler applies in every thread
+    handler = _handler_class()(_tracer)
+    register_configure_hook(contextvars.ContextVar("span_tracer", default=handler), inheritable=True)
+
+def disable_tracing():
+    """
+    Stops writing spans (the callback hook stays installed but does nothing).
+    """
+    if _tracer is not None:
+        _tracer.flush()
+        _tracer.enabled = False
+
+@contextlib.contextmanager
+def _nested_span(kind: str, name: str, payload=None):
+    # Spans started inside the block (agents, LLM and tool calls) nest under this one
+    if _tracer is None or not _tracer.enabled:
+        yield
+        return
+    span_id = uuid.uuid4()
+    _tracer.start(span_id, None, kind, name, payload)
+    token = _current_pipeline.set(span_id)
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_pipeline.reset(token)
+        _tracer.end(span_id, error=error)
+
+def pipeline_span(name: str, payload=None):
+    """
+    Wraps one bug-report pipeline, so every agent, LLM and tool span inside it
+    (including the replay fast path) shares one trace. A no-op when tracing is off.
+    """
+    return _nested_span("pipeline", name, payload)
+
+def state_span(name: str):
+    """
+    Wraps one state of the Triage orchestrator (validate, fix, verify, ...) inside
+    a pipeline; the sub-agent it runs nests under it. A no-op when tracing is off.
+    """
+    return _nested_span("state", name)
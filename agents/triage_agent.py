@@ -1,120 +1,940 @@
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.tools import tool
-
-# --- Placeholder Imports ---
-# We haven't created these files yet, but we will.
-# This code won't run until all agent files are created.
+# The Triage Agent is a deterministic orchestrator: the VALIDATE -> FIX -> VERIFY
+# workflow is fixed, so code walks it instead of an LLM deciding every step.
+# Importing the sub-agent modules is cheap: they only register their factories,
+# so a report rejected as NOT VALID never pays for building the Dev and QA agents.
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from agents.llm import create_llm
+from agents.registry import registry
+from agents.routing import LLMTimeout, pipeline_budget, step_budget, time_budget
+from agents.single_flight import SingleFlight
+from agents.tracing import console, pipeline_span, state_span
+from tools.color_judge import resolve_element
+from tools.colors import family_of, is_family_word, normalize_color
+from tools.css_patch import set_css_properties, set_css_property
+from tools.css_diff import record_css_changes
+from tools.file_manager import hold_procedural_memory
+from tools.memory_index import get_replay_index, parse_fix, report_property, report_target_color
+from tools.memory_store import FileLock, get_memory_store
+from tools.site import current_site, use_site
+from tools.snapshots import SnapshotError, atomic_write, get_snapshot_store
+from tools.web_inspector import get_computed_value
 from . import bug_hunter_agent
 from . import dev_agent
 from . import qa_agent
-# -------------------------
 
-# --- 1. Define the Tools for the Triage Agent ---
-# The Triage Agent's tools are the other agents.
-# We wrap their 'run' functions in a @tool decorator.
+# --- 1. Typed Sub-Agent Results ---
+# The sub-agents answer in a fixed format ("VALIDATED. ...", "PASS. ..."); each
+# answer is parsed once, here, and the orchestrator only looks at the fields.
+
+# Markdown and a label an LLM may put before the verdict ("**PASS**", "Verdict: PASS")
+_VERDICT_LEAD_RE = re.compile(r"^(?:[\s*_#>`~-]+|(?:final\s+)?(?:verdict|result|answer|judg(?:e)?ment|qa|status)\b\s*[:=-]?)*",
+                              re.IGNORECASE)
 
-@tool
-def validate_bug_report(bug_description: str) -> str:
+def _verdict(text: str, verdicts: tuple):
     """
-    Use this tool FIRST to validate if a bug report is real.
-    It runs an agent that inspects the website's code.
-    Input is the original bug description.
-    Output is a confirmation or denial of the bug.
+    Returns the verdict an answer gives, or None if it gives none (or contradicts itself).
+
+    Args:
+        verdicts: (verdict, regex) pairs, most specific first.
     """
-    print(f"\n--- [Triage Agent] Calling Bug-Hunter Agent ---")
-    return bug_hunter_agent.run(bug_description)
+    head = _VERDICT_LEAD_RE.sub("", text, count=1)
+    for verdict, pattern in verdicts:
+        if re.match(rf"(?:{pattern})\b", head, re.IGNORECASE):
+            return verdict
+    # Not first ("The fix is correct. PASS."): accept one upper-case verdict word anywhere
+    found = {verdict for verdict, pattern in verdicts if re.search(rf"\b(?:{pattern})\b", text)}
+    return found.pop() if len(found) == 1 else None
+
+_VALIDATION_VERDICTS = (("NOT VALID", r"NOT\s+VALID(?:ATED)?|INVALID"), ("VALIDATED", r"VALIDATED"))
+_QA_VERDICTS = (("PASS", r"PASS(?:ED)?"), ("FAIL", r"FAIL(?:ED)?"))
+
 
-@tool
-def fix_bug(bug_description: str) -> str:
+class Validation:
     """
-    Use this tool SECOND, only after a bug has been validated.
-    It runs a developer agent to read the code, write a fix, and apply it.
-    Input is the original bug description.
-    Output is a summary of the fix applied.
+    The Bug-Hunter's judgment of a report. Anything that is not a clear
+    "VALIDATED" counts as not valid, so an unclear answer never edits the site.
     """
-    print(f"\n--- [Triage Agent] Calling Dev Agent ---")
-    return dev_agent.run(bug_description)
+    __slots__ = ("valid", "text")
 
-@tool
-def verify_fix(bug_description: str) -> str:
+    def __init__(self, text: str):
+        self.valid = _verdict(text, _VALIDATION_VERDICTS) == "VALIDATED"
+        self.text = text.strip()
+
+
+class FixAttempt:
     """
-    Use this tool LAST, after a fix has been applied.
-    It runs a QA agent to verify that the bug is no longer present.
-    Input is the original bug description (to know what to check).
-    Output is a "PASS" or "FAIL" judgment.
+    One run of the Dev Agent (or one replayed memory).
+
+    Attributes:
+        changed: Whether the world changed, taken from the snapshots around the
+            attempt (or from the "FIX APPLIED." reply if no snapshot could be taken).
+        fix: The fix the attempt saved to procedural memory, if any. It is held
+            back, and only written (under the original report) once QA passes it.
     """
-    print(f"\n--- [Triage Agent] Calling QA Agent (Agent-as-a-Judge) ---")
-    return qa_agent.run(bug_description)
+    __slots__ = ("number", "text", "changed", "fix")
 
+    def __init__(self, number: int, text: str, changed: bool, fix: str = None):
+        self.number = number
+        self.text = text.strip()
+        self.changed = changed
+        self.fix = fix
 
-# --- 2. Define the Agent's "Constitution" (System Prompt) ---
-# This prompt is the "brain" of our Triage Agent.
-# It's a "coordinator" pattern 
-# It defines the agent's persona, its tools, and its logic.
-# This is a core concept from Day 1 and Day 3[cite: 38, 64, 2495].
 
-prompt_template = """
-You are the "Triage Agent," the project manager for a self-healing website system.
-Your goal is to coordinate a team of specialist agents to fix bugs.
+class Verification:
+    """
+    The QA Agent's verdict. Only a clear "PASS" passes; anything else is rolled back.
+    """
+    __slots__ = ("passed", "text")
+
+    def __init__(self, text: str):
+        self.passed = _verdict(text, _QA_VERDICTS) == "PASS"
+        self.text = text.strip()
+
+
+# --- 2. The States ---
+#   REPLAY    -> VERIFY (a remembered fix was applied) | VALIDATE
+#   VALIDATE  -> FIX_BATCH (valid, batching on) | FIX (valid) | REPORT (not valid: early exit)
+#   FIX_BATCH -> REPORT (pass) | FIX (alone in its batch, or retry) | REPORT
+#   FIX       -> VERIFY (the world changed) | FIX (retry) | REPORT
+#   VERIFY    -> REPORT (pass) | ROLLBACK (fail)
+#   ROLLBACK  -> VALIDATE (after a replay) | FIX (retry) | REPORT
+#   REPORT    -> DONE
+# Out of time (an LLM call hit the step or pipeline budget): ROLLBACK if our
+# change is still unverified, then REPORT.
+
+REPLAY = "replay"
+VALIDATE = "validate"
+FIX_BATCH = "fix_batch"
+FIX = "fix"
+VERIFY = "verify"
+ROLLBACK = "rollback"
+REPORT = "report"
+DONE = "done"
+
+# Dev Agent runs per report, including retries after a rolled-back fix
+MAX_FIX_ATTEMPTS = 2
+
+
+class PipelineRun:
+    """
+    Everything one report's pass through the states has found out so far.
+    """
+    __slots__ = ("report", "hit", "validation", "attempts", "verification", "before", "after",
+                 "changes", "rolled_back", "rollback_note", "output", "start", "full_start", "timings",
+                 "timed_out")
+
+    def __init__(self, report: str):
+        self.report = report
+        self.hit = None            # the ReplayHit being verified, if any
+        self.validation = None
+        self.attempts = []
+        self.verification = None
+        self.before = None         # snapshot from before the first change
+        self.after = None          # snapshot from after the latest change
+        self.changes = None        # CSSDiff of the latest change, for QA
+        self.rolled_back = False
+        self.rollback_note = None
+        self.output = None
+        self.start = time.perf_counter()
+        self.full_start = None     # when the full pipeline (not the replay) began
+        self.timings = []
+        self.timed_out = None      # why the time budget stopped the run, if it did
+
+    @property
+    def replaying(self) -> bool:
+        return self.hit is not None and self.validation is None
+
+    def next_state(self, state: str) -> str:
+        """
+        The transition table: picks the next state from the results so far.
+        """
+        if self.timed_out is not None and state != REPORT:
+            # Out of time: never leave an unverified change of ours on the site
+            unverified = self.after is not None and not (self.verification and self.verification.passed)
+            return ROLLBACK if unverified and state != ROLLBACK else REPORT
+        if state == REPLAY:
+            return VERIFY if self.hit is not None else VALIDATE
+        if state == VALIDATE:
+            if not self.validation.valid:
+                return REPORT
+            return FIX_BATCH if _fix_batcher is not None else FIX
+        if state == FIX_BATCH:
+            if not self.attempts:
+                return FIX  # it was the only report in its batch
+            if self.verification is not None and self.verification.passed:
+                return REPORT
+            retry = self.rolled_back or not self.attempts[-1].changed
+            return FIX if retry and len(self.attempts) < MAX_FIX_ATTEMPTS else REPORT
+        if state == FIX:
+            if self.attempts[-1].changed:
+                return VERIFY
+            return FIX if len(self.attempts) < MAX_FIX_ATTEMPTS else REPORT
+        if state == VERIFY:
+            return REPORT if self.verification.passed else ROLLBACK
+        if state == ROLLBACK:
+            if self.replaying:
+                console("Replayed fix did not pass verification; running the full pipeline.")
+                self.hit = None
+                return VALIDATE
+            # Only retry on a clean slate: after a conflict, someone else's fix is in the world
+            if self.rolled_back and len(self.attempts) < MAX_FIX_ATTEMPTS:
+                return FIX
+            return REPORT
+        return DONE
+
+    @property
+    def verdict(self) -> str:
+        if self.validation is not None and not self.validation.valid:
+            return "NOT_VALID"
+        if self.verification is not None and self.verification.passed:
+            return "PASS"
+        return "FAIL"
+
+    @property
+    def path(self) -> str:
+        return "replay" if self.replaying else "full_pipeline"
+
+    def state_seconds(self) -> dict:
+        """
+        Returns {state: total seconds} (a state can run more than once).
+        """
+        totals = {}
+        for state, seconds in self.timings:
+            totals[state] = totals.get(state, 0.0) + seconds
+        return totals
+
+
+# --- 3. What Each State Does ---
+# Sync and async versions of every step; the async ones await the sub-agents'
+# `arun` and push file work to a thread. Both record into the same PipelineRun.
+
+def _snapshot():
+    try:
+        return get_snapshot_store().snapshot()
+    except OSError as e:
+        console(f"Could not snapshot the world: {e}")
+        return None
+
+def _fix_input(run: PipelineRun) -> str:
+    # A retry tells the Dev Agent why the last attempt was not good enough
+    if not run.attempts:
+        return run.report
+    if run.verification is not None and not run.verification.passed:
+        reason = f"it did not pass QA ({run.verification.text.splitlines()[0]}) and was rolled back"
+    else:
+        reason = "it did not change style.css"
+    return f"{run.report}\n\nA previous fix attempt failed: {reason}. Apply a different fix."
+
+def _remember(run: PipelineRun):
+    """
+    Writes the fix that just passed QA to procedural memory, under the report as the
+    user wrote it. A fix that fails QA is never written, so it is never replayed
+    or shown to the Dev Agent as an example.
+    """
+    if run.replaying or not (run.verification and run.verification.passed):
+        return
+    fix = run.attempts[-1].fix if run.attempts else None
+    if not fix:
+        return
+    try:
+        get_memory_store().append(run.report, fix)
+    except OSError as e:
+        console(f"Could not save the fix to procedural memory: {e}")
+
+def _record_attempt(run: PipelineRun, text: str, before: str, after: str, fix: str, changes=None):
+    if before is not None and after is not None:
+        changed = before != after
+    else:
+        changed = "FIX APPLIED" in text.upper()
+    run.attempts.append(FixAttempt(len(run.attempts) + 1, text, changed, fix))
+    if changed:
+        if run.before is None:
+            run.before = before
+        run.after = after
+        run.changes = changes
+        run.rolled_back = False
+        run.rollback_note = None
+    else:
+        console(f"--- [Triage Agent] Fix attempt {len(run.attempts)} changed nothing ---")
+
+def _rollback(run: PipelineRun):
+    """
+    Puts the pre-fix snapshot back, but only while the world is still exactly as
+    the fix left it: a fix from a concurrent pipeline that landed in between is
+    never thrown away.
+    """
+    if run.before is None or run.after is None:
+        run.rollback_note = "The fix was NOT rolled back: no snapshot was taken."
+        return
+    try:
+        restored = get_snapshot_store().restore(run.before, expected=run.after)
+    except (SnapshotError, OSError) as e:
+        console(f"\n--- [Triage Agent] Not rolled back: {e} ---")
+        run.rollback_note = f"The fix was NOT rolled back: {e}"
+        return
+    run.rolled_back = True
+    run.after = None
+    run.rollback_note = "The failed fix was rolled back; the site is as it was before the fix."
+    console(f"\n--- [Triage Agent] Rolled back {', '.join(restored) or 'nothing'} to the pre-fix snapshot ---")
+
+# Sync steps
+
+def _replay(run: PipelineRun):
+    hit = _find_replay(run.report)
+    if hit is None:
+        return
+    before = _snapshot()
+    with record_css_changes() as log:
+        if not _apply_replay(hit):
+            return
+    run.hit = hit
+    run.before, run.after = before, _snapshot()
+    run.changes = log.combined()
+
+def _validate(run: PipelineRun):
+    run.full_start = time.perf_counter()
+    console(f"\n--- [Triage Agent] Calling Bug-Hunter Agent ---")
+    run.validation = Validation(bug_hunter_agent.run(run.report))
+
+def _fix(run: PipelineRun):
+    console(f"\n--- [Triage Agent] Calling Dev Agent (attempt {len(run.attempts) + 1}) ---")
+    fix_input = _fix_input(run)
+    before = _snapshot()
+    # The diff of every write the Dev Agent's tools make, so QA checks only those rules,
+    # and the fix it saves to memory, held back until QA passes it
+    with record_css_changes() as log, hold_procedural_memory() as held:
+        try:
+            text = dev_agent.run(fix_input)
+        except LLMTimeout:
+            # It may have patched style.css before it ran out of time
+            _record_attempt(run, "The Dev Agent ran out of time.", before, _snapshot(), held.last_fix())
+            raise
+    _record_attempt(run, text, before, _snapshot(), held.last_fix(), log.combined())
+
+def _fix_batch(run: PipelineRun):
+    _apply_batch_outcome(run, _fix_batcher.submit(run).result())
+
+def _verify(run: PipelineRun):
+    console(f"\n--- [Triage Agent] Calling QA Agent (Agent-as-a-Judge) ---")
+    run.verification = Verification(qa_agent.run(run.report, run.changes))
+    _remember(run)
+
+def _report(run: PipelineRun):
+    run.output = _write_report(run)
+
+# Async steps
+
+async def _areplay(run: PipelineRun):
+    hit = await asyncio.to_thread(_find_replay, run.report)
+    if hit is None:
+        return
+    before = await asyncio.to_thread(_snapshot)
+    with record_css_changes() as log:
+        if not await asyncio.to_thread(_apply_replay, hit):
+            return
+    run.hit = hit
+    run.before, run.after = before, await asyncio.to_thread(_snapshot)
+    run.changes = log.combined()
+
+async def _avalidate(run: PipelineRun):
+    run.full_start = time.perf_counter()
+    console(f"\n--- [Triage Agent] Calling Bug-Hunter Agent ---")
+    run.validation = Validation(await bug_hunter_agent.arun(run.report))
+
+async def _afix(run: PipelineRun):
+    console(f"\n--- [Triage Agent] Calling Dev Agent (attempt {len(run.attempts) + 1}) ---")
+    fix_input = _fix_input(run)
+    before = await asyncio.to_thread(_snapshot)
+    with record_css_changes() as log, hold_procedural_memory() as held:
+        try:
+            text = await dev_agent.arun(fix_input)
+        except LLMTimeout:
+            after = await asyncio.to_thread(_snapshot)
+            _record_attempt(run, "The Dev Agent ran out of time.", before, after, held.last_fix())
+            raise
+    after = await asyncio.to_thread(_snapshot)
+    _record_attempt(run, text, before, after, held.last_fix(), log.combined())
+
+async def _afix_batch(run: PipelineRun):
+    _apply_batch_outcome(run, await asyncio.wrap_future(_fix_batcher.submit(run)))
+
+async def _averify(run: PipelineRun):
+    console(f"\n--- [Triage Agent] Calling QA Agent (Agent-as-a-Judge) ---")
+    run.verification = Verification(await qa_agent.arun(run.report, run.changes))
+    await asyncio.to_thread(_remember, run)
+
+async def _arollback(run: PipelineRun):
+    await asyncio.to_thread(_rollback, run)
+
+async def _areport(run: PipelineRun):
+    run.output = await _awrite_report(run)
+
+_STEPS = {REPLAY: _replay, VALIDATE: _validate, FIX_BATCH: _fix_batch, FIX: _fix,
+          VERIFY: _verify, ROLLBACK: _rollback, REPORT: _report}
+_ASYNC_STEPS = {REPLAY: _areplay, VALIDATE: _avalidate, FIX_BATCH: _afix_batch, FIX: _afix,
+                VERIFY: _averify, ROLLBACK: _arollback, REPORT: _areport}
+
+
+# --- 4. Batched Fixes ---
+# Validated reports that arrive close together are fixed as one change set: one Dev
+# Agent session, one write to style.css, one QA pass with a verdict per report and
+# one memory append for the fixes that passed. A report whose fix fails QA is taken
+# back out of the change set (the pre-batch snapshot is restored and the passing
+# fixes re-applied in one write), then retried on its own.
+# A batch doesn't wait out its window when no other pipeline for the site is still
+# validating or fixing, so a lone report (e.g., in serve mode) starts right away.
+
+class BatchOutcome:
+    """
+    What one report got out of a batched fix.
+    """
+    __slots__ = ("text", "changed", "fix", "verification", "rolled_back", "note")
+
+    def __init__(self, text: str, changed: bool, fix: str, verification=None,
+                 rolled_back: bool = False, note: str = None):
+        self.text = text
+        self.changed = changed
+        self.fix = fix
+        self.verification = verification
+        self.rolled_back = rolled_back
+        self.note = note
+
+
+class FixBatcher:
+    """
+    Collects validated reports per site for up to `window` seconds, or until
+    `max_size` have arrived, then fixes them together on a background thread.
+    A batch starts early once no other pipeline for its site is in VALIDATE or
+    FIX. The report that opened a batch is charged for its LLM calls.
+    """
+
+    def __init__(self, max_size: int = 8, window: float = 0.25):
+        self.max_size = max_size
+        self.window = window
+        self._lock = threading.Lock()
+        self._open = {}
+        # site key -> pipelines in VALIDATE or FIX for that site
+        self._busy = {}
+        self.batches = 0
+        self.reports = 0
+        self.largest = 0
+
+    def submit(self, run: PipelineRun) -> Future:
+        """
+        Adds a validated report to its site's open batch.
+
+        Returns:
+            A Future with the report's BatchOutcome (None if it ended up alone).
+        """
+        site = current_site()
+        future = Future()
+        with self._lock:
+            batch = self._open.get(site.key)
+            if batch is None:
+                batch = self._open[site.key] = (site, contextvars.copy_context(), [])
+                timer = threading.Timer(self.window, self._close, (site.key, batch))
+                timer.daemon = True
+                timer.start()
+            batch[2].append((run, future))
+            ready = len(batch[2]) >= self.max_size or not self._busy.get(site.key)
+            if ready:
+                del self._open[site.key]
+        if ready:
+            threading.Thread(target=self._fix, args=(batch,), daemon=True).start()
+        return future
+
+    def enter(self, key):
+        """
+        Notes a pipeline for the site `key` entering VALIDATE or FIX.
+        """
+        with self._lock:
+            self._busy[key] = self._busy.get(key, 0) + 1
+
+    def leave(self, key, joining: bool = False):
+        """
+        Notes a pipeline leaving VALIDATE or FIX, and starts the site's open batch
+        if no other one is left there.
+
+        Args:
+            joining: The pipeline goes on to submit to the batch, which decides then.
+        """
+        with self._lock:
+            busy = self._busy[key] - 1
+            if busy:
+                self._busy[key] = busy
+            else:
+                del self._busy[key]
+            if busy or joining:
+                return
+            batch = self._open.pop(key, None)
+        if batch is not None:
+            threading.Thread(target=self._fix, args=(batch,), daemon=True).start()
+
+    def _close(self, key, batch):
+        with self._lock:
+            if self._open.get(key) is not batch:
+                return  # it filled up and was fixed already
+            del self._open[key]
+        self._fix(batch)
+
+    def _fix(self, batch):
+        site, context, items = batch
+        runs = [run for run, _ in items]
+        with self._lock:
+            self.batches += 1
+            self.reports += len(runs)
+            self.largest = max(self.largest, len(runs))
+        try:
+            outcomes = context.run(_fix_batch_in, site, runs)
+        except BaseException as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+        for (_, future), outcome in zip(items, outcomes):
+            future.set_result(outcome)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "reports": self.reports,
+                "largest": self.largest,
+                "mean_size": round(self.reports / self.batches, 2) if self.batches else 0.0,
+            }
 
-You must follow this strict, 3-step workflow:
-1.  **VALIDATE:** First, you MUST use the `validate_bug_report` tool to confirm the bug is real.
-2.  **FIX:** SECOND, *if and only if* the bug was validated, you MUST use the `fix_bug` tool to apply a patch.
-3.  **VERIFY:** THIRD, *after* the fix is applied, you MUST use the `verify_fix` tool to confirm the fix worked.
 
-Do not skip any steps. Report the final outcome of the entire process.
+_fix_batcher = None
+
+def set_fix_batching(max_size: int = 8, window: float = 0.25):
+    """
+    Turns batched fixes on (off by default, and for max_size <= 1).
+
+    Args:
+        max_size: Fix a batch as soon as this many validated reports are waiting.
+        window: Otherwise, fix whatever arrived within this many seconds of the first.
+    """
+    global _fix_batcher
+    _fix_batcher = FixBatcher(max_size, window) if max_size > 1 else None
+
+@contextlib.contextmanager
+def _batch_watch(run: PipelineRun, state: str):
+    # Lets the fix batcher see which pipelines could still join (or change) its batch
+    batcher = _fix_batcher
+    if batcher is None or state not in (VALIDATE, FIX):
+        yield
+        return
+    key = current_site().key
+    batcher.enter(key)
+    joining = False
+    try:
+        yield
+        joining = run.next_state(state) == FIX_BATCH
+    finally:
+        batcher.leave(key, joining)
+
+def fix_batching_stats():
+    """
+    Returns batch counts and sizes, or None if batching is off.
+    """
+    return _fix_batcher.stats() if _fix_batcher is not None else None
+
+def _fix_batch_in(site, runs: list) -> list:
+    with use_site(site), pipeline_span("fix_batch", [run.report for run in runs]):
+        return _fix_change_set(runs)
+
+def _fix_change_set(runs: list) -> list:
+    """
+    Fixes and verifies several validated reports together. Returns one
+    BatchOutcome per run (or [None] for a lone report, which is fixed as usual).
+    """
+    if len(runs) == 1:
+        return [None]
+    reports = [run.report for run in runs]
+    console(f"\n--- [Triage Agent] Calling Dev Agent with {len(reports)} reports as one change set ---")
+    before = _snapshot()
+    with record_css_changes() as log, hold_procedural_memory() as held:
+        try:
+            text = dev_agent.run_many(reports)
+        except LLMTimeout:
+            _undo_change_set(before)
+            raise
+    after = _snapshot()
+    fixes = [held.fix_for(report) for report in reports]
+    if before is not None and after is not None:
+        changed = before != after
+    else:
+        changed = "FIX APPLIED" in text.upper()
+    if not changed:
+        return [BatchOutcome(text, False, fix) for fix in fixes]
+
+    console(f"\n--- [Triage Agent] Calling QA Agent once for {len(reports)} reports ---")
+    try:
+        verifications = [Verification(verdict) for verdict in qa_agent.run_many(reports, log.combined())]
+    except LLMTimeout:
+        _undo_change_set(before)
+        raise
+    rolled_back, note = False, None
+    if not all(verification.passed for verification in verifications):
+        passing = [fix for fix, verification in zip(fixes, verifications) if verification.passed]
+        rolled_back, note = _separate_failed(before, after, passing)
+    _remember_passing(reports, fixes, verifications)
+    return [
+        BatchOutcome(text, True, fix, verification,
+                     rolled_back and not verification.passed, None if verification.passed else note)
+        for fix, verification in zip(fixes, verifications)
+    ]
+
+def _remember_passing(reports: list, fixes: list, verifications: list):
+    # One append for the change set, like `_remember` for a single fix
+    entries = [{"bug": report, "fix": fix} for report, fix, verification in zip(reports, fixes, verifications)
+               if fix and verification.passed]
+    try:
+        get_memory_store().append_many(entries)
+    except OSError as e:
+        console(f"Could not save the fixes to procedural memory: {e}")
+
+def _undo_change_set(before: str):
+    # The batch ran out of time with its changes unverified: put the site back
+    after = _snapshot()
+    if before is None or after is None or before == after:
+        return
+    try:
+        get_snapshot_store().restore(before, expected=after)
+        console(f"\n--- [Triage Agent] Rolled back the unverified change set ---")
+    except (SnapshotError, OSError) as e:
+        console(f"\n--- [Triage Agent] Could not roll back the unverified change set: {e} ---")
+
+def _separate_failed(before: str, after: str, passing_fixes: list):
+    """
+    Takes the failed fixes out of a change set: restores the pre-batch snapshot,
+    then re-applies the passing fixes with one write. Returns (rolled_back, note).
+    """
+    if before is None or after is None:
+        return False, "The fix was NOT rolled back: no snapshot was taken."
+    changes = [parse_fix(fix) if fix else None for fix in passing_fixes]
+    if None in changes:
+        return False, ("The fix was NOT rolled back: other fixes in the same change set passed, "
+                       "and they could not be told apart from it.")
+    store = get_snapshot_store()
+    try:
+        store.restore(before, expected=after)
+    except (SnapshotError, OSError) as e:
+        return False, f"The fix was NOT rolled back: {e}"
+    if changes:
+        result = set_css_properties([{"selector": selector, "property": prop, "value": value}
+                                     for selector, prop, value in changes])
+        if result.startswith("Error"):
+            # Never lose the fixes that passed: put the whole change set back
+            store.restore(after)
+            return False, f"The fix was NOT rolled back: re-applying the other fixes failed ({result})."
+    console(f"\n--- [Triage Agent] Took the failed fixes out of the change set ---")
+    return True, "The failed fix was taken out of the change set; the site is as it was before it."
+
+def _apply_batch_outcome(run: PipelineRun, outcome):
+    if outcome is None:
+        return
+    run.attempts.append(FixAttempt(len(run.attempts) + 1, outcome.text, outcome.changed, outcome.fix))
+    run.verification = outcome.verification
+    run.rolled_back = outcome.rolled_back
+    run.rollback_note = outcome.note
+
+
+# --- 5. The Final Report ---
+# Written from the run's results by a template. Optionally (`set_llm_report`), an
+# LLM rewrites those facts as prose; that is the only LLM call the Triage Agent makes.
+
+report_prompt = """
+You are the "Triage Agent," the project manager for a self-healing website system.
+Your team has finished working on a user's bug report. Using only the facts below,
+write the final report for the user in two or three sentences.
+Say whether the bug was rejected, fixed and verified, or not fixed, and keep the
+verdict word from the facts (NOT VALID, PASS or FAIL).
 """
 
-# --- 3. Create the Agent ---
-
-def create_triage_agent():
-    """
-    Factory function to create and return the Triage Agent executor.
-    """
-    print("Initializing Triage Agent...")
-    
-    # Use a powerful model for the "manager" agent
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
-    
-    # Get the list of tools
-    tools = [validate_bug_report, fix_bug, verify_fix]
-    
-    # Create the prompt from our template
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", prompt_template),
-            ("human", "{input}"),
-            ("placeholder", "{agent_scratchpad}"),
-        ]
-    )
-    
-    # Create the agent
-    agent = create_tool_calling_agent(llm, tools, prompt)
-    
-    # Create the agent executor (the runtime)
-    # verbose=True gives us the "Observability Trace" (Day 4) [cite: 4322, 4340]
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
-    
-    print("Triage Agent is ready.")
-    return agent_executor
-
-# --- 4. Define the `run` function for main.py ---
-# We will create the agent once and reuse it.
-triage_agent_executor = create_triage_agent()
+def create_report_writer():
+    """
+    Factory function to create the Triage Agent's report writer (prompt | LLM).
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+
+    console("Initializing Triage report writer...")
+    llm = create_llm("gemini-2.0-flash", role="triage")
+    prompt = ChatPromptTemplate.from_messages([("system", report_prompt), ("human", "{input}")])
+    # Named like an agent, so it gets its own span in traces
+    return (prompt | llm).with_config(run_name="triage_agent")
+
+registry.register("triage", create_report_writer)
+
+_llm_report = False
+
+def set_llm_report(enabled: bool):
+    """
+    Turns the LLM-written final report on or off (off by default).
+    """
+    global _llm_report
+    _llm_report = enabled
+
+def _template_report(run: PipelineRun) -> str:
+    if run.timed_out is not None:
+        return f"FAIL. Stopped before the bug was fixed: {run.timed_out}\n{run.rollback_note or ''}".rstrip()
+    if run.replaying:
+        hit = run.hit
+        return f"FIX REPLAYED FROM MEMORY: {hit.selector} {{ {hit.property}: {hit.value} }}. QA: {run.verification.text}"
+    if not run.validation.valid:
+        return f"Bug report rejected. {run.validation.text}"
+    attempts = f"{len(run.attempts)} attempt{'s' if len(run.attempts) != 1 else ''}"
+    if run.verification is not None and run.verification.passed:
+        fix = run.attempts[-1].fix or run.attempts[-1].text
+        return f"Bug validated and fixed ({attempts}). Fix: {fix}. QA: {run.verification.text}"
+    if run.verification is None:
+        return f"FAIL. The Dev Agent did not change the site ({attempts}). Last reply: {run.attempts[-1].text}"
+    return f"FAIL. The fix did not pass QA ({attempts}). QA: {run.verification.text}\n{run.rollback_note or ''}".rstrip()
+
+def _use_llm_report(run: PipelineRun) -> bool:
+    return _llm_report and not run.replaying
+
+def _write_report(run: PipelineRun) -> str:
+    facts = _template_report(run)
+    if not _use_llm_report(run):
+        return facts
+    try:
+        return registry.get("triage").invoke({"input": f"Bug report: {run.report}\n{facts}"}).content
+    except Exception as e:
+        console(f"Could not write the report with the LLM ({e}); using the plain report.")
+        return facts
+
+async def _awrite_report(run: PipelineRun) -> str:
+    facts = _template_report(run)
+    if not _use_llm_report(run):
+        return facts
+    try:
+        response = await registry.get("triage").ainvoke({"input": f"Bug report: {run.report}\n{facts}"})
+        return response.content
+    except Exception as e:
+        console(f"Could not write the report with the LLM ({e}); using the plain report.")
+        return facts
+
+
+# --- 6. The Procedural-Memory Fast Path ---
+# If we have already fixed this exact change before (same selector, property and
+# target color), replay the remembered fix and go straight to verification.
+
+# The default site's timings; each site keeps its own in its memory/ folder
+PIPELINE_TIMINGS_PATH = os.path.join("memory", "pipeline_timings.json")
+
+def _pipeline_timings_path() -> str:
+    return os.path.join(current_site().memory_dir, os.path.basename(PIPELINE_TIMINGS_PATH))
+
+def _load_pipeline_timings() -> dict:
+    try:
+        with open(_pipeline_timings_path(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"runs": 0, "mean_seconds": 0.0}
+
+def _record_pipeline_time(seconds: float, state_seconds: dict = None):
+    """
+    Keeps a running mean of full-pipeline durations, to estimate replay savings,
+    and of the time spent in each state.
+    """
+    path = _pipeline_timings_path()
+    try:
+        with FileLock(path):
+            timings = _load_pipeline_timings()
+            runs = timings["runs"] + 1
+            timings["mean_seconds"] += (seconds - timings["mean_seconds"]) / runs
+            timings["runs"] = runs
+            states = timings.setdefault("states", {})
+            for state, elapsed in (state_seconds or {}).items():
+                entry = states.setdefault(state, {"runs": 0, "mean_seconds": 0.0})
+                entry["runs"] += 1
+                entry["mean_seconds"] += (elapsed - entry["mean_seconds"]) / entry["runs"]
+            atomic_write(path, json.dumps(timings).encode('utf-8'))
+    except OSError as e:
+        console(f"Could not record pipeline timing: {e}")
+
+def _current_family(selector: str, property_name: str):
+    try:
+        value = get_computed_value(selector, property_name)
+    except OSError:
+        return None
+    return family_of(value) if value else None
+
+def _find_replay(bug_report: str):
+    """
+    Returns a ReplayHit worth replaying, or None.
+    """
+    hit = get_replay_index().lookup(bug_report)
+    if hit is None:
+        return None
+    # Already in the target state: let the Bug-Hunter decide if the report is valid
+    if _current_family(hit.selector, hit.property) == family_of(hit.value):
+        return None
+    return hit
+
+def _apply_replay(hit) -> bool:
+    console(f"\n--- [Triage Agent] Procedural memory hit: {hit.memory['fix']} ---")
+    result = set_css_property(hit.selector, hit.property, hit.value)
+    if result.startswith("Error"):
+        console(f"Replay failed ({result}); running the full pipeline.")
+        return False
+    return True
+
+
+# --- 7. Define the `run` functions for main.py ---
+
+def _went_through_fix_and_verify(run: PipelineRun) -> bool:
+    # Only these runs make up the full-pipeline mean that replays are measured against:
+    # an early NOT VALID exit or a run stopped by its time budget would pull it down
+    if run.timed_out is not None:
+        return False
+    states = [state for state, _ in run.timings]
+    full = states[states.index(VALIDATE):] if VALIDATE in states else []
+    return VERIFY in full or (FIX_BATCH in full and any(attempt.changed for attempt in run.attempts))
+
+def _result(run: PipelineRun) -> dict:
+    """
+    Builds the run's result dict and records the full pipeline's timings
+    (of runs that fixed and verified).
+    """
+    end = time.perf_counter()
+    state_seconds = run.state_seconds()
+    if run.replaying:
+        elapsed = end - run.start
+        timings = _load_pipeline_timings()
+        time_saved = max(0.0, timings["mean_seconds"] - elapsed) if timings["runs"] else None
+        fix = run.hit.memory["fix"]
+    else:
+        elapsed = end - (run.full_start or run.start)
+        time_saved = 0.0
+        fix = run.attempts[-1].fix if run.attempts else None
+        if _went_through_fix_and_verify(run):
+            _record_pipeline_time(elapsed, {state: seconds for state, seconds in state_seconds.items() if state != REPLAY})
+    return {
+        "input": run.report,
+        "output": run.output,
+        "verdict": run.verdict,
+        "path": run.path,
+        "fix": fix,
+        "attempts": len(run.attempts),
+        "rolled_back": run.rolled_back,
+        "timed_out": run.timed_out is not None,
+        "coalesced_with": None,
+        "states": [{"state": state, "seconds": seconds} for state, seconds in run.timings],
+        "state_seconds": state_seconds,
+        "elapsed_seconds": elapsed,
+        "time_saved_seconds": time_saved,
+    }
+
+def _timed_out(run: PipelineRun, state: str, error: LLMTimeout):
+    run.timed_out = f"the {state} step ran out of time ({error})"
+    console(f"\n--- [Triage Agent] Out of time in {state}: {error} ---")
+
+def _run_pipeline(bug_report: str) -> dict:
+    # One trace per report: every state, agent, LLM call and tool call nests under it.
+    # The whole pipeline and each state have a time budget (see agents/routing.py).
+    with pipeline_span("pipeline", bug_report), time_budget(pipeline_budget()):
+        run = PipelineRun(bug_report)
+        state = REPLAY
+        while state != DONE:
+            start = time.perf_counter()
+            with state_span(state), time_budget(step_budget()), _batch_watch(run, state):
+                try:
+                    _STEPS[state](run)
+                except LLMTimeout as e:
+                    _timed_out(run, state, e)
+            run.timings.append((state, time.perf_counter() - start))
+            state = run.next_state(state)
+        return _result(run)
+
+async def _arun_pipeline(bug_report: str) -> dict:
+    with pipeline_span("pipeline", bug_report), time_budget(pipeline_budget()):
+        run = PipelineRun(bug_report)
+        state = REPLAY
+        while state != DONE:
+            start = time.perf_counter()
+            with state_span(state), time_budget(step_budget()), _batch_watch(run, state):
+                try:
+                    await _ASYNC_STEPS[state](run)
+                except LLMTimeout as e:
+                    _timed_out(run, state, e)
+            run.timings.append((state, time.perf_counter() - start))
+            state = run.next_state(state)
+        return await asyncio.to_thread(_result, run)
+
+
+# --- 8. Coalescing Duplicate Reports ---
+# When something breaks, many users report it at once. Reports that ask for the same
+# change (same site, element, property and target color) while a pipeline for it
+# is running wait for that pipeline and share its result, instead of racing it.
+
+_pipelines = SingleFlight()
+
+def coalescing_key(bug_report: str):
+    """
+    Returns (site, selector, property, target) for a report, or None if the report
+    can't be resolved to one element and one target color (it then runs on its own).
+    """
+    try:
+        selector = resolve_element(bug_report)
+    except Exception:
+        return None
+    target = report_target_color(bug_report)
+    prop = report_property(bug_report)
+    if selector is None or target is None or prop is None:
+        return None
+    # A color word asks for any shade of it; an exact value asks for that value
+    target = family_of(target) if is_family_word(target) else normalize_color(target)
+    return current_site().key, selector, prop, target
+
+def coalescing_stats() -> dict:
+    """
+    Returns how many reports shared another report's pipeline, and the pipeline
+    time that saved (see SingleFlight.stats).
+    """
+    return _pipelines.stats()
+
+def _shared_result(result: dict, bug_report: str, start: float) -> dict:
+    console(f"--- [Triage Agent] Shared the result of the pipeline for '{result['input']}' ---")
+    shared = dict(result)
+    shared.update({
+        "input": bug_report,
+        "path": "coalesced",
+        "coalesced_with": result["input"],
+        "elapsed_seconds": time.perf_counter() - start,
+        # The pipeline this report would otherwise have run
+        "time_saved_seconds": result["elapsed_seconds"],
+    })
+    return shared
 
 def run(bug_report: str) -> dict:
     """
     The main entry point for the Triage Agent.
+    Tries the procedural-memory replay first, then VALIDATE -> FIX -> VERIFY,
+    rolling back and retrying a fix that fails QA (up to MAX_FIX_ATTEMPTS).
+    A report identical in effect to one already running waits for that run instead.
     """
-    print(f"Triage Agent received report: '{bug_report}'")
-    
-    # Invoke the agent executor
-    # We pass the bug report as the "input"
-    response = triage_agent_executor.invoke({
-        "input": bug_report
-    })
-    
-    return response
\ No newline at end of file
+    console(f"Triage Agent received report: '{bug_report}'")
+    start = time.perf_counter()
+    result, shared = _pipelines.do(coalescing_key(bug_report), _run_pipeline, bug_report)
+    return _shared_result(result, bug_report, start) if shared else result
+
+async def arun(bug_report: str) -> dict:
+    """
+    The async entry point for the Triage Agent. Many of these can be in flight
+    at once on one event loop; every LLM call is awaited, never blocked on.
+    """
+    console(f"Triage Agent received report: '{bug_report}'")
+    start = time.perf_counter()
+    key = await asyncio.to_thread(coalescing_key, bug_report)
+    result, shared = await _pipelines.ado(key, _arun_pipeline, bug_report)
+    return _shared_result(result, bug_report, start) if shared else result
@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tools.site import current_site, resolve_site, use_site
+
+# --- 1. Reading Reports ---
+# Each line of the input file is one bug report: either a JSON string, or an
+# object with the report under "report", "bug_report", "bug", "input" or "body"
+# (and optionally an "id" / "request_id" that is copied to the result, and a
+# "site" naming which site the report is about; see tools/site.py).
+
+REPORT_KEYS = ("report", "bug_report", "bug", "input", "body")
+ID_KEYS = ("id", "request_id")
+SITE_KEY = "site"
+
+def iter_reports(path: str):
+    """
+    Streams (report_id, report_text) pairs from a JSONL file, one line at a time.
+    """
+    for report_id, report, _ in iter_site_reports(path):
+        yield report_id, report
+
+def iter_site_reports(path: str, default_site=None):
+    """
+    Streams (report_id, report_text, site) triples from a JSONL file, one line at a time.
+    Reports without a "site" get `default_site`.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Not JSON: treat the raw line as the report
+                record = line
+            if isinstance(record, str):
+                yield line_number, record, default_site
+                continue
+            report = next((record[k] for k in REPORT_KEYS if record.get(k)), None)
+            report_id = next((record[k] for k in ID_KEYS if record.get(k)), line_number)
+            if report is None:
+                print(f"Skipping line {line_number}: no report field found.")
+                continue
+            yield report_id, report, record.get(SITE_KEY) or default_site
+
+
+# --- 2. Running One Report ---
+
+def classify_outcome(output: str) -> str:
+    """
+    Turns a free-text answer into a verdict (for results that don't carry one).
+    """
+    text = output.upper()
+    if "NOT VALID" in text:
+        return "NOT_VALID"
+    if "FAIL" in text:
+        return "FAIL"
+    if "PASS" in text:
+        return "PASS"
+    return "UNKNOWN"
+
+def run_one(report_id, report: str, site=None) -> dict:
+    """
+    Runs the full Triage pipeline for one report and returns its result line.
+
+    Args:
+        site: The site the report is about (default: the current site).
+    """
+    from agents import triage_agent
+    from agents.context import record_context_savings
+    from agents.llm import count_llm_calls
+
+    start = time.perf_counter()
+    with use_site(site or current_site()) as active, count_llm_calls() as llm_calls, \
+            record_context_savings() as context:
+        try:
+            result = triage_agent.run(report)
+            output, error = result.get("output") or "", None
+        except Exception as e:
+            result, output, error = {}, "", f"{type(e).__name__}: {e}"
+
+    return {
+        "id": report_id,
+        "site": active.name,
+        "report": report,
+        "verdict": "ERROR" if error else result.get("verdict") or classify_outcome(output),
+        "fix": result.get("fix"),
+        "path": result.get("path"),
+        "output": output,
+        "error": error,
+        "latency_seconds": round(time.perf_counter() - start, 3),
+        "llm_calls": llm_calls.calls,
+        "context_tokens_saved": context.tokens_saved,
+    }
+
+
+# --- 3. The Bounded Worker Pool ---
+
+def _error_line(report_id, report: str, site, error: Exception) -> dict:
+    # A worker process that died takes its report with it; record it, keep going
+    return {
+        "id": report_id, "site": resolve_site(site).name, "report": report, "verdict": "ERROR",
+        "fix": None, "path": None, "output": "", "error": f"{type(error).__name__}: {error}",
+        "latency_seconds": None, "llm_calls": 0, "context_tokens_saved": 0,
+    }
+
+def run_batch(input_path: str, output_path: str, workers: int = 4, site=None,
+              site_processes: int = 0, worker_initializer=None, worker_initargs=()) -> dict:
+    """
+    Processes every report in `input_path` with up to `workers` pipelines in
+    flight, writing one JSONL result per report to `output_path` as it finishes.
+
+    Reports are read lazily, so at most `2 * workers` are held in memory at once.
+    Writes to style.css are serialized inside the tools, so parallel Dev Agent
+    runs cannot corrupt it.
+
+    Args:
+        site: The site for reports that don't name one (default: the current site).
+        site_processes: If > 0, run pipelines in that many worker processes with each
+            site pinned to one of them (see site_scheduler.py) instead of in threads.
+        worker_initializer / worker_initargs: Passed to the SiteScheduler.
+
+    Returns:
+        A summary dict (counts per verdict, elapsed time, reports per minute, LLM cache
+        duplicate-report coalescing, fix batching, model routing and context compaction stats).
+    """
+    workers = max(1, workers)
+    verdicts = {}
+    completed = 0
+    # Summed from the result lines, so it also covers reports run in worker processes
+    context_tokens_saved = 0
+    write_lock = threading.Lock()
+    start = time.perf_counter()
+    site = site or current_site()
+
+    if site_processes > 0:
+        from site_scheduler import SiteScheduler
+        pool = SiteScheduler(site_processes, worker_initializer, worker_initargs)
+        # At most one pipeline per site runs at a time, so keep each worker busy
+        workers = max(workers, site_processes)
+        submit = lambda report_id, report, report_site: pool.submit(report_site, run_one, report_id, report)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        submit = lambda report_id, report, report_site: pool.submit(run_one, report_id, report, report_site)
+
+    with open(output_path, 'w', encoding='utf-8') as out, pool:
+
+        def record(future):
+            nonlocal completed, context_tokens_saved
+            report_id, report, report_site = pending.pop(future)
+            try:
+                line = future.result()
+            except Exception as e:
+                line = _error_line(report_id, report, report_site, e)
+            with write_lock:
+                out.write(json.dumps(line) + "\n")
+                out.flush()
+                completed += 1
+                verdicts[line["verdict"]] = verdicts.get(line["verdict"], 0) + 1
+                context_tokens_saved += line["context_tokens_saved"]
+            print(f"[{completed}] {line['id']} ({line['site']}): {line['verdict']} "
+                  f"in {line['latency_seconds'] or 0.0:.1f}s ({line['llm_calls']} LLM calls)")
+
+        in_flight = set()
+        pending = {}
+        for report_id, report, report_site in iter_site_reports(input_path, site):
+            # Backpressure: don't read further ahead than the pool can use
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future)
+            future = submit(report_id, report, report_site)
+            pending[future] = (report_id, report, report_site)
+            in_flight.add(future)
+
+        for future in wait(in_flight).done:
+            record(future)
+
+    elapsed = time.perf_counter() - start
+    from agents.llm import get_llm_cache
+    # With worker processes, hit counts live in the workers, not here
+    cache = get_llm_cache() if site_processes <= 0 else None
+    if site_processes <= 0:
+        from agents.routing import routing_stats
+        from agents.triage_agent import coalescing_stats, fix_batching_stats
+        coalescing = coalescing_stats()
+        batching = fix_batching_stats()
+        routing = routing_stats()
+    else:
+        # Each site's reports run one at a time in its worker, so none overlap to coalesce
+        # (and the routers' statistics live in the workers)
+        coalescing = batching = routing = None
+    return {
+        "reports": completed,
+        "verdicts": verdicts,
+        "elapsed_seconds": round(elapsed, 2),
+        "reports_per_minute": round(completed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "llm_cache": cache.stats() if cache is not None else None,
+        "coalescing": coalescing,
+        "fix_batching": batching,
+        "routing": routing,
+        "context_tokens_saved": context_tokens_saved,
+    }
@@ -0,0 +1,2 @@
+# This file can be empty.
+# Its presence tells Python that the 'benchmarks' directory is a package.
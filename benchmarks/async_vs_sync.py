@@ -0,0 +1,78 @@
+"""
+Compares pipeline throughput of the blocking `run` path against the asyncio
+`arun` path, using the scripted stub LLM with a fixed fake network latency.
+
+Usage (from the project root):
+    python -m benchmarks.async_vs_sync --pipelines 50 --latency 0.05 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from agents import triage_agent
+from agents.llm import set_llm_cache, set_llm_factory
+from agents.registry import registry
+from benchmarks.stub_llm import stub_llm_factory
+from benchmarks.workspace import reports_for, temporary_site, write_site
+
+
+def bench_sync(reports: list) -> float:
+    """
+    One pipeline at a time, each blocking its thread on every LLM call.
+    """
+    start = time.perf_counter()
+    for report in reports:
+        triage_agent.run(report)
+    return time.perf_counter() - start
+
+def bench_async(reports: list, concurrency: int) -> float:
+    """
+    Up to `concurrency` pipelines in flight on a single event loop.
+    """
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(report):
+            async with limit:
+                return await triage_agent.arun(report)
+
+        return await asyncio.gather(*(one(r) for r in reports))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipelines", type=int, default=50, help="Bug reports to process per mode.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake seconds per LLM call.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Max in-flight pipelines for async.")
+    args = parser.parse_args()
+
+    set_llm_factory(stub_llm_factory(latency=args.latency))
+    # Cached responses would let the second mode skip the fake network entirely
+    set_llm_cache(None)
+    registry.reset()
+    reports = reports_for(args.pipelines, args.pipelines)
+
+    results = {}
+    with temporary_site(args.pipelines) as root, open(os.devnull, 'w') as devnull:
+        for mode in ("sync", "async"):
+            write_site(root, args.pipelines)
+            with contextlib.redirect_stdout(devnull):
+                if mode == "sync":
+                    results[mode] = bench_sync(reports)
+                else:
+                    results[mode] = bench_async(reports, args.concurrency)
+
+    print(f"--- Sync vs Async ({args.pipelines} pipelines, {args.latency * 1000:.0f} ms per LLM call) ---")
+    for mode, elapsed in results.items():
+        print(f"  {mode:<6}{elapsed:8.2f} s  {args.pipelines / elapsed:8.2f} pipelines/s")
+    print(f"  speedup: {results['sync'] / results['async']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
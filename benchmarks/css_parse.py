@@ -0,0 +1,154 @@
+"""
+Compares the streaming CSS tokenizer (tools/css_tokenizer.py) with cssutils:
+parse time, rules found, and how often the two agree on a rule's selector and
+on the properties it declares. Pass real-world stylesheets (Bootstrap, Tailwind
+builds, a site's bundle...) with --css; otherwise synthetic framework-like sheets
+(media queries, grouped selectors, vendor prefixes, var(), data URIs, @font-face,
+@keyframes, comments) are generated at each --rules size.
+
+Usage (from the project root):
+    python -m benchmarks.css_parse --css path/to/bootstrap.css path/to/app.css
+    python -m benchmarks.css_parse --rules 1000 10000 50000 --repeats 5
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.suite import percentile
+from tools.css_tokenizer import MMAP_THRESHOLD, from_cssutils, open_stylesheet, parse_stylesheet, parse_with_cssutils
+
+_TEMPLATES = [
+    ".btn-{i} {{\n  display: inline-block;\n  padding: .375rem .75rem;\n  color: var(--btn-color, #212529);\n"
+    "  background-color: #{color};\n  border: 1px solid transparent;\n}}\n",
+    ".btn-{i}:hover, .btn-{i}:focus-visible {{\n  background-color: #{color} !important;\n}}\n",
+    ".nav-{i} > .item + .item, .nav-{i} a[href^=\"http\"] {{\n  margin-left: 4px;\n  -webkit-transition: color .15s;\n"
+    "  transition: color .15s ease-in-out, background-color .15s ease-in-out;\n}}\n",
+    "/* card {i} */\n.card-{i} .card-body {{ flex: 1 1 auto; background: url(\"data:image/svg+xml,%3csvg "
+    "xmlns='http://www.w3.org/2000/svg'%3e%3c/svg%3e\") no-repeat #{color}; }}\n",
+    "@media (min-width: 768px) {{\n  .col-md-{i} {{ flex: 0 0 auto; width: calc(100% / 12 * {n}); }}\n}}\n",
+    "#section-{i} .title::before {{ content: \"{{ }};\"; color: #{color}; }}\n",
+    "@keyframes spin-{i} {{ from {{ transform: rotate(0deg); }} to {{ transform: rotate(360deg); }} }}\n",
+    "@font-face {{ font-family: \"Icons {i}\"; src: url(icons-{i}.woff2) format(\"woff2\"); }}\n",
+]
+
+
+def framework_css(rules: int) -> str:
+    """
+    A stylesheet with about `rules` rules in the mix a CSS framework build has.
+    """
+    parts = [":root { --btn-color: #fff; --brand: #0d6efd; }\n"]
+    for i in range(rules - 1):
+        color = f"{i * 2654435761 % 0xffffff:06x}"
+        parts.append(_TEMPLATES[i % len(_TEMPLATES)].format(i=i, n=i % 12 + 1, color=color))
+    return "".join(parts)
+
+
+def _time(func, repeats: int):
+    times, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return percentile(times, 50), result
+
+def _agreement(ours, theirs) -> tuple:
+    """
+    The share of cssutils' style rules that the tokenizer found with the same
+    selector, and with the same declared property names.
+    """
+    found = {}
+    for rule in ours.rules:
+        found.setdefault(rule.selector, []).append([name for name, _, _ in rule.declarations])
+    selectors = declarations = 0
+    for rule in theirs.rules:
+        candidates = found.get(rule.selector)
+        if not candidates:
+            continue
+        selectors += 1
+        names = [name for name, _, _ in rule.declarations]
+        if names in candidates:
+            candidates.remove(names)
+            declarations += 1
+    total = len(theirs.rules) or 1
+    return selectors / total, declarations / total
+
+def bench(label: str, path: str, repeats: int, budget: float, agree_max: int, previous=None) -> dict:
+    """
+    Times both parsers on one file. cssutils is skipped when its time, projected
+    linearly from `previous` (bytes, seconds), is over `budget`.
+    """
+    size = os.path.getsize(path)
+
+    def tokenize():
+        with open_stylesheet(path) as data:
+            return parse_stylesheet(data)
+
+    tokenizer_seconds, ours = _time(tokenize, repeats)
+    result = {"bytes": size, "rules": len(ours.rules), "parser": ours.source,
+              "mmap": size >= MMAP_THRESHOLD, "tokenizer_seconds": tokenizer_seconds, "cssutils_seconds": None}
+    if ours.fallback:
+        result["fallback"] = ours.fallback
+
+    line = (f"  {label:<30}{size / 1024:9,.0f} KB  {len(ours.rules):>7,} rules  "
+            f"tokenizer {tokenizer_seconds * 1000:9.1f} ms")
+    if previous and previous[1] * size / previous[0] > budget:
+        line += f"   cssutils skipped (projected over {budget:.0f} s)"
+    else:
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf-8')
+        cssutils_seconds, stylesheet = _time(lambda: parse_with_cssutils(text), 1 if tokenizer_seconds > 0.01 else repeats)
+        result.update(cssutils_seconds=cssutils_seconds, speedup=cssutils_seconds / tokenizer_seconds)
+        line += f"   cssutils {cssutils_seconds * 1000:9.1f} ms   x{result['speedup']:.0f}"
+        # Reading selectorText back from cssutils gets quadratically slower with the
+        # size of the sheet, so agreement is only checked on smaller ones
+        if len(ours.rules) <= agree_max:
+            theirs = from_cssutils(stylesheet)
+            selectors, declarations = _agreement(ours, theirs)
+            result.update(cssutils_rules=len(theirs.rules), selectors_agree=selectors,
+                          declarations_agree=declarations)
+            line += (f"   cssutils found {len(theirs.rules):,} rules; agree: selectors {selectors:.1%}, "
+                     f"declarations {declarations:.1%}")
+    if ours.fallback:
+        line += f"   [fell back to cssutils: {ours.fallback}]"
+    print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--css", nargs="*", default=[], help="Stylesheets to parse.")
+    parser.add_argument("--rules", type=int, nargs="*", default=[1_000, 5_000, 20_000],
+                        help="Sizes of the synthetic sheets (used when no --css is given).")
+    parser.add_argument("--repeats", type=int, default=5, help="Tokenizer runs per sheet (the median is kept).")
+    parser.add_argument("--budget", type=float, default=60.0, help="Skip cssutils when projected over this many seconds.")
+    parser.add_argument("--agree-max", type=int, default=5_000,
+                        help="Compare the rules the parsers found on sheets with at most this many rules.")
+    args = parser.parse_args()
+
+    # cssutils logs a warning for every property it doesn't validate
+    import cssutils
+    cssutils.log.setLevel(logging.CRITICAL)
+
+    print("--- CSS Parsing: streaming tokenizer vs cssutils ---")
+    results = {}
+    for path in args.css:
+        results[path] = bench(os.path.basename(path), path, args.repeats, args.budget, args.agree_max)
+    if not args.css:
+        previous = None
+        with tempfile.TemporaryDirectory(prefix="agentic-css-") as tmp:
+            for rules in args.rules:
+                path = os.path.join(tmp, f"framework-{rules}.css")
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(framework_css(rules))
+                result = bench(f"framework-like, {rules:,} rules", path, args.repeats, args.budget,
+                               args.agree_max, previous)
+                if result["cssutils_seconds"] is not None:
+                    previous = (result["bytes"], result["cssutils_seconds"])
+                results[str(rules)] = result
+    return results
+
+
+if __name__ == "__main__":
+    main()
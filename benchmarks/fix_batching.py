@@ -0,0 +1,93 @@
+"""
+Compares fixing validated reports one at a time against batching them into one
+change set per window (one Dev session, one style.css write, one memory append,
+one QA pass), with concurrent pipelines and the scripted stub LLM.
+
+Usage (from the project root):
+    python -m benchmarks.fix_batching --reports 24 --workers 8 --latency 0.05
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import triage_agent
+from agents.llm import count_llm_calls, set_llm_cache, set_llm_factory
+from agents.registry import registry
+from benchmarks.stub_llm import stub_llm_factory
+from benchmarks.workspace import reports_for, temporary_site, write_site
+
+
+def _css_writes(root: str) -> int:
+    # Every recorded write to a world file lands in the snapshot journal
+    try:
+        with open(os.path.join(root, "world", ".snapshots", "history.jsonl"), encoding='utf-8') as f:
+            return sum(1 for line in f if json.loads(line)["file"] == "style.css")
+    except OSError:
+        return 0
+
+def bench(reports: list, workers: int) -> dict:
+    """
+    Runs every report with up to `workers` pipelines in flight.
+    """
+    def one(report):
+        with count_llm_calls() as count:
+            result = triage_agent.run(report)
+        return result["verdict"], count.calls
+
+    writes = _css_writes(os.getcwd())
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(one, reports))
+    elapsed = time.perf_counter() - start
+    verdicts = {}
+    for verdict, _ in outcomes:
+        verdicts[verdict] = verdicts.get(verdict, 0) + 1
+    return {
+        "seconds": elapsed,
+        "llm_calls": sum(calls for _, calls in outcomes),
+        "css_writes": _css_writes(os.getcwd()) - writes,
+        "verdicts": verdicts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=24, help="Bug reports (one per button).")
+    parser.add_argument("--workers", type=int, default=8, help="Pipelines in flight.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake seconds per LLM call.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Largest fix batch.")
+    parser.add_argument("--window", type=float, default=0.25, help="Seconds a fix batch waits for more reports.")
+    args = parser.parse_args()
+
+    set_llm_factory(stub_llm_factory(latency=args.latency))
+    # Cached responses would let the second mode skip the fake network entirely
+    set_llm_cache(None)
+    reports = reports_for(args.reports, args.reports)
+
+    results = {}
+    with temporary_site(args.reports) as root, open(os.devnull, 'w') as devnull:
+        for mode in ("one_by_one", "batched"):
+            write_site(root, args.reports)
+            registry.reset()
+            if mode == "batched":
+                triage_agent.set_fix_batching(args.batch_size, args.window)
+            else:
+                triage_agent.set_fix_batching(0)
+            with contextlib.redirect_stdout(devnull):
+                results[mode] = bench(reports, args.workers)
+            batching = triage_agent.fix_batching_stats()
+            triage_agent.set_fix_batching(0)
+
+    print(f"--- Fix Batching ({args.reports} reports, {args.workers} workers, "
+          f"{args.latency * 1000:.0f} ms per LLM call) ---")
+    for mode, result in results.items():
+        print(f"  {mode:<11}{result['seconds']:8.2f} s  {result['llm_calls']:5d} LLM calls  "
+              f"{result['css_writes']:4d} style.css writes  {result['verdicts']}")
+    print(f"  batches: {batching['batches']} (mean size {batching['mean_size']}, largest {batching['largest']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Times the procedural-memory similarity index (tools/memory_search.py): building
+it from N synthetic memories, adding one more, and top-k lookups.
+
+Usage (from the project root):
+    python -m benchmarks.memory_search --sizes 1000 10000 100000 --lookups 200
+"""
+import argparse
+import random
+import time
+
+from benchmarks.suite import percentile
+from tools.memory_search import MemorySearchIndex
+
+_ELEMENTS = ["contact button", "submit button", "header", "footer", "nav link",
+             "sidebar", "banner", "card title", "modal", "badge"]
+_COLORS = ["red", "blue", "green", "yellow", "orange", "purple", "pink", "black", "white", "gray"]
+
+
+class _ListStore:
+    """
+    The two methods of the memory store the index reads, over a plain list.
+    """
+    generation = 0
+
+    def __init__(self, entries: list):
+        self.entries = entries
+
+    def since(self, start: int) -> list:
+        return self.entries[start:]
+
+
+def synthetic_memories(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    memories = []
+    for i in range(count):
+        element = rng.choice(_ELEMENTS)
+        was, target = rng.sample(_COLORS, 2)
+        number = i % 1000
+        memories.append({
+            "bug": f"The {element} {number} is {was}, it should be {target}.",
+            "fix": f"Changed .{element.replace(' ', '-')}-{number} background-color to {target}",
+        })
+    return memories
+
+
+def bench(size: int, lookups: int, k: int) -> dict:
+    store = _ListStore(synthetic_memories(size))
+    index = MemorySearchIndex(store)
+    start = time.perf_counter()
+    len(index)
+    build = time.perf_counter() - start
+
+    store.entries.append({"bug": "The pricing table is gray, it should be white.",
+                          "fix": "Changed .pricing-table background-color to white"})
+    start = time.perf_counter()
+    found = index.search("the pricing table should be white", k)
+    add = time.perf_counter() - start
+    assert found and found[0].fix.startswith("Changed .pricing-table"), found
+
+    rng = random.Random(size)
+    times = []
+    for _ in range(lookups):
+        query = f"{rng.choice(_ELEMENTS)} {rng.randrange(1000)} is {rng.choice(_COLORS)}, it should be red"
+        start = time.perf_counter()
+        index.search(query, k)
+        times.append(time.perf_counter() - start)
+    return {
+        "build_s": build,
+        "add_and_search_ms": add * 1000,
+        "p50_ms": percentile(times, 50) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Memory counts.")
+    parser.add_argument("--lookups", type=int, default=200, help="Timed lookups per size.")
+    parser.add_argument("-k", type=int, default=3, help="Results per lookup.")
+    args = parser.parse_args()
+
+    print(f"--- Memory Similarity Index (top {args.k}) ---")
+    print(f"  {'memories':>9}  {'build s':>8}  {'add+search ms':>13}  {'p50 ms':>7}  {'p95 ms':>7}")
+    for size in args.sizes:
+        result = bench(size, args.lookups, args.k)
+        print(f"  {size:>9}  {result['build_s']:8.2f}  {result['add_and_search_ms']:13.2f}  "
+              f"{result['p50_ms']:7.2f}  {result['p95_ms']:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
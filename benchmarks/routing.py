@@ -0,0 +1,117 @@
+"""
+Compares pipeline latency with model routing off (each agent on its one
+hard-coded model) and on (latency-aware model choice plus hedged requests),
+when the 2.0 models have a heavy tail and gemini-2.5-flash is steady.
+Latencies are drawn from seeded lognormal distributions in the stub LLM.
+
+Usage (from the project root):
+    python -m benchmarks.routing --reports 24 --workers 4 --tail-p50 0.03 --tail-p95 0.5
+"""
+import argparse
+import contextlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import routing, triage_agent
+from agents.llm import set_llm_cache, set_llm_factory
+from agents.registry import registry
+from benchmarks.stub_llm import LatencyDistribution, stub_llm_factory
+from benchmarks.suite import percentile
+from benchmarks.workspace import reports_for, temporary_site, write_site
+
+LITE = "gemini-2.0-flash-lite"
+FLASH = "gemini-2.0-flash"
+STEADY = "gemini-2.5-flash"
+
+
+def scaled_routes(slo: float, timeout: float) -> dict:
+    """
+    The default routes with the SLO and call timeout scaled to the stub's latencies.
+    """
+    return {role: routing.Route(route.models, slo_seconds=slo, call_timeout=timeout,
+                                max_attempts=route.max_attempts, max_iterations=route.max_iterations,
+                                min_success_rate=route.min_success_rate)
+            for role, route in routing.DEFAULT_ROUTES.items()}
+
+def bench(reports: list, workers: int) -> dict:
+    """
+    Runs every report with up to `workers` pipelines in flight and returns their latencies.
+    """
+    def one(report):
+        start = time.perf_counter()
+        try:
+            result = triage_agent.run(report)
+        except Exception as e:
+            # Without routing there is no failover: an injected API error ends the pipeline
+            result = {"verdict": f"ERROR ({type(e).__name__})"}
+        return time.perf_counter() - start, result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(one, reports))
+    seconds = [elapsed for elapsed, _ in outcomes]
+    verdicts = {}
+    for _, result in outcomes:
+        verdicts[result["verdict"]] = verdicts.get(result["verdict"], 0) + 1
+    return {
+        "p50": percentile(seconds, 50),
+        "p95": percentile(seconds, 95),
+        "p99": percentile(seconds, 99),
+        "timed_out": sum(1 for _, result in outcomes if result.get("timed_out")),
+        "verdicts": verdicts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=24, help="Bug reports (one per button).")
+    parser.add_argument("--workers", type=int, default=4, help="Pipelines in flight.")
+    parser.add_argument("--tail-p50", type=float, default=0.03, help="Median seconds of the 2.0 models.")
+    parser.add_argument("--tail-p95", type=float, default=0.5, help="p95 seconds of the 2.0 models (the tail).")
+    parser.add_argument("--steady-p50", type=float, default=0.06, help="Median seconds of gemini-2.5-flash.")
+    parser.add_argument("--steady-p95", type=float, default=0.1, help="p95 seconds of gemini-2.5-flash.")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of 2.0 calls that fail.")
+    parser.add_argument("--slo", type=float, default=0.15, help="Routing p95 SLO, in seconds.")
+    args = parser.parse_args()
+
+    set_llm_cache(None)
+    reports = reports_for(args.reports, args.reports)
+
+    results, stats = {}, {}
+    with temporary_site(args.reports) as root, open(os.devnull, 'w') as devnull:
+        for mode in ("single_model", "routed"):
+            # Fresh, identically seeded distributions, so both modes see the same draws
+            set_llm_factory(stub_llm_factory(latencies={
+                LITE: LatencyDistribution(args.tail_p50, args.tail_p95, args.error_rate, seed=1),
+                FLASH: LatencyDistribution(args.tail_p50, args.tail_p95, args.error_rate, seed=2),
+                STEADY: LatencyDistribution(args.steady_p50, args.steady_p95, seed=3),
+            }))
+            routing.set_routing(mode == "routed", scaled_routes(args.slo, timeout=20 * args.slo))
+            registry.reset()
+            with contextlib.redirect_stdout(devnull):
+                # Build the agents and indexes outside the timed run
+                write_site(root, args.reports)
+                bench(reports[:args.workers], args.workers)
+                write_site(root, args.reports)
+                routing.router.reset()
+                results[mode] = bench(reports, args.workers)
+            stats[mode] = routing.routing_stats()
+        routing.set_routing(True, routing.DEFAULT_ROUTES)
+        registry.reset()
+
+    print(f"--- Model Routing ({args.reports} reports, {args.workers} workers; 2.0 models p50/p95 "
+          f"{args.tail_p50 * 1000:.0f}/{args.tail_p95 * 1000:.0f} ms, 2.5-flash "
+          f"{args.steady_p50 * 1000:.0f}/{args.steady_p95 * 1000:.0f} ms) ---")
+    for mode, result in results.items():
+        print(f"  {mode:<13}pipeline p50 {result['p50']:6.2f} s  p95 {result['p95']:6.2f} s  "
+              f"p99 {result['p99']:6.2f} s  {result['verdicts']}")
+    routed = stats["routed"]
+    print(f"  routed calls: {routed['calls']}  hedges: {routed['hedges']} (won {routed['hedge_wins']})  "
+          f"failovers: {routed['failovers']}  timeouts: {routed['timeouts']}")
+    for role, models in routed["roles"].items():
+        picks = ", ".join(f"{model} x{s['samples']} (p95 {s['p95_seconds']})" for model, s in models.items())
+        print(f"    {role:<11}{picks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Scripted failure scenarios for the Triage pipeline. Each one runs real reports
+through `triage_agent` on a synthetic site, with the stub LLM made to misbehave
+on cue (benchmarks/stub_llm.py, Scenario), and checks what the pipeline did:
+its verdict, the states it went through, style.css after any rollback, the
+procedural memory it wrote and the pipeline timings it recorded.
+
+Usage (from the project root):
+    python -m benchmarks.scenarios              # all scenarios; exit code 1 on a failed check
+    python -m benchmarks.scenarios timeout      # only the named ones
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+
+from agents.llm import set_llm_cache, set_llm_factory
+from agents.registry import registry
+from agents.routing import router, set_time_budgets
+from benchmarks.stub_llm import Scenario, stub_llm_factory
+from benchmarks.workspace import temporary_site
+
+BUTTONS = 3
+ORIGINAL = "#007bff"
+RED = "#ff0000"
+GREEN = "#00ff00"
+
+
+def _report(button: int) -> str:
+    return f"The button {button} is blue, it should be red."
+
+
+# --- 1. Reading What The Pipeline Left Behind ---
+
+def _background(button: int) -> str:
+    with open(os.path.join("world", "style.css"), encoding='utf-8') as f:
+        css = f.read()
+    match = re.search(rf"\.button-{button} \{{[^}}]*background-color:\s*([^;]+);", css)
+    return match.group(1).strip() if match else None
+
+def _memories() -> list:
+    with open(os.path.join("memory", "procedural_memory.jsonl"), encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _timed_runs() -> int:
+    try:
+        with open(os.path.join("memory", "pipeline_timings.json"), encoding='utf-8') as f:
+            return json.load(f)["runs"]
+    except OSError:
+        return 0
+
+def _add_look_alike(button: int):
+    # Another element with the button's label, and a rule of its own
+    path = os.path.join("world", "index.html")
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html.replace("</body>", f"    <span class=\"label-{button}\">Button {button}</span>\n</body>"))
+    with open(os.path.join("world", "style.css"), 'a', encoding='utf-8') as f:
+        f.write(f"\n.label-{button} {{\n    background-color: {ORIGINAL};\n}}\n")
+
+def _states(result: dict) -> list:
+    return [entry["state"] for entry in result["states"]]
+
+def _memory(button: int, value: str) -> dict:
+    return {"bug": _report(button), "fix": f"Changed .button-{button} background-color to {value}"}
+
+
+class Checks:
+    """
+    Collects the mismatches of one scenario.
+    """
+
+    def __init__(self):
+        self.failures = []
+
+    def expect(self, what: str, actual, expected):
+        if actual != expected:
+            self.failures.append(f"{what}: expected {expected!r}, got {actual!r}")
+
+
+# --- 2. The Scenarios ---
+
+def fail_then_pass(checks: Checks, run):
+    # QA fails the first fix; it is rolled back, and the retry passes
+    result = run(_report(0))
+    checks.expect("verdict", result["verdict"], "PASS")
+    checks.expect("states", _states(result),
+                  ["replay", "validate", "fix", "verify", "rollback", "fix", "verify", "report"])
+    checks.expect("button 0", _background(0), RED)
+    checks.expect("memory", _memories(), [_memory(0, RED)])
+    checks.expect("timed runs", _timed_runs(), 1)
+
+def always_fail(checks: Checks, run):
+    # Both attempts fail QA: the site ends as it began, nothing is remembered, and
+    # the same report later goes through the full pipeline instead of a replay
+    result = run(_report(0))
+    checks.expect("verdict", result["verdict"], "FAIL")
+    checks.expect("states", _states(result),
+                  ["replay", "validate", "fix", "verify", "rollback", "fix", "verify", "rollback", "report"])
+    checks.expect("rolled back", result["rolled_back"], True)
+    checks.expect("button 0", _background(0), ORIGINAL)
+    checks.expect("memory", _memories(), [])
+
+    from tools.memory_search import similar_fixes
+    checks.expect("few-shot examples", similar_fixes(_report(0)), [])
+    again = run(_report(0))
+    checks.expect("second run path", again["path"], "full_pipeline")
+    checks.expect("second run verdict", again["verdict"], "PASS")
+    checks.expect("memory after the second run", _memories(), [_memory(0, RED)])
+
+def timeout(checks: Checks, run):
+    # The Dev Agent patches style.css, then its next LLM call runs past the step budget
+    result = run(_report(0))
+    checks.expect("verdict", result["verdict"], "FAIL")
+    checks.expect("timed out", result["timed_out"], True)
+    checks.expect("states", _states(result), ["replay", "validate", "fix", "rollback", "report"])
+    checks.expect("button 0", _background(0), ORIGINAL)
+    checks.expect("memory", _memories(), [])
+    checks.expect("timed runs", _timed_runs(), 0)
+
+def conflict(checks: Checks, run):
+    # Another pipeline's fix lands before QA fails ours: nothing is rolled back over
+    # it, and there is no retry on top of a world that is no longer ours alone.
+    # A second element labelled "Button 0" leaves the rule-based judges unsure, so QA
+    # asks its LLM, and the other fix lands during that call.
+    _add_look_alike(0)
+    result = run(_report(0))
+    checks.expect("verdict", result["verdict"], "FAIL")
+    checks.expect("states", _states(result), ["replay", "validate", "fix", "verify", "rollback", "report"])
+    checks.expect("rolled back", result["rolled_back"], False)
+    checks.expect("button 0", _background(0), GREEN)
+    checks.expect("button 1 (the other fix)", _background(1), RED)
+    checks.expect("memory", _memories(), [])
+
+def not_valid(checks: Checks, run):
+    # An early NOT VALID exit is not a full pipeline run
+    result = run("The button 0 is red, it should be blue.")
+    checks.expect("verdict", result["verdict"], "NOT_VALID")
+    checks.expect("states", _states(result), ["replay", "validate", "report"])
+    checks.expect("button 0", _background(0), ORIGINAL)
+    checks.expect("timed runs", _timed_runs(), 0)
+
+def batch_separate(checks: Checks, run):
+    # Two reports fixed as one change set; one fix fails QA, is taken out of the
+    # change set, and is retried on its own
+    from agents import triage_agent
+
+    # Look-alikes leave the rule-based judges unsure, so the Bug-Hunter asks its LLM
+    # (which stalls a moment) and both reports are validating together
+    _add_look_alike(0)
+    _add_look_alike(1)
+    results = {}
+
+    def one(button):
+        results[button] = run(_report(button))
+
+    triage_agent.set_fix_batching(8, 0.5)
+    try:
+        threads = [threading.Thread(target=one, args=(button,)) for button in (0, 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        triage_agent.set_fix_batching(1)
+    checks.expect("verdicts", [results[0]["verdict"], results[1]["verdict"]], ["PASS", "PASS"])
+    checks.expect("states of the passing report", _states(results[0]), ["replay", "validate", "fix_batch", "report"])
+    checks.expect("states of the retried report", _states(results[1]),
+                  ["replay", "validate", "fix_batch", "fix", "verify", "report"])
+    checks.expect("buttons", [_background(0), _background(1)], [RED, RED])
+    checks.expect("memory", _memories(), [_memory(0, RED), _memory(1, RED)])
+
+def batch_alone(checks: Checks, run):
+    # A lone report doesn't wait out the batch window: no other pipeline could join
+    from agents import triage_agent
+
+    triage_agent.set_fix_batching(8, 5.0)
+    try:
+        result = run(_report(0))
+    finally:
+        triage_agent.set_fix_batching(1)
+    checks.expect("verdict", result["verdict"], "PASS")
+    checks.expect("states", _states(result), ["replay", "validate", "fix_batch", "fix", "verify", "report"])
+    checks.expect("waited out the window", result["state_seconds"].get("fix_batch", 0.0) >= 5.0, False)
+
+
+def _concurrent_fix():
+    from tools.css_patch import set_css_property
+    set_css_property(".button-1", "background-color", RED)
+
+
+# name: (check, Scenario factory, step budget in seconds)
+SCENARIOS = {
+    "fail_then_pass": (fail_then_pass, lambda: Scenario(wrong_values={_report(0): [GREEN]}), None),
+    "always_fail": (always_fail, lambda: Scenario(wrong_values={_report(0): [GREEN, GREEN]}), None),
+    # The Dev Agent's third call (after find_selector and set_css_property) stalls
+    "timeout": (timeout, lambda: Scenario(stalls={("dev", 2): 3.0}), 1.0),
+    "conflict": (conflict, lambda: Scenario(wrong_values={_report(0): [GREEN]},
+                                            before_call={("qa", 0): _concurrent_fix}), None),
+    "not_valid": (not_valid, lambda: Scenario(), None),
+    "batch_separate": (batch_separate, lambda: Scenario(wrong_values={_report(1): [GREEN]},
+                                                        stalls={("bug_hunter", 0): 0.2}), None),
+    "batch_alone": (batch_alone, lambda: Scenario(), None),
+}
+
+
+# --- 3. Running Them ---
+
+def run_scenario(name: str, use_async: bool = False) -> list:
+    """
+    Runs one scenario on a fresh synthetic site. Returns its failed checks.
+    """
+    from agents import triage_agent
+
+    check, make_scenario, step_seconds = SCENARIOS[name]
+    set_llm_factory(stub_llm_factory(scenario=make_scenario()))
+    set_llm_cache(None)
+    registry.reset()
+    router.reset()
+    set_time_budgets(step_seconds=step_seconds or 90.0)
+
+    def run(report):
+        return asyncio.run(triage_agent.arun(report)) if use_async else triage_agent.run(report)
+
+    checks = Checks()
+    try:
+        with temporary_site(BUTTONS), open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            check(checks, run)
+    finally:
+        set_time_budgets()
+        set_llm_factory(None)
+        registry.reset()
+    return checks.failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help=f"Scenarios to run (default: all): {', '.join(SCENARIOS)}.")
+    parser.add_argument("--sync-only", action="store_true", help="Skip the async (`arun`) pass.")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    failed = 0
+    for use_async in (False,) if args.sync_only else (False, True):
+        for name in args.names or SCENARIOS:
+            label = f"{name}{' (async)' if use_async else ''}"
+            failures = run_scenario(name, use_async)
+            print(f"{'FAIL' if failures else 'ok  '} {label}")
+            for failure in failures:
+                print(f"       {failure}")
+            failed += bool(failures)
+    if failed:
+        print(f"{failed} scenario run(s) failed.")
+        sys.exit(1)
+    print("All scenarios passed.")
+
+
+if __name__ == "__main__":
+    main()
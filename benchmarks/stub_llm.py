@@ -0,0 +1,365 @@
+import asyncio
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tools.colors import NAMED_COLORS, family_of, normalize_color
+
+# --- 1. A Scripted Stand-In For Gemini ---
+# It plays each agent's role the way a well-behaved model would: it calls the
+# tools in the order the prompt asks for, reads their observations, and answers
+# in the expected format. No network, fully deterministic, optional fake latency.
+
+_call_ids = itertools.count()
+
+def _tool_call(name: str, **args) -> AIMessage:
+    return _tool_calls([(name, args)])
+
+def _tool_calls(calls: list) -> AIMessage:
+    # Several calls in one turn, the way Gemini's parallel function calling sends them
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{next(_call_ids)}"}
+                                             for name, args in calls])
+
+def _element_phrase(report: str) -> str:
+    # "The contact button is blue, it should be red." -> "The contact button"
+    return re.split(r"\s+(?:is|are)\s+", report, maxsplit=1)[0]
+
+def _claimed_family(report: str):
+    before = re.split(r"should", report, maxsplit=1)[0].lower()
+    for word in re.findall(r"[a-z]+", before):
+        if word in NAMED_COLORS:
+            return family_of(word)
+    return None
+
+def _target_color(report: str):
+    match = re.search(r"should\s+be\s+([#\w-]+)", report, re.IGNORECASE)
+    return match.group(1).lower() if match else None
+
+def _top_selector(observation: str):
+    match = re.search(r"^1\.\s+(\S+)", observation, re.MULTILINE)
+    return match.group(1) if match else None
+
+def _observed_family(observation: str):
+    match = re.search(r"Found color:\s*(.+)", observation)
+    return family_of(match.group(1)) if match else None
+
+def _as_hex(color: str) -> str:
+    return normalize_color(color) or color
+
+def _selector_named_in(report: str, selectors: list):
+    # The selector for the report's element: all of its words appear in the report
+    # ("The button 3 ..." and .button-3)
+    words = set(re.findall(r"[a-z0-9]+", report.lower()))
+    for selector in selectors:
+        if set(re.findall(r"[a-z0-9]+", selector.lower())) <= words:
+            return selector
+    return None
+
+def _remembered_selector(report: str, examples: str):
+    # A past fix in the prompt for the same element
+    return _selector_named_in(report, re.findall(r"^- \".*\" -> Changed ([.#][\w-]+)", examples, re.MULTILINE))
+
+_CHANGES_HEADING = "THE FIX CHANGED ONLY THESE DECLARATIONS"
+
+def _split_changes(report: str):
+    # QA's input may end with the fix's rule-level diff: (report, [changed selectors])
+    report, _, changes = report.partition(_CHANGES_HEADING)
+    return report.strip(), list(dict.fromkeys(re.findall(r"^- (.+?) \{ ", changes, re.MULTILINE)))
+
+def _numbered_reports(text: str) -> list:
+    # A change set or a QA batch: "...:\n1. <report>\n2. <report>"
+    return re.findall(r"^\d+\.\s+(.+)$", text, re.MULTILINE)
+
+def _script_many(role: str, reports: list, observations: list, scenario=None) -> AIMessage:
+    # One turn of find_selector calls (one per report), then (Dev) one write and one
+    # memory save, or (QA) one turn of inspections and a numbered verdict per line
+    step, count = len(observations), len(reports)
+    if step == 0:
+        return _tool_calls([("find_selector", {"element_description": _element_phrase(report)})
+                            for report in reports])
+    selectors = [_top_selector(observation) or "" for observation in observations[:count]]
+    if role == "dev":
+        fixes = [(report, selector, _as_hex(_target_color(report) or ""))
+                 for report, selector in zip(reports, selectors)]
+        if step == count:
+            changes = [{"selector": selector, "property": "background-color",
+                        "value": scenario.fix_value(report, target) if scenario else target}
+                       for report, selector, target in fixes]
+            return _tool_call("set_css_properties", changes_json=json.dumps(changes))
+        if step == count + 1:
+            entries = [{"bug": report, "fix": f"Changed {selector} background-color to "
+                                              f"{scenario.written_value(report, target) if scenario else target}"}
+                       for report, selector, target in fixes]
+            return _tool_call("save_fixes_to_memory", fixes_json=json.dumps(entries))
+        return AIMessage(content="FIX APPLIED.")
+    if step == count:
+        return _tool_calls([("verify_element_color", {"selector_text": selector}) for selector in selectors])
+    lines = []
+    for n, (report, observation) in enumerate(zip(reports, observations[count:]), 1):
+        actual, target = _observed_family(observation), _target_color(report)
+        verdict = "PASS" if actual and target and actual == family_of(target) else "FAIL"
+        lines.append(f"{n}. {verdict}. {observation.splitlines()[0]}")
+    return AIMessage(content="\n".join(lines))
+
+
+def script_step(role: str, report: str, observations: list, tool_names: list,
+                system: str = "", scenario=None) -> AIMessage:
+    """
+    Decides the next message for `role`, given the tool observations so far
+    (and the system prompt, for the Dev Agent's few-shot examples).
+    A Scenario can make the Dev Agent write wrong values.
+    """
+    step = len(observations)
+
+    if role == "triage":
+        # Only asked to write the final report, from facts that carry the verdict
+        return AIMessage(content=f"Final report. {report}")
+
+    reports = _numbered_reports(report)
+    if role in ("dev", "qa") and len(reports) > 1:
+        return _script_many(role, reports, observations, scenario)
+
+    if role in ("bug_hunter", "qa"):
+        inspect_tool = "inspect_element_color" if role == "bug_hunter" else "verify_element_color"
+        # Given the fix's diff, QA inspects the changed selector for the element directly
+        report, changed = _split_changes(report)
+        selector = _selector_named_in(report, changed)
+        found = 0 if selector else 1
+        if step == 0 and not selector:
+            return _tool_call("find_selector", element_description=_element_phrase(report))
+        selector = selector or _top_selector(observations[0]) or ""
+        if step == found:
+            return _tool_call(inspect_tool, selector_text=selector)
+        observation = observations[found]
+        actual = _observed_family(observation)
+        if role == "bug_hunter":
+            if actual and actual == _claimed_family(report):
+                return AIMessage(content=f"VALIDATED. The user's report is accurate. {observation}")
+            return AIMessage(content=f"NOT VALID. The user's report is inaccurate. {observation}")
+        others = [other for other in changed if other != selector]
+        if others:
+            return AIMessage(content=f"FAIL. The fix also changed {', '.join(others)}, which is not the reported element.")
+        target = _target_color(report)
+        if actual and target and actual == family_of(target):
+            return AIMessage(content=f"PASS. {observation}")
+        return AIMessage(content=f"FAIL. {observation}")
+
+    if role == "dev":
+        # A remembered selector for the same element saves the find_selector turn
+        selector = _remembered_selector(report, system)
+        found = 0 if selector else 1
+        if step == 0 and not selector:
+            return _tool_call("find_selector", element_description=_element_phrase(report))
+        selector = selector or _top_selector(observations[0]) or ""
+        target = _as_hex(_target_color(report) or "")
+        if step == found:
+            return _tool_call("set_css_property", selector_text=selector, property_name="background-color",
+                              value=scenario.fix_value(report, target) if scenario else target)
+        if step == found + 1:
+            value = scenario.written_value(report, target) if scenario else target
+            return _tool_call("save_fix_to_memory", bug_description=report,
+                              fix_applied=f"Changed {selector} background-color to {value}")
+        return AIMessage(content="FIX APPLIED.")
+
+    return AIMessage(content="I don't know how to help with that.")
+
+
+# --- 2. Scripted Failures ---
+# A well-behaved model only ever takes the happy path. A Scenario makes it go
+# wrong on cue, so the pipeline's FAIL, rollback, retry and time-budget paths
+# can be run (and checked, see benchmarks/scenarios.py) without a real model.
+
+class Scenario:
+    """
+    Misbehavior for the stub to act out.
+
+    Args:
+        wrong_values: {bug report: [value, ...]}: the Dev Agent writes these values
+            for that report instead of the right one, one per Dev session, then the
+            right one. A retry's input (the report plus why the last fix failed) counts
+            as the same report.
+        stalls: {(role, step): seconds}: that role's LLM call after `step` tool
+            observations takes this long (e.g., to run past a time budget).
+        before_call: {(role, step): callable}: runs once, just before that call
+            (e.g., a concurrent write to style.css).
+    """
+
+    def __init__(self, wrong_values: dict = None, stalls: dict = None, before_call: dict = None):
+        self.wrong_values = {_first_line(report): list(values) for report, values in (wrong_values or {}).items()}
+        self.stalls = dict(stalls or {})
+        self.before_call = dict(before_call or {})
+        self._written = {}
+        self._lock = threading.Lock()
+
+    def fix_value(self, report: str, target: str) -> str:
+        """
+        The value the Dev Agent writes for `report` in this session.
+        """
+        key = _first_line(report)
+        with self._lock:
+            values = self.wrong_values.get(key)
+            value = values.pop(0) if values else target
+            self._written[key] = value
+        return value
+
+    def written_value(self, report: str, target: str) -> str:
+        """
+        The value the Dev Agent last wrote for `report` (what it saves to memory).
+        """
+        with self._lock:
+            return self._written.get(_first_line(report), target)
+
+    def on_call(self, role: str, step: int) -> float:
+        """
+        Runs the hook for this call, if any, and returns the seconds it stalls.
+        """
+        with self._lock:
+            hook = self.before_call.pop((role, step), None)
+        if hook is not None:
+            hook()
+        return self.stalls.get((role, step), 0.0)
+
+
+def _first_line(report: str) -> str:
+    return report.strip().splitlines()[0].strip() if report.strip() else ""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    A rough token count (about 4 characters per token, as for English text and code).
+    """
+    return math.ceil(len(text) / 4)
+
+def _message_text(message) -> str:
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    return text + (json.dumps(tool_calls) if tool_calls else "")
+
+
+class StubLLMError(RuntimeError):
+    """
+    An injected API failure (what a 500 or a dropped connection would raise).
+    """
+
+
+class LatencyDistribution:
+    """
+    Fake network time drawn from a lognormal with the given median and p95, so a
+    few calls take several times the median, the way real API calls do.
+    A share `error_rate` of calls fail (after their latency) with StubLLMError.
+    Seeded, so a benchmark run is repeatable.
+    """
+
+    def __init__(self, p50: float, p95: float = None, error_rate: float = 0.0, seed: int = 0):
+        p95 = p95 if p95 is not None else p50
+        self.p50 = p50
+        self.p95 = p95
+        self.error_rate = error_rate
+        self._mu = math.log(p50) if p50 > 0 else None
+        # p95 = median * exp(1.645 * sigma)
+        self._sigma = math.log(p95 / p50) / 1.645 if p50 > 0 and p95 > p50 else 0.0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """
+        Returns (seconds to wait, whether the call should fail).
+        """
+        with self._lock:
+            seconds = self._random.lognormvariate(self._mu, self._sigma) if self._mu is not None else 0.0
+            return seconds, self._random.random() < self.error_rate
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    A local chat model that follows `script_step`, with `latency` seconds of fake
+    network time per call (blocking `time.sleep` for sync, `asyncio.sleep` for async),
+    or a per-call draw from `latency_model` (a LatencyDistribution) when one is set.
+    Each reply carries estimated prompt/completion token counts in `usage_metadata`.
+    A `scenario` (Scenario) adds scripted wrong fixes, stalls and hooks.
+    """
+
+    role: str
+    model: str = "scripted"
+    latency: float = 0.0
+    latency_model: Any = None
+    scenario: Any = None
+    tool_names: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(t, "name", None) or getattr(t, "__name__", str(t)) for t in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _next_message(self, messages) -> ChatResult:
+        report = next((m.content for m in messages if isinstance(m, HumanMessage)), "")
+        observations = [m.content for m in messages if isinstance(m, ToolMessage)]
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        message = script_step(self.role, report, observations, self.tool_names, system, self.scenario)
+        # Report token estimates the way a real model reports usage
+        prompt_tokens = sum(estimate_tokens(_message_text(m)) for m in messages)
+        completion_tokens = estimate_tokens(_message_text(message))
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _delay(self):
+        if self.latency_model is None:
+            return self.latency, False
+        return self.latency_model.sample()
+
+    def _scripted_stall(self, messages) -> float:
+        if self.scenario is None:
+            return 0.0
+        return self.scenario.on_call(self.role, sum(isinstance(m, ToolMessage) for m in messages))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        seconds, fail = self._delay()
+        seconds += self._scripted_stall(messages)
+        if seconds:
+            time.sleep(seconds)
+        if fail:
+            raise StubLLMError(f"{self.model} failed (injected error)")
+        return self._next_message(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        seconds, fail = self._delay()
+        seconds += await asyncio.to_thread(self._scripted_stall, messages)
+        if seconds:
+            await asyncio.sleep(seconds)
+        if fail:
+            raise StubLLMError(f"{self.model} failed (injected error)")
+        return self._next_message(messages)
+
+
+def stub_llm_factory(latency: float = 0.0, latencies: dict = None, scenario: Scenario = None):
+    """
+    Returns a factory for `agents.llm.set_llm_factory` that builds ScriptedChatModels.
+
+    Args:
+        latency: Fixed fake seconds per call.
+        latencies: {model name: LatencyDistribution}, overriding `latency` for
+            those models (shared by every agent that uses the model).
+        scenario: Scripted failures shared by every agent (see Scenario).
+    """
+    latencies = latencies or {}
+
+    def factory(model: str, role: str):
+        return ScriptedChatModel(role=role, model=model, latency=latency, latency_model=latencies.get(model),
+                                 scenario=scenario)
+    return factory
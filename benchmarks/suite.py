@@ -0,0 +1,370 @@
+"""
+The offline benchmark suite. Two parts:
+
+1. pipeline: runs `triage_agent.run` end to end on a synthetic site with the
+   scripted stub LLM, and reports p50/p95 latency per agent and per tool,
+   LLM turns and estimated prompt/completion tokens per agent.
+2. scaling: sweeps synthetic world/ sites from 1 to 100k CSS rules and from
+   1 KB to 10 MB of HTML, timing `get_element_color` and `get_html_content`.
+
+Results are compared against a saved baseline (benchmarks/baseline.json).
+What the stub LLM makes deterministic (LLM turns, tokens, tool calls and
+pipeline paths) must match it; with --check the exit code is 1 if it doesn't.
+Timings depend on the machine, so they are only reported, unless
+--check-timings makes a slowdown beyond --tolerance fail the check too.
+
+Usage (from the project root):
+    python -m benchmarks.suite                      # full run, compare to baseline
+    python -m benchmarks.suite --quick              # smaller sweep
+    python -m benchmarks.suite --save-baseline      # record a new baseline
+"""
+import argparse
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from agents.llm import set_llm_cache, set_llm_factory
+from agents.registry import registry
+from benchmarks.stub_llm import stub_llm_factory
+from benchmarks.workspace import reports_for, temporary_site, write_scaled_site
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# The Triage orchestrator's states that run a sub-agent
+STATE_AGENTS = {"validate": "bug_hunter", "fix_batch": "dev", "fix": "dev", "verify": "qa"}
+
+RULE_COUNTS = [1, 10, 100, 1_000, 10_000, 100_000]
+HTML_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+QUICK_RULE_COUNTS = [1, 100, 10_000]
+QUICK_HTML_SIZES = [1_000, 100_000, 1_000_000]
+
+
+# --- 1. Recording What The Pipeline Did ---
+
+class RunRecorder(BaseCallbackHandler):
+    """
+    Collects tool durations, LLM turns and token usage from LangChain callbacks,
+    attributing each LLM call to the agent that made it.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+        self.tool_times = {}
+        self.llm_turns = {}
+        self.tokens = {}
+
+    def _start(self, run_id, parent_run_id, kind: str, name: str):
+        with self._lock:
+            self._runs[run_id] = (kind, name, parent_run_id, time.perf_counter())
+
+    def _agent_of(self, run_id) -> str:
+        # Walk up to the nearest agent executor (e.g., "dev_agent" -> "dev")
+        while run_id in self._runs:
+            kind, name, parent, _ = self._runs[run_id]
+            if kind == "chain" and name.endswith("_agent"):
+                return name[:-len("_agent")]
+            run_id = parent
+        return "triage"
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "chain", kwargs.get("name") or "chain")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, "tool", name)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        with self._lock:
+            kind, name, _, start = self._runs[run_id]
+            self.tool_times.setdefault(name, []).append(time.perf_counter() - start)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.on_tool_end(None, run_id=run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "llm", "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            agent = self._agent_of(run_id)
+            self.llm_turns[agent] = self.llm_turns.get(agent, 0) + 1
+            usage = {}
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    usage = getattr(message, "usage_metadata", None) or usage
+            counts = self.tokens.setdefault(agent, {"prompt": 0, "completion": 0})
+            counts["prompt"] += usage.get("input_tokens", 0)
+            counts["completion"] += usage.get("output_tokens", 0)
+
+
+# Every LangChain run started while this is set reports to the recorder,
+# including the sub-agents the Triage orchestrator starts.
+_recorder_var = contextvars.ContextVar("benchmark_recorder", default=None)
+register_configure_hook(_recorder_var, inheritable=True)
+
+
+def percentile(values: list, p: float) -> float:
+    """
+    The p-th percentile (0-100) of `values`, linearly interpolated.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * p / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def _latency_summary(values: list) -> dict:
+    return {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+
+
+# --- 2. The End-To-End Pipeline Benchmark ---
+
+def bench_pipeline(pipelines: int, latency: float) -> dict:
+    """
+    Runs `pipelines` bug reports through `triage_agent.run`, one at a time.
+    One extra warm-up report runs first (unrecorded), so agent construction and
+    first-parse costs don't skew the percentiles; see `main.py --profile-startup` for those.
+    """
+    from agents import triage_agent
+
+    set_llm_factory(stub_llm_factory(latency=latency))
+    set_llm_cache(None)  # every run should pay for its LLM calls
+    registry.reset()
+
+    recorder = RunRecorder()
+    triage_times = []
+    state_times = {agent: [] for agent in STATE_AGENTS.values()}
+    paths = {}
+    with temporary_site(pipelines + 1), open(os.devnull, 'w') as devnull:
+        warm_up, *reports = reports_for(pipelines + 1, pipelines + 1)
+        with contextlib.redirect_stdout(devnull):
+            triage_agent.run(warm_up)
+
+        for report in reports:
+            token = _recorder_var.set(recorder)
+            try:
+                with contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    result = triage_agent.run(report)
+                    triage_times.append(time.perf_counter() - start)
+            finally:
+                _recorder_var.reset(token)
+            paths[result["path"]] = paths.get(result["path"], 0) + 1
+            for state, seconds in result["state_seconds"].items():
+                if state in STATE_AGENTS:
+                    state_times[STATE_AGENTS[state]].append(seconds)
+
+    agents = {"triage": _latency_summary(triage_times)}
+    for agent, times in state_times.items():
+        agents[agent] = _latency_summary(times)
+    tools = {name: _latency_summary(times) for name, times in sorted(recorder.tool_times.items())}
+    return {
+        "pipelines": pipelines,
+        "latency_per_llm_call": latency,
+        "paths": paths,
+        "agents": agents,
+        "tools": tools,
+        "llm_turns": dict(sorted(recorder.llm_turns.items())),
+        "tokens": dict(sorted(recorder.tokens.items())),
+    }
+
+
+# --- 3. Tool Scaling Sweeps ---
+
+def _time(func, repeats: int) -> float:
+    # Median of `repeats` calls
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return percentile(times, 50)
+
+def bench_scaling(rule_counts: list, html_sizes: list, repeats: int = 5, budget: float = 60.0) -> dict:
+    """
+    Times `get_element_color` (cold = first parse, warm = cached) against the number
+    of CSS rules, and `get_html_content` against the size of index.html.
+
+    A size whose cold parse is projected (linearly from the previous one) to take
+    longer than `budget` seconds is skipped and recorded as None.
+    """
+    from tools.css_cache import stylesheet_cache
+    from tools.web_inspector import CSS_FILE_PATH, get_element_color, get_html_content
+
+    results = {"get_element_color": {}, "get_html_content": {}}
+    previous = None
+    for rules in rule_counts:
+        if previous and previous[1] * rules / previous[0] > budget:
+            results["get_element_color"][str(rules)] = None
+            print(f"  get_element_color  {rules:>9,} rules   skipped (projected over {budget:.0f} s)")
+            continue
+        with temporary_site() as root:
+            write_scaled_site(root, rules, 1_000)
+            selector = f".rule-{rules - 1}"
+            stylesheet_cache.invalidate(CSS_FILE_PATH)
+            cold = _time(lambda: get_element_color(selector), 1)
+            warm = _time(lambda: get_element_color(selector), repeats)
+            stylesheet_cache.invalidate(CSS_FILE_PATH)
+        previous = (rules, cold)
+        results["get_element_color"][str(rules)] = {"cold": cold, "warm": warm}
+        print(f"  get_element_color  {rules:>9,} rules   cold {cold * 1000:10.2f} ms   warm {warm * 1000:8.3f} ms")
+
+    for size in html_sizes:
+        with temporary_site() as root:
+            write_scaled_site(root, 1, size)
+            elapsed = _time(get_html_content, repeats)
+        results["get_html_content"][str(size)] = {"read": elapsed}
+        print(f"  get_html_content   {size:>9,} bytes  read {elapsed * 1000:10.2f} ms")
+    return results
+
+
+# --- 4. Comparing Against The Baseline ---
+
+# Timing differences smaller than this are noise, whatever the ratio
+NOISE_FLOOR_SECONDS = 0.002
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def _is_timing(name: str) -> bool:
+    return name.endswith((".p50", ".p95", ".cold", ".warm", ".read"))
+
+def _is_count(name: str) -> bool:
+    # Deterministic with the stub LLM: the same reports make the same calls
+    return name.endswith(".count") or name.startswith(("pipeline.llm_turns.", "pipeline.paths."))
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple:
+    """
+    Compares results with the baseline.
+
+    Returns:
+        (regressions, slower): human-readable lines. `regressions` are changes in
+        LLM turns, tool or agent call counts, pipeline paths and (for the same
+        number of reports) tokens. Counts are compared per report, so a run with
+        fewer reports than the baseline is still checked. `slower` are latencies
+        more than `tolerance` (e.g. 0.25 = 25%) above the baseline's, which
+        depend on the machine the baseline was recorded on.
+    """
+    current, previous = _flatten(results), _flatten(baseline)
+    reports = results.get("pipeline", {}).get("pipelines")
+    baseline_reports = baseline.get("pipeline", {}).get("pipelines")
+    regressions, slower = [], []
+    for name, value in sorted(current.items()):
+        if name not in previous:
+            continue
+        before = previous[name]
+        if _is_timing(name):
+            if value > before * (1 + tolerance) and value - before > NOISE_FLOOR_SECONDS:
+                slower.append(f"{name}: {before * 1000:.2f} ms -> {value * 1000:.2f} ms "
+                              f"({value / before:.2f}x)")
+        elif _is_count(name) and reports and baseline_reports:
+            if abs(value / reports - before / baseline_reports) > 1e-9:
+                regressions.append(f"{name}: {before / baseline_reports:g} -> {value / reports:g} per report")
+        elif name.startswith("pipeline.tokens.") and reports == baseline_reports:
+            # The synthetic site grows with the number of reports, and so do the prompts
+            if value != before:
+                regressions.append(f"{name}: {before} -> {value}")
+    # A count that appears or disappears (e.g. a tool no longer called) changed too
+    for name in sorted(set(previous) ^ set(current)):
+        if _is_count(name) and name.startswith("pipeline."):
+            regressions.append(f"{name}: {previous.get(name, 0)} -> {current.get(name, 0)}")
+    return regressions, slower
+
+
+def _print_pipeline(results: dict):
+    print(f"--- Pipeline ({results['pipelines']} reports, "
+          f"{results['latency_per_llm_call'] * 1000:.0f} ms per LLM call) ---")
+    print(f"  paths: {results['paths']}")
+    print("  agent               p50 ms    p95 ms  LLM turns  prompt tok  completion tok")
+    for agent, summary in results["agents"].items():
+        tokens = results["tokens"].get(agent, {"prompt": 0, "completion": 0})
+        print(f"  {agent:<16}{summary['p50'] * 1000:10.1f}{summary['p95'] * 1000:10.1f}"
+              f"{results['llm_turns'].get(agent, 0):11d}{tokens['prompt']:12d}{tokens['completion']:16d}")
+    print("  tool                          calls    p50 ms    p95 ms")
+    for tool, summary in results["tools"].items():
+        print(f"  {tool:<28}{summary['count']:7d}{summary['p50'] * 1000:10.2f}{summary['p95'] * 1000:10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipelines", type=int, default=20, help="Bug reports to run end to end.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake seconds per LLM call.")
+    parser.add_argument("--quick", action="store_true", help="Smaller scaling sweep (up to 10k rules, 1 MB HTML).")
+    parser.add_argument("--budget", type=float, default=60.0,
+                        help="Skip sweep sizes projected to take longer than this many seconds.")
+    parser.add_argument("--skip-scaling", action="store_true", help="Only run the pipeline benchmark.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against / save to.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%).")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if LLM turns, tokens, call counts or paths changed.")
+    parser.add_argument("--check-timings", action="store_true",
+                        help="With --check, also fail on latencies beyond --tolerance (same machine only).")
+    parser.add_argument("--output", help="Also write the full results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {"pipeline": bench_pipeline(args.pipelines, args.latency)}
+    _print_pipeline(results["pipeline"])
+
+    if not args.skip_scaling:
+        print("--- Tool scaling ---")
+        results["scaling"] = bench_scaling(
+            QUICK_RULE_COUNTS if args.quick else RULE_COUNTS,
+            QUICK_HTML_SIZES if args.quick else HTML_SIZES,
+            budget=args.budget,
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions, slower = compare(results, baseline, args.tolerance)
+    print(f"--- Compared with {os.path.relpath(args.baseline)} ---")
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+    else:
+        print("  No regressions in LLM turns, tokens, call counts or paths.")
+    if slower:
+        label = "Slower than the baseline" + ("" if args.check_timings else
+                                               " (for information; timings depend on the machine)")
+        print(f"{label}:")
+        for line in slower:
+            print(f"  {line}")
+    if args.check and (regressions or (args.check_timings and slower)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import contextlib
+import os
+import shutil
+import tempfile
+
+# --- Throwaway Sites For Benchmarks ---
+# Benchmarks never touch the real world/ and memory/ folders. They build a
+# synthetic site in a temp directory and run from there (all tool paths are
+# relative to the working directory).
+
+def write_site(root: str, buttons: int):
+    """
+    Writes world/index.html and world/style.css with `buttons` blue buttons
+    (.button-0 ... .button-N), plus an empty memory/ folder.
+    """
+    os.makedirs(os.path.join(root, "world"), exist_ok=True)
+    os.makedirs(os.path.join(root, "memory"), exist_ok=True)
+
+    html = ["<!DOCTYPE html>", "<html lang=\"en\">", "<head>",
+            "    <link rel=\"stylesheet\" href=\"style.css\">", "</head>", "<body>"]
+    html += [f"    <button class=\"button-{i}\">Button {i}</button>" for i in range(buttons)]
+    html += ["</body>", "</html>"]
+    with open(os.path.join(root, "world", "index.html"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(html))
+
+    css = [f".button-{i} {{\n    background-color: #007bff;\n    color: white;\n}}\n" for i in range(buttons)]
+    with open(os.path.join(root, "world", "style.css"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(css))
+
+    open(os.path.join(root, "memory", "procedural_memory.jsonl"), 'w').close()
+
+def write_scaled_site(root: str, rules: int, html_bytes: int):
+    """
+    Writes a world/ with `rules` CSS rules (.rule-0 ... .rule-N) and an index.html
+    padded with filler paragraphs to about `html_bytes` bytes, for tool-scaling runs.
+    """
+    os.makedirs(os.path.join(root, "world"), exist_ok=True)
+    os.makedirs(os.path.join(root, "memory"), exist_ok=True)
+
+    css = "\n".join(
+        f".rule-{i} {{\n    background-color: #{i * 2654435761 % 0xffffff:06x};\n    color: white;\n}}\n"
+        for i in range(rules)
+    )
+    with open(os.path.join(root, "world", "style.css"), 'w', encoding='utf-8') as f:
+        f.write(css)
+
+    head = ("<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
+            "    <link rel=\"stylesheet\" href=\"style.css\">\n</head>\n<body>\n"
+            f"    <button class=\"rule-{max(rules - 1, 0)}\">Target</button>\n")
+    tail = "</body>\n</html>\n"
+    filler, size, i = [], len(head) + len(tail), 0
+    while size < html_bytes:
+        line = f"    <p class=\"filler-{i}\">Filler paragraph {i} with some ordinary page text.</p>\n"
+        filler.append(line)
+        size += len(line)
+        i += 1
+    with open(os.path.join(root, "world", "index.html"), 'w', encoding='utf-8') as f:
+        f.write(head + "".join(filler) + tail)
+
+    open(os.path.join(root, "memory", "procedural_memory.jsonl"), 'w').close()
+
+def reports_for(buttons: int, count: int) -> list:
+    """
+    One valid "blue -> red" report per button, cycling if count > buttons.
+    """
+    return [f"The button {i % buttons} is blue, it should be red." for i in range(count)]
+
+@contextlib.contextmanager
+def temporary_site(buttons: int = 0):
+    """
+    Creates a synthetic site in a temp directory and chdirs into it for the duration.
+    With `buttons=0` the directory is left empty for the caller to fill.
+    """
+    previous = os.getcwd()
+    root = tempfile.mkdtemp(prefix="agentic-bench-")
+    try:
+        if buttons:
+            write_site(root, buttons)
+        os.chdir(root)
+        yield root
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(root, ignore_errors=True)
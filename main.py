@@ -1,5 +1,7 @@
-import google.generativeai as genai
+import argparse
 import os
+import sys
+import warnings
 from dotenv import load_dotenv
 
 # --- 1. Load API Key ---
@@ -7,43 +9,267 @@ print("Loading environment variables...")
 load_dotenv()
 
 # --- 2. Configure the Gemini API ---
-try:
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    print("Google API Key configured.")
-except Exception as e:
-    print(f"Error configuring Google API: {e}")
-    print("Please make sure you have a .env file with GOOGLE_API_KEY=YOUR_KEY")
-    exit() # Exit if the key is not found
-
-# --- 3. Import Our Agent System ---
-# This import works because we have the 'agents/__init__.py' file
-from agents import triage_agent
-import warnings
+# google.generativeai is heavy, so it is only imported once we actually
+# need to talk to Gemini (after the user has typed their report).
+def configure_gemini():
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        print("Google API Key configured.")
+    except Exception as e:
+        print(f"Error configuring Google API: {e}")
+        print("Please make sure you have a .env file with GOOGLE_API_KEY=YOUR_KEY")
+        exit() # Exit if the key is not found
 
 # Suppress specific warnings from langchain to keep the output clean
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.prompts.chat")
 
+# --- 3. Run Our Agent System ---
 def run_agent_system():
     """
     This is the main function where our agent system will run.
     """
     print("--- AgentOps Self-Healing System ---")
-    
+
     # 1. Get user input:
     print("\nAGENT: Hello! I am the Triage Agent. I can help fix bugs on our website.")
     bug_report = input("AGENT: Please describe the bug: ")
-    
+
     # 2. Start the Triage Agent:
     # This single call will trigger the entire multi-agent workflow
     # (Triage -> Bug-Hunter -> Dev -> QA)
-    final_result = triage_agent.run(bug_report)
-    
+    # Agents are built lazily, so importing them here is cheap.
+    configure_gemini()
+    from agents import triage_agent
+    from agents.context import record_context_savings
+    with record_context_savings() as context:
+        final_result = triage_agent.run(bug_report)
+
     # 3. Print the full trace and final answer:
     print("\n--- [Triage Agent] FINAL REPORT ---")
     print(final_result['output'])
+    print(f"Path: {final_result['path']} ({final_result['elapsed_seconds']:.1f}s)")
+    print("States: " + ", ".join(f"{state} {seconds:.1f}s" for state, seconds in final_result['state_seconds'].items()))
+    if final_result.get('time_saved_seconds'):
+        print(f"Time saved by replaying from memory: ~{final_result['time_saved_seconds']:.1f}s")
+    if context.tokens_saved:
+        print(f"Prompt context: ~{context.tokens_saved:,} tokens of tool observations saved by compaction")
+    from agents.llm import get_llm_cache
+    cache = get_llm_cache()
+    if cache is not None and cache.hits:
+        print(f"LLM responses served from cache: {cache.hits} of {cache.hits + cache.misses}")
     print("-----------------------------------")
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AgentOps Self-Healing System")
+    parser.add_argument(
+        "--batch",
+        metavar="REPORTS_JSONL",
+        help="Process every bug report in a JSONL file instead of asking for one.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived local job server with warm agents (see --host, --port, --max-queue).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of pipelines to run concurrently in --batch and --serve mode (default: 4).",
+    )
+    parser.add_argument(
+        "--output",
+        default="batch_results.jsonl",
+        help="Where --batch mode writes one JSON result per report (default: batch_results.jsonl).",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address --serve mode listens on (default: 127.0.0.1, this machine only).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port --serve mode listens on (default: 8765).",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=100,
+        help="In --serve mode, refuse new jobs (HTTP 429) while this many are waiting (default: 100).",
+    )
+    parser.add_argument(
+        "--site",
+        default="default",
+        help="Which site to heal: a name under sites/, or a directory containing world/ "
+             "(default: this repository's world/ and memory/). In --batch mode, reports "
+             "can name their own site with a \"site\" field.",
+    )
+    parser.add_argument(
+        "--site-processes",
+        type=int,
+        default=0,
+        metavar="N",
+        help="In --batch mode, run pipelines in N worker processes with each site pinned "
+             "to one of them, so different sites heal in parallel (default: 0, threads only).",
+    )
+    parser.add_argument(
+        "--fix-batch-size",
+        type=int,
+        default=8,
+        metavar="N",
+        help="In --batch (threads) and --serve mode, fix up to N validated reports for the same "
+             "site as one change set with one QA pass (default: 8; 0 or 1 fixes each on its own).",
+    )
+    parser.add_argument(
+        "--fix-batch-window",
+        type=float,
+        default=0.25,
+        metavar="SECONDS",
+        help="How long a fix batch waits for more validated reports before it starts; it starts "
+             "sooner once no other report for its site is being validated or fixed (default: 0.25).",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always call the LLM instead of reusing cached responses from memory/llm_cache.sqlite3.",
+    )
+    parser.add_argument(
+        "--llm-report",
+        action="store_true",
+        help="Have the Triage Agent's LLM write the final report as prose (one extra LLM call per report).",
+    )
+    parser.add_argument(
+        "--no-routing",
+        action="store_true",
+        help="Give each agent its one fixed model, with no latency routing, hedging or call timeouts.",
+    )
+    parser.add_argument(
+        "--step-timeout",
+        type=float,
+        default=90.0,
+        help="Seconds each pipeline step may spend waiting on LLM calls (default: 90).",
+    )
+    parser.add_argument(
+        "--pipeline-timeout",
+        type=float,
+        default=300.0,
+        help="Seconds one whole pipeline may take before it stops and rolls back (default: 300).",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=1500,
+        metavar="TOKENS",
+        help="Most tokens one tool observation may add to an agent's prompt: the page is sent as a "
+             "digest of its elements, and longer observations are cut (default: 1500; 0 sends them in full).",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Turn off the step-by-step console narration (spans are still recorded).",
+    )
+    parser.add_argument(
+        "--trace-file",
+        default=os.path.join("logs", "spans.jsonl"),
+        help="Where spans are written as rotating JSONL (default: logs/spans.jsonl).",
+    )
+    parser.add_argument(
+        "--no-trace",
+        action="store_true",
+        help="Don't record spans.",
+    )
+    parser.add_argument(
+        "--prometheus-textfile",
+        metavar="PATH",
+        help="Also export span counters in Prometheus text format to PATH (e.g., for node_exporter).",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import and agent construction times, then exit.",
+    )
+    return parser.parse_args(argv)
+
+
 # --- 4. Start the Program ---
 if __name__ == "__main__":
-    run_agent_system()
\ No newline at end of file
+    args = parse_args()
+    if args.no_llm_cache:
+        from agents.llm import set_llm_cache
+        set_llm_cache(None)
+    if args.llm_report:
+        from agents.triage_agent import set_llm_report
+        set_llm_report(True)
+    if args.quiet:
+        from agents.tracing import set_verbose
+        set_verbose(False)
+    if args.no_routing:
+        from agents.routing import set_routing
+        set_routing(False)
+    from agents.routing import set_time_budgets
+    set_time_budgets(args.step_timeout, args.pipeline_timeout)
+    from agents.context import set_context_budget
+    set_context_budget(args.context_budget)
+    if not args.no_trace:
+        # Cheap: the LangChain hook is only installed when the first agent is built
+        from agents.tracing import configure_tracing
+        configure_tracing(args.trace_file, prometheus_path=args.prometheus_textfile)
+    if args.profile_startup:
+        # The agents read GOOGLE_API_KEY themselves, so genai stays un-imported
+        # here and its import time shows up in the report.
+        from agents.registry import profile_startup
+        print(profile_startup())
+        sys.exit(0)
+    if args.serve or (args.batch and args.site_processes <= 0):
+        # Only overlapping pipelines can share a fix; worker processes run a site's one at a time
+        from agents.triage_agent import set_fix_batching
+        set_fix_batching(args.fix_batch_size, args.fix_batch_window)
+    if args.serve:
+        from server import serve
+        configure_gemini()
+        serve(args.host, args.port, args.workers, args.max_queue, site=args.site)
+        sys.exit(0)
+    if args.batch:
+        from batch_runner import run_batch
+        from site_scheduler import configure_worker
+        configure_gemini()
+        summary = run_batch(
+            args.batch, args.output, args.workers, site=args.site,
+            site_processes=args.site_processes,
+            worker_initializer=configure_worker,
+            worker_initargs=(not args.no_llm_cache, not args.quiet,
+                             None if args.no_trace else args.trace_file, args.llm_report,
+                             not args.no_routing, args.step_timeout, args.pipeline_timeout,
+                             args.context_budget),
+        )
+        print("\n--- Batch Summary ---")
+        print(f"Reports: {summary['reports']} {summary['verdicts']}")
+        print(f"Elapsed: {summary['elapsed_seconds']}s")
+        print(f"Throughput: {summary['reports_per_minute']} reports/minute")
+        if summary.get('llm_cache'):
+            cache = summary['llm_cache']
+            print(f"LLM cache: {cache['hits']} hits / {cache['misses']} misses "
+                  f"(hit rate {cache['hit_rate']:.0%}, {cache['entries']} entries)")
+        if summary.get('coalescing'):
+            coalescing = summary['coalescing']
+            print(f"Coalesced duplicate reports: {coalescing['coalesced']} of {coalescing['calls']} "
+                  f"(ratio {coalescing['coalescing_ratio']:.0%}, ~{coalescing['seconds_saved']:.1f}s of pipeline time saved)")
+        if summary.get('fix_batching'):
+            batching = summary['fix_batching']
+            print(f"Fix batches: {batching['batches']} for {batching['reports']} validated reports "
+                  f"(mean size {batching['mean_size']}, largest {batching['largest']})")
+        if summary.get('routing'):
+            routing = summary['routing']
+            print(f"Routed LLM calls: {routing['calls']} (hedges {routing['hedges']}, won {routing['hedge_wins']}; "
+                  f"failovers {routing['failovers']}; timeouts {routing['timeouts']})")
+        if summary.get('context_tokens_saved'):
+            print(f"Prompt context: ~{summary['context_tokens_saved']:,} tokens of tool observations saved by compaction")
+        print(f"Results written to {args.output}")
+        sys.exit(0)
+    from tools.site import use_site
+    with use_site(args.site):
+        run_agent_system()
@@ -1,9 +1,13 @@
+import argparse
 import os
-import json
 
-# Define paths
+from tools.memory_store import MEMORY_LOG_PATH, ProceduralMemoryStore
+from tools.site import DEFAULT_SITE_NAME, current_site, use_site
+from tools.snapshots import SnapshotError, atomic_write, get_snapshot_store
+
+# Define paths (of the default site; --site picks another one)
 CSS_PATH = os.path.join("world", "style.css")
-MEMORY_PATH = os.path.join("memory", "procedural_memory.json")
+MEMORY_PATH = MEMORY_LOG_PATH
 
 # 1. The "Buggy" Blue CSS (The Default State)
 DEFAULT_CSS = """body {
@@ -20,26 +24,85 @@ DEFAULT_CSS = """body {
     cursor: pointer;
 }"""
 
+DEFAULT_SNAPSHOT = "default"
+
 def reset_environment():
-    print("--- Resetting AgentOps Environment ---")
+    site = current_site()
+    print(f"--- Resetting AgentOps Environment ({site.name}) ---")
     
-    # Reset CSS
+    # Reset CSS (and keep the default state as a named snapshot)
     try:
-        with open(CSS_PATH, "w") as f:
-            f.write(DEFAULT_CSS)
-        print(f"✅ Restored {CSS_PATH} to original 'Blue' state.")
+        if site.name == DEFAULT_SITE_NAME:
+            data = DEFAULT_CSS.encode('utf-8')
+            atomic_write(site.css_path, data)
+            get_snapshot_store().record_write(site.css_path, data)
+            get_snapshot_store().snapshot(DEFAULT_SNAPSHOT)
+            print(f"✅ Restored {site.css_path} to original 'Blue' state (snapshot '{DEFAULT_SNAPSHOT}').")
+        else:
+            # Other sites have no built-in CSS; their starting point is their own snapshot
+            get_snapshot_store().restore(DEFAULT_SNAPSHOT)
+            print(f"✅ Restored {site.world_dir} to snapshot '{DEFAULT_SNAPSHOT}'.")
     except Exception as e:
         print(f"❌ Error resetting CSS: {e}")
 
     # Clear Memory
     try:
-        with open(MEMORY_PATH, "w") as f:
-            json.dump([], f)
-        print(f"✅ Cleared agent memory in {MEMORY_PATH}.")
+        # Also drops any legacy JSON memories (they are migrated, then cleared)
+        ProceduralMemoryStore(site.memory_log_path, site.legacy_memory_path).clear()
+        print(f"✅ Cleared agent memory in {site.memory_log_path}.")
     except Exception as e:
         print(f"❌ Error clearing memory: {e}")
 
     print("\nSystem is ready for a fresh demo run!")
 
+def restore_snapshot(name: str):
+    """
+    Puts the world files back to a named snapshot. Memory is left alone.
+    """
+    try:
+        restored = get_snapshot_store().restore(name)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return
+    print(f"✅ Restored snapshot '{name}' ({', '.join(restored) or 'already up to date'}).")
+
+def save_snapshot(name: str):
+    try:
+        digest = get_snapshot_store().snapshot(name)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return
+    print(f"✅ Saved the current world as snapshot '{name}' ({digest[:12]}).")
+
+def list_snapshots():
+    refs = get_snapshot_store().refs()
+    print("Named snapshots:" if refs else "No named snapshots yet.")
+    for name, digest in refs.items():
+        print(f"  {name:<20} {digest[:12]}")
+    history = get_snapshot_store().history()
+    if history:
+        print("Recent writes:")
+    for entry in history:
+        print(f"  {entry['file']:<20} {entry['digest'][:12]}")
+
 if __name__ == "__main__":
-    reset_environment()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Reset the demo world, or manage its snapshots.")
+    parser.add_argument("--snapshot", metavar="NAME",
+                        help="Restore the world files to this named snapshot (or digest), keeping memory.")
+    parser.add_argument("--save", metavar="NAME", help="Save the current world files as a named snapshot.")
+    parser.add_argument("--list", action="store_true", help="List named snapshots and recent writes.")
+    parser.add_argument("--site", default=DEFAULT_SITE_NAME,
+                        help="The site to act on: a name under sites/, or a directory containing world/.")
+    args = parser.parse_args()
+
+    with use_site(args.site) as site:
+        if not os.path.isdir(site.world_dir):
+            print(f"❌ No site '{args.site}': {site.world_dir} does not exist.")
+        elif args.snapshot:
+            restore_snapshot(args.snapshot)
+        elif args.save:
+            save_snapshot(args.save)
+        elif args.list:
+            list_snapshots()
+        else:
+            reset_environment()
\ No newline at end of file
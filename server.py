@@ -0,0 +1,418 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.tracing import console
+from tools.site import SITES_DIR, Site, current_site, resolve_site, use_site
+
+# --- 1. The Persistent Job Queue ---
+# Every submitted report is a row in SQLite before the client hears back, so
+# queued and unfinished jobs survive a restart of the server. Jobs that were
+# running when the server died are queued again when it starts.
+
+JOB_QUEUE_PATH = os.path.join("memory", "jobs.sqlite3")
+
+# Finished jobs are kept this long for polling, then deleted
+DEFAULT_RETENTION_SECONDS = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    report TEXT NOT NULL,
+    site TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+"""
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "error"
+
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while `max_queued` jobs are already waiting.
+    """
+
+
+class JobQueue:
+    """
+    A FIFO of bug-report jobs in SQLite (WAL mode), safe to use from every thread.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite connections must not be shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def submit(self, report: str, site: str = None, max_queued: int = None) -> dict:
+        """
+        Adds a job to the end of the queue.
+
+        Args:
+            max_queued: Refuse (raise QueueFull) if this many jobs are already waiting.
+
+        Returns:
+            The new job (see `get`).
+        """
+        job_id = uuid.uuid4().hex
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if max_queued is not None:
+                (queued,) = db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+                if queued >= max_queued:
+                    raise QueueFull(f"{queued} jobs are already waiting.")
+            db.execute("INSERT INTO jobs (id, report, site, status, created) VALUES (?, ?, ?, ?, ?)",
+                       (job_id, report, site, QUEUED, time.time()))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def claim(self):
+        """
+        Marks the oldest queued job as running and returns it, or None if the queue is empty.
+        """
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY seq LIMIT 1", (QUEUED,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE jobs SET status = ?, started = ? WHERE seq = ?", (RUNNING, time.time(), row["seq"]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return dict(row) if row is not None else None
+
+    def finish(self, job_id: str, result: dict = None, error: str = None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+            (FAILED if error else DONE, json.dumps(result) if result is not None else None,
+             error, time.time(), job_id))
+
+    def get(self, job_id: str):
+        """
+        Returns a job as a dict (with its place in line while queued), or None.
+        """
+        db = self._connect()
+        row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "report": row["report"],
+            "site": row["site"],
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+        if row["status"] == QUEUED:
+            (ahead,) = db.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND seq < ?",
+                                  (QUEUED, row["seq"])).fetchone()
+            job["position"] = ahead + 1
+        return job
+
+    def counts(self) -> dict:
+        """
+        Returns {status: number of jobs} for every status.
+        """
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def mean_job_seconds(self, recent: int = 50) -> float:
+        """
+        The mean run time of the last `recent` finished jobs (0.0 if there are none).
+        """
+        (mean,) = self._connect().execute(
+            "SELECT AVG(finished - started) FROM (SELECT finished, started FROM jobs "
+            "WHERE status IN (?, ?) AND started IS NOT NULL ORDER BY seq DESC LIMIT ?)",
+            (DONE, FAILED, recent)).fetchone()
+        return mean or 0.0
+
+    def recover(self) -> int:
+        """
+        Queues again every job left running by a server that stopped. Returns how many.
+        """
+        return self._connect().execute(
+            "UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING)).rowcount
+
+    def prune(self, older_than: float = DEFAULT_RETENTION_SECONDS) -> int:
+        """
+        Deletes finished jobs older than `older_than` seconds. Returns how many.
+        """
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?",
+            (DONE, FAILED, time.time() - older_than)).rowcount
+
+
+# --- 2. The Warm Worker Pool ---
+# One long-lived process keeps the agents, the parse caches, the element index
+# and the replay index built; only the first job (or `warm_up`) pays for them.
+
+def warm_up(site=None):
+    """
+    Builds every agent executor and loads the site's caches ahead of the first job.
+    """
+    from agents import triage_agent  # noqa: F401  (registers every agent)
+    from agents.registry import registry
+    from tools.memory_index import get_replay_index
+    from tools.memory_search import get_memory_search_index
+    from tools.web_inspector import find_element_selectors, get_computed_value
+
+    start = time.perf_counter()
+    for name in registry.names():
+        try:
+            registry.get(name)
+        except Exception as e:
+            console(f"Could not build the {name} agent: {e}")
+    with use_site(site or current_site()):
+        try:
+            find_element_selectors("body")
+            get_computed_value("body", "background-color")
+            get_replay_index().lookup("")
+            len(get_memory_search_index())
+        except Exception as e:
+            console(f"Could not warm the site caches: {e}")
+    return time.perf_counter() - start
+
+
+class JobServer:
+    """
+    Runs queued jobs on `workers` threads, at most `workers` pipelines at a time.
+
+    Args:
+        queue: The JobQueue to take jobs from.
+        max_queued: Submissions beyond this many waiting jobs are refused (backpressure).
+        site: The site for jobs that don't name one.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 4, max_queued: int = 100, site=None):
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.site = resolve_site(site)
+        self.started = time.time()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads = []
+
+    def start(self):
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Re-queued {recovered} jobs left running by the last server.")
+        self.queue.prune()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, report: str, site: str = None) -> dict:
+        """
+        Queues a report. Raises QueueFull when `max_queued` jobs are already waiting,
+        and ValueError for a site that is not the server's own or one under sites/.
+        """
+        if site is not None:
+            site = self._site_name(site)
+        job = self.queue.submit(report, site, self.max_queued)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def _site_name(self, site) -> str:
+        """
+        Checks a client's site: a plain name, never a path, so a request can only
+        reach the sites this server was set up for. Returns the name to queue
+        (None for the server's own site).
+        """
+        if not isinstance(site, str):
+            raise ValueError("'site' must be a string.")
+        if site == self.site.name:
+            return None
+        if not _SITE_NAME.fullmatch(site):
+            raise ValueError(f"'site' must be the name of a site under {SITES_DIR}/, not a path.")
+        if not os.path.isdir(self._job_site(site).world_dir):
+            raise ValueError(f"No site '{site}'.")
+        return site
+
+    def _job_site(self, name: str = None) -> Site:
+        # Queued names are always looked up under sites/, never as paths
+        return Site(name, os.path.join(SITES_DIR, name)) if name else self.site
+
+    def retry_after(self) -> int:
+        """
+        Roughly how many seconds until a queue slot frees up (for 429 responses).
+        """
+        return max(1, round(self.queue.mean_job_seconds() or 1.0))
+
+    def _work(self):
+        from batch_runner import run_one
+
+        while True:
+            with self._wakeup:
+                job = None
+                while not self._stopping:
+                    job = self.queue.claim()
+                    if job is not None:
+                        break
+                    # Also poll now and then, for jobs queued by another process
+                    self._wakeup.wait(timeout=1.0)
+                if job is None:
+                    return
+            try:
+                result = run_one(job["id"], job["report"], self._job_site(job["site"]))
+                self.queue.finish(job["id"], result, result.get("error"))
+            except Exception as e:
+                self.queue.finish(job["id"], error=f"{type(e).__name__}: {e}")
+
+    def stop(self, timeout: float = None):
+        """
+        Stops taking jobs and waits for the running ones to finish.
+        """
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def health(self) -> dict:
+        from agents.registry import registry
+        from agents.context import context_stats
+        from agents.routing import routing_stats
+        from agents.triage_agent import coalescing_stats, fix_batching_stats
+        from tools.world_watch import world_files
+
+        return {
+            "status": "stopping" if self._stopping else "ok",
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "jobs": self.queue.counts(),
+            "agents_built": [name for name in registry.names() if registry.is_built(name)],
+            "coalescing": coalescing_stats(),
+            "fix_batching": fix_batching_stats(),
+            "routing": routing_stats(),
+            "world_files": world_files.stats(),
+            "context": context_stats(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+        }
+
+
+# --- 3. The HTTP API (localhost only by default) ---
+#   POST /jobs         {"report": "...", "site": "<name under sites/>"}  -> 202 {"job_id", "status", "position"}
+#                      429 with Retry-After when the queue is full
+#   GET  /jobs/<id>    the job's status, and its result line once done
+#   GET  /health       queue counts, workers, which agents are warm, coalescing, fix batching, model routing,
+#                      file watcher and context compaction stats
+
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})$")
+# A site name from a client: no path separators, and no "." or ".."
+_SITE_NAME = re.compile(r"\w[\w.-]*")
+MAX_BODY_BYTES = 64 * 1024
+
+
+def _handler_class(server: JobServer):
+
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        server_version = "AgenticEvolver/1.0"
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                return self._send(200, server.health())
+            match = _JOB_PATH.match(self.path)
+            job = server.queue.get(match.group(1)) if match else None
+            if job is None:
+                return self._send(404, {"error": "No such job."})
+            self._send(200, job)
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                return self._send(404, {"error": "Unknown path."})
+            if self.headers.get("Content-Length") is None:
+                return self._send(411, {"error": "A Content-Length header is required."})
+            try:
+                length = self.headers["Content-Length"].strip()
+                if not length.isdigit():
+                    raise ValueError("Content-Length must be a non-negative integer.")
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    return self._send(413, {"error": "Request body too large."})
+                body = json.loads(self.rfile.read(length) or b"{}")
+                report = body.get("report") if isinstance(body, dict) else None
+                if not isinstance(report, str) or not report.strip():
+                    raise ValueError("A non-empty 'report' string is required.")
+                job = server.submit(report, body.get("site"))
+            except QueueFull as e:
+                return self._send(429, {"error": f"Queue full: {e}"},
+                                  {"Retry-After": str(server.retry_after())})
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            self._send(202, {"job_id": job["job_id"], "status": job["status"],
+                             "position": job.get("position")},
+                       {"Location": f"/jobs/{job['job_id']}"})
+
+        def log_message(self, format, *args):
+            console(f"[serve] {self.address_string()} {format % args}")
+
+    return JobRequestHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 4, max_queued: int = 100,
+          site=None, queue_path: str = JOB_QUEUE_PATH):
+    """
+    Runs the job server until interrupted (Ctrl+C). Jobs still waiting stay in the
+    queue file and are picked up by the next server.
+    """
+    server = JobServer(JobQueue(queue_path), workers, max_queued, site)
+    print("Warming up agents and caches...")
+    print(f"Warm in {warm_up(server.site):.1f}s.")
+    server.start()
+    httpd = ThreadingHTTPServer((host, port), _handler_class(server))
+    print(f"Serving on http://{host}:{httpd.server_port} "
+          f"({server.workers} workers, up to {max_queued} queued jobs). Press Ctrl+C to stop.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping: finishing running jobs...")
+    finally:
+        httpd.server_close()
+        server.stop()
@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from tools.site import Site, resolve_site, use_site
+
+# --- 1. Pinning Sites To Worker Processes ---
+# Every site is pinned to one worker process for the scheduler's lifetime. A site's
+# pipelines therefore run one at a time, in a process whose parse caches, element
+# index and memory store for that site stay warm, and never race each other on its
+# style.css. Different sites land on different workers, so they run in parallel on
+# separate cores (no GIL contention between them).
+
+
+def configure_worker(llm_cache: bool = True, verbose: bool = True, trace_file: str = None,
+                     llm_report: bool = False, routing: bool = True, step_timeout: float = 90.0,
+                     pipeline_timeout: float = 300.0, context_budget: int = None):
+    """
+    The default worker initializer: applies the main process's command-line choices
+    (response cache, console narration, span recording, LLM-written reports, model
+    routing, time budgets and the context budget) inside a worker.
+    """
+    if not llm_cache:
+        from agents.llm import set_llm_cache
+        set_llm_cache(None)
+    if not verbose:
+        from agents.tracing import set_verbose
+        set_verbose(False)
+    if trace_file:
+        # Spans from every worker go to the same file; its writer is multi-process safe
+        from agents.tracing import configure_tracing
+        configure_tracing(trace_file)
+    if llm_report:
+        from agents.triage_agent import set_llm_report
+        set_llm_report(True)
+    from agents.routing import set_routing, set_time_budgets
+    set_routing(routing)
+    set_time_budgets(step_timeout, pipeline_timeout)
+    if context_budget is not None:
+        from agents.context import set_context_budget
+        set_context_budget(context_budget)
+
+def _init_worker(initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+
+def _run_in_site(site: Site, func, args):
+    with use_site(site):
+        return func(*args)
+
+
+class SiteScheduler:
+    """
+    A pool of `workers` processes with sticky site assignment. A new site goes to
+    the worker with the fewest sites; after that it always runs there.
+
+    Args:
+        workers: How many processes (default: one per CPU core).
+        initializer / initargs: Run once in each worker when it starts (e.g.,
+            `configure_worker`, or a benchmark's stub-LLM setup). Must be picklable.
+    """
+
+    def __init__(self, workers: int = None, initializer=None, initargs=()):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pools = [None] * self.workers
+        self._pinned = {}
+        self._sites_per_worker = [0] * self.workers
+        self._lock = threading.Lock()
+        # Workers are spawned, not forked: forking a process that runs threads
+        # (tracing, the memory store's fsync timer) can deadlock the child
+        self._context = multiprocessing.get_context("spawn")
+
+    def worker_for(self, site) -> int:
+        """
+        Returns the index of the worker `site` is pinned to, pinning it if it is new.
+        """
+        key = resolve_site(site).key
+        with self._lock:
+            index = self._pinned.get(key)
+            if index is None:
+                index = min(range(self.workers), key=self._sites_per_worker.__getitem__)
+                self._pinned[key] = index
+                self._sites_per_worker[index] += 1
+            return index
+
+    def _pool(self, index: int, replace: bool = False) -> ProcessPoolExecutor:
+        with self._lock:
+            if replace and self._pools[index] is not None:
+                self._pools[index].shutdown(wait=False, cancel_futures=True)
+                self._pools[index] = None
+            if self._pools[index] is None:
+                self._pools[index] = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=self._context,
+                    initializer=_init_worker,
+                    initargs=(self._initializer, self._initargs),
+                )
+            return self._pools[index]
+
+    def submit(self, site, func, *args):
+        """
+        Runs `func(*args)` with `site` as the current site, on the site's worker.
+        `func` and its arguments must be picklable (e.g., a module-level function).
+
+        Returns:
+            A concurrent.futures.Future with the function's result.
+        """
+        site = resolve_site(site)
+        # Workers get an absolute root, so they agree with us whatever their cwd
+        pinned = Site(site.name, site.key)
+        index = self.worker_for(site)
+        try:
+            return self._pool(index).submit(_run_in_site, pinned, func, args)
+        except BrokenProcessPool:
+            # The worker died (e.g., killed or out of memory); start a fresh one
+            return self._pool(index, replace=True).submit(_run_in_site, pinned, func, args)
+
+    def assignments(self) -> dict:
+        """
+        Returns {site root: worker index} for every site seen so far.
+        """
+        with self._lock:
+            return dict(self._pinned)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pools, self._pools = self._pools, [None] * self.workers
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,48 @@
+from tools.css_diff import CSSChange, CSSDiff, diff_css
+from tools.css_tokenizer import parse_stylesheet
+
+CSS = "".join(f".r{i} {{\n    color: #{i:06d};\n}}\n" for i in range(200))
+CSS += "@media print {\n    .r1 { color: black; }\n}\n.last { margin: 0; }\n"
+
+
+def _changes(diff):
+    return [(change.selector, change.property, change.old, change.new) for change in diff.changes]
+
+
+def test_no_change():
+    assert not diff_css(CSS, CSS)
+
+
+def test_changed_added_and_removed_declarations():
+    new = CSS.replace("color: #000150;", "color: red;\n    margin: 0;")
+    new = new.replace(".last { margin: 0; }", ".last { }")
+    assert _changes(diff_css(CSS, new)) == [
+        (".r150", "color", "#000150", "red"),
+        (".r150", "margin", None, "0"),
+        (".last", "margin", "0", None),
+    ]
+
+
+def test_added_rule():
+    new = CSS.replace(".r10 {", ".extra { color: red; }\n.r10 {")
+    assert _changes(diff_css(CSS, new)) == [(".extra", "color", None, "red")]
+
+
+def test_change_inside_media_is_other():
+    diff = diff_css(CSS, CSS.replace("color: black", "color: white"))
+    assert diff.changes == [] and diff.other
+
+
+def test_rule_records_give_the_same_diff():
+    sheet = parse_stylesheet(CSS)
+    for old, new in [("color: #000000;", "color: red;"), ("color: #000199;", "color: red;"),
+                     ("color: black", "color: white"), (".last { margin: 0; }", ".last { margin: 1px; }")]:
+        changed = CSS.replace(old, new)
+        plain, scoped = diff_css(CSS, changed), diff_css(CSS, changed, sheet)
+        assert _changes(scoped) == _changes(plain) and scoped.other == plain.other
+
+
+def test_then_cancels_an_undone_change():
+    there = CSSDiff([CSSChange(".a", "color", "blue", "red")])
+    back = CSSDiff([CSSChange(".a", "color", "red", "blue"), CSSChange(".b", "top", None, "0")])
+    assert _changes(there.then(back)) == [(".b", "top", None, "0")]
@@ -0,0 +1,74 @@
+import pytest
+
+from tools.css_patch import CSSPatchError, _validate, find_rule_block, iter_rule_blocks, patch_css_text
+
+CSS = ("/* header { color: red } */\n"
+       ".nav,  .menu > a {\n\tcolor: blue; /* brand */\n\tpadding: 0 4px;\n}\n"
+       "@media print { .nav { color: black } }\n"
+       ".btn { background-color: #007bff !important; border: 1px solid url('a;b') }\n"
+       ".empty {}\n")
+
+
+def test_patch_changes_only_the_value_bytes():
+    new, old_value = patch_css_text(CSS, ".nav, .menu>a", "color", "red")
+    assert old_value == "blue"
+    start = CSS.index("blue")
+    assert new == CSS[:start] + "red" + CSS[start + len("blue"):]
+
+
+def test_patch_keeps_important():
+    new, old_value = patch_css_text(CSS, ".btn", "background-color", "#ff0000")
+    assert old_value == "#007bff !important"
+    assert ".btn { background-color: #ff0000 !important; border:" in new
+
+
+def test_patch_adds_a_missing_property_with_the_rule_indentation():
+    new, old_value = patch_css_text(CSS, ".nav,.menu > a", "margin", "0")
+    assert old_value is None
+    assert "\tpadding: 0 4px;\n\tmargin: 0;\n}" in new
+    assert new.replace("\n\tmargin: 0;", "") == CSS
+
+
+def test_patch_adds_to_an_empty_rule_on_one_line():
+    new, _ = patch_css_text(CSS, ".empty", "color", "red")
+    assert new.endswith(".empty { color: red;}\n")
+
+
+def test_patch_at_known_offsets_skips_the_search():
+    block = find_rule_block(CSS, ".btn")
+    assert patch_css_text(CSS, ".btn", "border", "0", block=block) == patch_css_text(CSS, ".btn", "border", "0")
+
+
+def test_patch_unknown_selector():
+    with pytest.raises(CSSPatchError):
+        patch_css_text(CSS, ".missing", "color", "red")
+
+
+def test_rule_blocks_skip_at_rules_comments_and_strings():
+    selectors = [" ".join(prelude.split()) for prelude, _, _ in iter_rule_blocks(CSS)]
+    assert selectors == ["/* header { color: red } */ .nav, .menu > a", ".btn", ".empty"]
+
+
+def test_rule_blocks_from_a_rule_boundary():
+    _, _, body_end = next(iter_rule_blocks(CSS))
+    rest = [" ".join(prelude.split()) for prelude, _, _ in iter_rule_blocks(CSS, body_end + 1)]
+    assert rest == [".btn", ".empty"]
+
+
+@pytest.mark.parametrize("prop, value", [
+    ("color", "red"), ("background-color", "rgb(255 0 0 / 50%)"), ("color", "var(--brand)"),
+    ("color", "oklch(0.6 0.2 30)"), ("color", "#f00 !important"), ("color", "inherit"),
+    ("border-color", "red #00f"), ("border", "12px solid"), ("display", "grid"), ("content", "'Hi!'"),
+])
+def test_validate_accepts(prop, value):
+    _validate(prop, value)
+
+
+@pytest.mark.parametrize("prop, value", [
+    ("background-color", "notacolor"), ("background-color", "12px solid"), ("color", "red; top: 0"),
+    ("color", "red !"), ("width", "calc(100% - 4px"), ("content", "'open"), ("color", " "),
+    ("bad name", "red"),
+])
+def test_validate_rejects(prop, value):
+    with pytest.raises(CSSPatchError):
+        _validate(prop, value)
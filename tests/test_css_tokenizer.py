@@ -0,0 +1,78 @@
+import pytest
+
+from tools.css_tokenizer import UnsupportedCSS, parse_stylesheet, retokenize, tokenize
+
+CSS = (b'/* a { b } */\n'
+       b'.a, .b > p {\n  color: red;\n  background: url("x{y}.png") !important;\n}\n'
+       b'@media (max-width: 600px) {\n  .c { color: blue }\n}\n'
+       b'.d{margin:0}\n')
+
+
+def _records(sheet):
+    return [(rule.selector, rule.start, rule.body_start, rule.body_end, rule.media, rule.declarations)
+            for rule in sheet.rules]
+
+
+def test_offsets_point_at_each_rule():
+    sheet = tokenize(CSS)
+    assert [rule.selector for rule in sheet.rules] == [".a, .b > p", ".c", ".d"]
+    for rule in sheet.rules:
+        assert CSS[rule.start:rule.body_start - 1].strip().decode() == rule.selector
+        assert CSS[rule.body_start - 1:rule.body_start] == b"{"
+        assert CSS[rule.body_end:rule.body_end + 1] == b"}"
+    assert sheet.ascii
+
+
+def test_declarations_media_and_braces_in_strings_and_comments():
+    first, nested, last = tokenize(CSS).rules
+    assert first.declarations == [("color", "red", False), ("background", 'url("x{y}.png")', True)]
+    assert first.media == () and last.media == ()
+    assert nested.media == ("(max-width: 600px)",)
+    assert nested.get("color") == "blue"
+
+
+def test_offsets_are_byte_offsets():
+    css = ".é { color: red }\n.b { color: blue }\n".encode('utf-8')
+    sheet = tokenize(css)
+    assert not sheet.ascii
+    rule = sheet.rules[1]
+    assert css[rule.body_start:rule.body_end] == b" color: blue "
+
+
+def test_unsupported_css_falls_back_to_cssutils():
+    with pytest.raises(UnsupportedCSS):
+        tokenize(b".a { .b { color: red } }")
+    assert parse_stylesheet(b".a { color: red }").source == "tokenizer"
+    assert parse_stylesheet(b".a { color: red; } }").source == "cssutils"
+
+
+PLAIN = b".a { color: red }\n/* } */\n.b {\n  margin: 0;\n}\n.c { color: blue }\n"
+
+
+@pytest.mark.parametrize("new", [
+    PLAIN.replace(b"margin: 0;", b"margin: 0;\n  padding: 4px;"),
+    PLAIN.replace(b"color: red", b"color: #ff0000"),
+    PLAIN + b".d { color: green }\n",
+    PLAIN.replace(b".b {\n  margin: 0;\n}\n", b""),
+    b".z { top: 0 }\n" + PLAIN,
+])
+def test_retokenize_matches_a_full_parse(new):
+    updated = retokenize(tokenize(PLAIN), PLAIN, new)
+    assert updated is not None
+    assert _records(updated) == _records(tokenize(new))
+
+
+@pytest.mark.parametrize("new", [
+    CSS.replace(b"color: blue", b"color: navy"),
+    CSS.replace(b"margin:0", b"margin:0; padding: 4px"),
+    CSS.replace(b"color: red", b"color: #ff0000"),
+])
+def test_retokenize_near_media_is_exact_or_declines(new):
+    # Next to an @media block it may hand back to a full parse, but never gets it wrong
+    updated = retokenize(tokenize(CSS), CSS, new)
+    assert updated is None or _records(updated) == _records(tokenize(new))
+
+
+def test_retokenize_declines_an_unclosed_comment():
+    new = PLAIN.replace(b".c { color: blue }", b"/* .c { color: blue }")
+    assert retokenize(tokenize(PLAIN), PLAIN, new) is None
@@ -0,0 +1,73 @@
+import json
+import os
+
+from tools.memory_store import ProceduralMemoryStore
+
+
+def _store(tmp_path, **kwargs):
+    return ProceduralMemoryStore(str(tmp_path / "memory.jsonl"), str(tmp_path / "memory.json"), **kwargs)
+
+
+def test_append_and_find(tmp_path):
+    store = _store(tmp_path)
+    store.append("The button is blue", "Changed .btn color to red")
+    store.append_many([{"bug": "Link is red", "fix": "Changed a color to blue"}])
+    assert len(store) == 2
+    assert store.find("  the BUTTON is blue ") == [{"bug": "The button is blue", "fix": "Changed .btn color to red"}]
+    store.close()
+
+
+def test_reads_only_complete_lines_appended_by_another_writer(tmp_path):
+    store = _store(tmp_path)
+    store.append("a", "1")
+    line = json.dumps({"bug": "b", "fix": "2"}) + "\n"
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write(line[:10])
+    assert [entry["bug"] for entry in store.all()] == ["a"]
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write(line[10:])
+    assert [entry["bug"] for entry in store.all()] == ["a", "b"]
+    assert store.since(1) == [{"bug": "b", "fix": "2"}]
+    store.close()
+
+
+def test_append_after_a_torn_line_keeps_its_own_entry(tmp_path):
+    store = _store(tmp_path)
+    store.append("a", "1")
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write('{"bug": "torn')
+    store.append("b", "2")
+    assert [entry["bug"] for entry in store.all()] == ["a", "b"]
+    store.close()
+
+
+def test_compaction_drops_duplicate_and_corrupt_lines(tmp_path):
+    store = _store(tmp_path)
+    store.append_many([{"bug": "a", "fix": "1"}] * 3 + [{"bug": "b", "fix": "2"}])
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write("not json\n")
+    store.compact()
+    with open(store.path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{"bug": "a", "fix": "1"}, {"bug": "b", "fix": "2"}]
+    # Appends after a compaction go to the new file
+    store.append("c", "3")
+    assert [entry["bug"] for entry in store.all()] == ["a", "b", "c"]
+    store.close()
+
+
+def test_another_store_sees_a_compaction(tmp_path):
+    first, second = _store(tmp_path), _store(tmp_path)
+    first.append_many([{"bug": "a", "fix": "1"}] * 2)
+    assert len(second) == 2
+    first.compact()
+    assert second.all() == [{"bug": "a", "fix": "1"}]
+    first.close()
+    second.close()
+
+
+def test_legacy_array_is_migrated_once(tmp_path):
+    with open(tmp_path / "memory.json", 'w', encoding='utf-8') as f:
+        json.dump([{"bug": "old", "fix": "fix"}], f)
+    assert _store(tmp_path).all() == [{"bug": "old", "fix": "fix"}]
+    assert _store(tmp_path).all() == [{"bug": "old", "fix": "fix"}]
+    assert os.path.getsize(tmp_path / "memory.json") == 2
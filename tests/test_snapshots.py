@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from tools.snapshots import SnapshotConflict, SnapshotError, SnapshotStore
+from tools.world_watch import world_files
+
+
+def _write(world, name, text):
+    with open(os.path.join(world, name), 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _read(world, name):
+    with open(os.path.join(world, name), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture
+def world(tmp_path):
+    world = str(tmp_path / "world")
+    os.makedirs(world)
+    _write(world, "style.css", ".a { color: blue; }\n")
+    _write(world, "index.html", "<p class='a'>Hi</p>\n")
+    yield world
+    world_files.forget()
+
+
+def test_restore_puts_back_only_changed_files(world):
+    store = SnapshotStore(world)
+    before = store.snapshot("default")
+    _write(world, "style.css", ".a { color: red; }\n")
+    assert store.restore("default") == ["style.css"]
+    assert _read(world, "style.css") == ".a { color: blue; }\n"
+    assert store.snapshot() == before
+    assert store.restore(before) == []
+
+
+def test_restore_with_expected_state(world):
+    store = SnapshotStore(world)
+    before = store.snapshot()
+    _write(world, "style.css", ".a { color: red; }\n")
+    after = store.snapshot()
+    assert store.restore(before, expected=after) == ["style.css"]
+    assert _read(world, "style.css") == ".a { color: blue; }\n"
+
+
+def test_restore_refuses_when_the_world_moved_on(world):
+    store = SnapshotStore(world)
+    before = store.snapshot()
+    _write(world, "style.css", ".a { color: red; }\n")
+    after = store.snapshot()
+    # Another fix lands after ours
+    _write(world, "style.css", ".a { color: red; }\n.b { color: green; }\n")
+    with pytest.raises(SnapshotConflict):
+        store.restore(before, expected=after)
+    assert _read(world, "style.css") == ".a { color: red; }\n.b { color: green; }\n"
+
+
+def test_unknown_and_corrupt_snapshots(world):
+    store = SnapshotStore(world)
+    with pytest.raises(SnapshotError):
+        store.restore("nope")
+    digest = store.put(b"data")
+    with open(store._object_path(digest), 'wb') as f:
+        f.write(b"tampered")
+    with pytest.raises(SnapshotError):
+        store.get(digest)
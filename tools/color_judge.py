@@ -0,0 +1,140 @@
+from tools.colors import colors_match, family_of, parse_rgba
+from tools.computed_style import computed_style_cache
+from tools.css_cache import stylesheet_cache
+from tools.element_index import element_index_cache
+from tools.memory_index import report_claimed_color, report_property, report_target_color
+from tools.site import current_site
+from tools.web_inspector import get_computed_value
+
+# --- 1. The Rule-Based Judge ---
+# Most reports look like "The contact button is blue, it should be red.", and checking
+# them is a lookup plus a color comparison. These judges do exactly that, and return
+# None whenever anything is unclear, so the caller falls back to its LLM agent.
+
+# Two candidates for *different* elements this close in score are too close to call
+AMBIGUITY_MARGIN = 0.05
+
+
+def resolve_element(bug_report: str):
+    """
+    Finds the selector (with a rule in style.css) of the element the report is about.
+
+    Returns:
+        The selector, or None if nothing matches or two elements match about equally well.
+    """
+    site = current_site()
+    known_selectors = set(stylesheet_cache.get(site.css_path).selector_index)
+    ranked = element_index_cache.get(site.html_path).resolve(bug_report, known_selectors, limit=10)
+    ranked = [item for item in ranked if item[0] in known_selectors]
+    if not ranked:
+        return None
+    selector, score, element = ranked[0]
+    for _, other_score, other_element in ranked[1:]:
+        if other_element is not element and score - other_score < AMBIGUITY_MARGIN:
+            return None
+    return selector
+
+
+def _inspect(bug_report: str):
+    """
+    Returns (selector, property, actual value) for the report's element, or None.
+    """
+    try:
+        selector = resolve_element(bug_report)
+        if selector is None:
+            return None
+        prop = report_property(bug_report)
+        if prop is None:
+            return None
+        value = get_computed_value(selector, prop)
+    except Exception:
+        return None
+    if not value or parse_rgba(value) is None:
+        return None
+    return selector, prop, value
+
+
+def judge_fix(bug_report: str, changes=None, reports: list = None):
+    """
+    Checks whether the fix for a bug report worked, without an LLM.
+
+    Args:
+        changes: The CSSDiff of what the fix wrote (tools/css_diff.py). If given,
+            a fix that also changed rules for other elements fails.
+        reports: The reports `changes` was written for, if it fixed several at once
+            (default: just this one); rules for their elements are not collateral.
+
+    Returns:
+        "PASS. ..." or "FAIL. ...", or None if the report, the CSS or the changes can't be parsed.
+    """
+    target = report_target_color(bug_report)
+    inspected = _inspect(bug_report) if target else None
+    if inspected is None:
+        return None
+    selector, prop, value = inspected
+    collateral = collateral_changes(changes, reports or [bug_report]) if changes is not None else []
+    if collateral is None:
+        return None
+    note = ""
+    if collateral:
+        note = (f" The fix also changed rules for other elements, which the report did not ask for: "
+                f"{'; '.join(str(change) for change in collateral)}.")
+    if colors_match(target, value) and not collateral:
+        return f"PASS. The {selector} {prop} is now {value} ({family_of(value)}), which matches the intended {target}."
+    if colors_match(target, value):
+        return f"FAIL. The {selector} {prop} is now {value} ({family_of(value)}), which matches the intended {target}.{note}"
+    return f"FAIL. The {selector} {prop} is {value} ({family_of(value)}), but the report says it should be {target}.{note}"
+
+
+def judge_report(bug_report: str):
+    """
+    Checks whether a bug report's claim about the current color is accurate, without an LLM.
+
+    Returns:
+        "VALIDATED. ..." or "NOT VALID. ...", or None if the report or the CSS can't be parsed.
+    """
+    claimed = report_claimed_color(bug_report)
+    inspected = _inspect(bug_report) if claimed else None
+    if inspected is None:
+        return None
+    selector, prop, value = inspected
+    if colors_match(claimed, value):
+        return f"VALIDATED. The user's report is accurate. The element {selector} is {value} ({family_of(value)})."
+    return (f"NOT VALID. The user's report is inaccurate. "
+            f"The user claimed {claimed}, but the tool found {value} ({family_of(value)}).")
+
+
+# --- 2. Checking Only What A Fix Changed ---
+# The write path records a rule-level diff of each fix (tools/css_diff.py). The
+# judge needs only the reported element and the selectors in that diff, so its
+# cost follows the size of the change, not the size of the site.
+
+def collateral_changes(changes, bug_reports: list):
+    """
+    Returns the CSSChange objects in `changes` (a CSSDiff) whose rules apply to
+    none of the reports' elements: edits nobody asked for.
+
+    Returns:
+        A list (empty if every change is for a reported element), or None if an
+        element or a changed selector can't be resolved, or the diff has changes
+        outside style rules.
+    """
+    if changes.other:
+        return None
+    engine = computed_style_cache.get(current_site().html_path)
+    targets = set()
+    for bug_report in bug_reports:
+        selector = resolve_element(bug_report)
+        elements = engine.select(selector) if selector is not None else []
+        if not elements:
+            return None
+        targets.add(id(elements[0]))
+    collateral = []
+    for selector in changes.selectors():
+        try:
+            matched = engine.select(selector)
+        except Exception:
+            return None  # e.g. a pseudo-class the selector engine can't evaluate
+        if not any(id(element) in targets for element in matched):
+            collateral.extend(change for change in changes.changes if change.selector == selector)
+    return collateral
@@ -0,0 +1,231 @@
+import colorsys
+import math
+import re
+
+# --- 1. Color Parsing ---
+# Turns any CSS color a report or stylesheet might contain (named colors,
+# #rgb / #rrggbb / #rgba / #rrggbbaa, rgb()/rgba(), hsl()/hsla()) into one
+# canonical form, so "should be red" can be compared with "#f00" without an LLM.
+
+_NAMED_HEX = {
+    "aliceblue": "f0f8ff", "antiquewhite": "faebd7", "aqua": "00ffff", "aquamarine": "7fffd4",
+    "azure": "f0ffff", "beige": "f5f5dc", "bisque": "ffe4c4", "black": "000000",
+    "blanchedalmond": "ffebcd", "blue": "0000ff", "blueviolet": "8a2be2", "brown": "a52a2a",
+    "burlywood": "deb887", "cadetblue": "5f9ea0", "chartreuse": "7fff00", "chocolate": "d2691e",
+    "coral": "ff7f50", "cornflowerblue": "6495ed", "cornsilk": "fff8dc", "crimson": "dc143c",
+    "cyan": "00ffff", "darkblue": "00008b", "darkcyan": "008b8b", "darkgoldenrod": "b8860b",
+    "darkgray": "a9a9a9", "darkgreen": "006400", "darkgrey": "a9a9a9", "darkkhaki": "bdb76b",
+    "darkmagenta": "8b008b", "darkolivegreen": "556b2f", "darkorange": "ff8c00",
+    "darkorchid": "9932cc", "darkred": "8b0000", "darksalmon": "e9967a",
+    "darkseagreen": "8fbc8f", "darkslateblue": "483d8b", "darkslategray": "2f4f4f",
+    "darkslategrey": "2f4f4f", "darkturquoise": "00ced1", "darkviolet": "9400d3",
+    "deeppink": "ff1493", "deepskyblue": "00bfff", "dimgray": "696969", "dimgrey": "696969",
+    "dodgerblue": "1e90ff", "firebrick": "b22222", "floralwhite": "fffaf0",
+    "forestgreen": "228b22", "fuchsia": "ff00ff", "gainsboro": "dcdcdc", "ghostwhite": "f8f8ff",
+    "gold": "ffd700", "goldenrod": "daa520", "gray": "808080", "green": "008000",
+    "greenyellow": "adff2f", "grey": "808080", "honeydew": "f0fff0", "hotpink": "ff69b4",
+    "indianred": "cd5c5c", "indigo": "4b0082", "ivory": "fffff0", "khaki": "f0e68c",
+    "lavender": "e6e6fa", "lavenderblush": "fff0f5", "lawngreen": "7cfc00",
+    "lemonchiffon": "fffacd", "lightblue": "add8e6", "lightcoral": "f08080",
+    "lightcyan": "e0ffff", "lightgoldenrodyellow": "fafad2", "lightgray": "d3d3d3",
+    "lightgreen": "90ee90", "lightgrey": "d3d3d3", "lightpink": "ffb6c1",
+    "lightsalmon": "ffa07a", "lightseagreen": "20b2aa", "lightskyblue": "87cefa",
+    "lightslategray": "778899", "lightslategrey": "778899", "lightsteelblue": "b0c4de",
+    "lightyellow": "ffffe0", "lime": "00ff00", "limegreen": "32cd32", "linen": "faf0e6",
+    "magenta": "ff00ff", "maroon": "800000", "mediumaquamarine": "66cdaa",
+    "mediumblue": "0000cd", "mediumorchid": "ba55d3", "mediumpurple": "9370db",
+    "mediumseagreen": "3cb371", "mediumslateblue": "7b68ee", "mediumspringgreen": "00fa9a",
+    "mediumturquoise": "48d1cc", "mediumvioletred": "c71585", "midnightblue": "191970",
+    "mintcream": "f5fffa", "mistyrose": "ffe4e1", "moccasin": "ffe4b5", "navajowhite": "ffdead",
+    "navy": "000080", "oldlace": "fdf5e6", "olive": "808000", "olivedrab": "6b8e23",
+    "orange": "ffa500", "orangered": "ff4500", "orchid": "da70d6", "palegoldenrod": "eee8aa",
+    "palegreen": "98fb98", "paleturquoise": "afeeee", "palevioletred": "db7093",
+    "papayawhip": "ffefd5", "peachpuff": "ffdab9", "peru": "cd853f", "pink": "ffc0cb",
+    "plum": "dda0dd", "powderblue": "b0e0e6", "purple": "800080", "rebeccapurple": "663399",
+    "red": "ff0000", "rosybrown": "bc8f8f", "royalblue": "4169e1", "saddlebrown": "8b4513",
+    "salmon": "fa8072", "sandybrown": "f4a460", "seagreen": "2e8b57", "seashell": "fff5ee",
+    "sienna": "a0522d", "silver": "c0c0c0", "skyblue": "87ceeb", "slateblue": "6a5acd",
+    "slategray": "708090", "slategrey": "708090", "snow": "fffafa", "springgreen": "00ff7f",
+    "steelblue": "4682b4", "tan": "d2b48c", "teal": "008080", "thistle": "d8bfd8",
+    "tomato": "ff6347", "turquoise": "40e0d0", "violet": "ee82ee", "wheat": "f5deb3",
+    "white": "ffffff", "whitesmoke": "f5f5f5", "yellow": "ffff00", "yellowgreen": "9acd32",
+}
+
+# Every CSS named color, as (r, g, b)
+NAMED_COLORS = {
+    name: tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+    for name, digits in _NAMED_HEX.items()
+}
+
+_HEX_RE = re.compile(r"^#([0-9a-f]{3,4}|[0-9a-f]{6}|[0-9a-f]{8})$")
+_FUNCTION_RE = re.compile(r"^(rgba?|hsla?)\(\s*(.*?)\s*\)$")
+
+# Finds color mentions inside free text (a bug report or a tool observation)
+COLOR_MENTION_RE = re.compile(
+    r"#[0-9a-fA-F]{3,8}\b|\b(?:rgba?|hsla?)\([^)]*\)|\b[a-zA-Z]+\b",
+)
+
+
+def _split_args(body: str) -> list:
+    # Accepts both "255, 0, 0, 0.5" and "255 0 0 / 50%"
+    if "," in body:
+        parts = [p.strip() for p in body.split(",")]
+    else:
+        main, _, alpha = body.partition("/")
+        parts = main.split() + ([alpha.strip()] if alpha.strip() else [])
+    return parts
+
+def _number(text: str, percent_of: float) -> float:
+    if text.endswith("%"):
+        return float(text[:-1]) * percent_of / 100
+    return float(text)
+
+def _hue(text: str) -> float:
+    for unit, scale in (("deg", 1), ("grad", 0.9), ("rad", 180 / math.pi), ("turn", 360)):
+        if text.endswith(unit):
+            return float(text[:-len(unit)]) * scale % 360
+    return float(text) % 360
+
+def _clamp(value: float, high: float) -> float:
+    return min(max(value, 0.0), high)
+
+def parse_rgba(value: str):
+    """
+    Parses any CSS color notation.
+
+    Returns:
+        An (r, g, b, alpha) tuple with 0-255 ints and a 0-1 alpha,
+        or None if the value is not a color.
+    """
+    text = value.strip().lower()
+    if text in NAMED_COLORS:
+        return NAMED_COLORS[text] + (1.0,)
+    if text == "transparent":
+        return (0, 0, 0, 0.0)
+
+    match = _HEX_RE.match(text)
+    if match:
+        digits = match.group(1)
+        if len(digits) in (3, 4):
+            digits = "".join(c * 2 for c in digits)
+        channels = [int(digits[i:i + 2], 16) for i in range(0, len(digits), 2)]
+        alpha = channels[3] / 255 if len(channels) == 4 else 1.0
+        return tuple(channels[:3]) + (alpha,)
+
+    match = _FUNCTION_RE.match(text)
+    if not match:
+        return None
+    name, parts = match.group(1), _split_args(match.group(2))
+    if len(parts) not in (3, 4):
+        return None
+    try:
+        alpha = _clamp(_number(parts[3], 1.0), 1.0) if len(parts) == 4 else 1.0
+        if name.startswith("rgb"):
+            r, g, b = (round(_clamp(_number(p, 255), 255)) for p in parts[:3])
+        else:
+            h = _hue(parts[0]) / 360
+            s, l = (_clamp(_number(p, 1.0), 1.0) for p in parts[1:3])
+            r, g, b = (round(c * 255) for c in colorsys.hls_to_rgb(h, l, s))
+    except ValueError:
+        return None
+    return (r, g, b, alpha)
+
+def parse_color(value: str):
+    """
+    Parses a CSS color, ignoring its alpha.
+
+    Returns:
+        An (r, g, b) tuple, or None if the value is not understood.
+    """
+    rgba = parse_rgba(value)
+    return rgba[:3] if rgba else None
+
+def normalize_color(value: str):
+    """
+    Returns the canonical form of a CSS color: '#rrggbb', or '#rrggbbaa' if it
+    is not fully opaque (e.g., 'red', '#F00' and 'rgb(255 0 0)' -> '#ff0000').
+    None if the value is not a color.
+    """
+    rgba = parse_rgba(value)
+    if rgba is None:
+        return None
+    hex_value = "#%02x%02x%02x" % rgba[:3]
+    if rgba[3] < 1.0:
+        hex_value += "%02x" % round(rgba[3] * 255)
+    return hex_value
+
+
+# --- 2. Color Families ---
+
+# The words `color_family` can return, i.e. how people describe a color
+FAMILIES = ("black", "white", "gray", "red", "orange", "yellow", "green", "blue", "purple", "pink")
+
+# Alternative spellings of family names
+FAMILY_ALIASES = {"grey": "gray"}
+
+def color_family(rgb) -> str:
+    """
+    Buckets an (r, g, b) color into the word a user would use for it
+    (e.g., '#007bff' -> 'blue', '#ff0000' -> 'red').
+    """
+    r, g, b = (c / 255 for c in rgb)
+    h, s, v = colorsys.rgb_to_hsv(r, g, b)
+    if v < 0.15:
+        return "black"
+    if s < 0.15:
+        return "white" if v > 0.85 else "gray"
+    hue = h * 360
+    if hue < 15 or hue >= 345:
+        return "pink" if s < 0.5 and v > 0.8 else "red"
+    if hue < 45:
+        return "orange"
+    if hue < 70:
+        return "yellow"
+    if hue < 170:
+        return "green"
+    if hue < 260:
+        return "blue"
+    if hue < 320:
+        return "purple"
+    return "pink"
+
+def family_of(value: str):
+    """
+    Returns the color family of a color string, or None if it cannot be parsed.
+    A family word maps to itself (so 'grey' -> 'gray', not whatever gray's hue says).
+    """
+    text = value.strip().lower()
+    text = FAMILY_ALIASES.get(text, text)
+    if text in FAMILIES:
+        return text
+    rgba = parse_rgba(text)
+    if rgba is None:
+        return None
+    if rgba[3] == 0:
+        return "transparent"
+    return color_family(rgba[:3])
+
+
+# --- 3. Comparing Colors ---
+
+def find_colors(text: str) -> list:
+    """
+    Returns every color mentioned in free text, in order (e.g., 'blue', '#ff0000', 'rgb(0,0,255)').
+    """
+    return [m.group(0) for m in COLOR_MENTION_RE.finditer(text) if parse_rgba(m.group(0))]
+
+def is_family_word(value: str) -> bool:
+    text = value.strip().lower()
+    return FAMILY_ALIASES.get(text, text) in FAMILIES
+
+def colors_match(expected: str, actual: str) -> bool:
+    """
+    Decides whether `actual` (a CSS value) satisfies `expected` (what a person asked for).
+    A broad word like 'red' matches any red; an exact value like '#ff0000',
+    'rgb(255, 0, 0)' or 'crimson' must match exactly.
+    """
+    if is_family_word(expected):
+        family = family_of(actual)
+        return family is not None and family == family_of(expected)
+    expected_value = normalize_color(expected)
+    return expected_value is not None and expected_value == normalize_color(actual)
@@ -0,0 +1,504 @@
+import hashlib
+import os
+import re
+import threading
+
+from tools.colors import find_colors
+from tools.css_cache import stylesheet_cache
+from tools.css_tokenizer import parse_declarations, parse_stylesheet, specificity
+from tools.world_watch import world_files
+
+# --- 1. What The Engine Resolves ---
+# The style a browser would actually apply to an element: every stylesheet
+# index.html pulls in (<link>ed files and what they @import, <style> blocks,
+# inline style="" attributes), cascaded by !important, specificity and source order,
+# with inheritance and var() substitution. Unlike `find_rules`, a selector here is
+# matched against the DOM, so '.nav .contact-button' or 'button, a' count too.
+
+# Inherited properties take their parent's value when no rule sets them
+INHERITED_PROPERTIES = {
+    "color", "cursor", "direction", "font", "font-family", "font-size", "font-style",
+    "font-variant", "font-weight", "letter-spacing", "line-height", "list-style",
+    "list-style-position", "list-style-type", "quotes", "text-align", "text-indent",
+    "text-transform", "visibility", "white-space", "word-spacing",
+}
+
+# Media we render for; anything else (print, or feature queries like min-width) is skipped
+SCREEN_MEDIA = {"", "all", "screen"}
+
+# Selectors that never match a page at rest (hover states, ::before boxes, ...)
+_DYNAMIC_RE = re.compile(
+    r"::|:(?:hover|focus|focus-within|focus-visible|active|visited|target|"
+    r"before|after|first-line|first-letter)\b", re.IGNORECASE,
+)
+_VAR_RE = re.compile(r"var\(\s*(--[\w-]+)\s*(?:,\s*((?:[^()]|\([^()]*\))*))?\)")
+# Guards against var() cycles such as --a: var(--b); --b: var(--a)
+MAX_VAR_DEPTH = 10
+
+INLINE_SPECIFICITY = (1, 0, 0, 0)
+
+
+def _rightmost_key(selector_text: str) -> str:
+    """
+    The bucket a selector is indexed under: the id, else the first class, else the tag
+    of its rightmost compound ('nav .item > a.cta' -> '.cta'), or '*' for anything else.
+    """
+    depth, start = 0, 0
+    for i, char in enumerate(selector_text):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif depth == 0 and char in " >+~":
+            start = i + 1
+    compound = re.sub(r"\[[^\]]*\]|\([^)]*\)", "", selector_text[start:].strip())
+
+    match = re.search(r"#(-?[_a-zA-Z][\w-]*)", compound)
+    if match:
+        return "#" + match.group(1)
+    match = re.search(r"\.(-?[_a-zA-Z][\w-]*)", compound)
+    if match:
+        return "." + match.group(1)
+    match = re.match(r"[a-zA-Z][\w-]*", compound)
+    return match.group(0).lower() if match else "*"
+
+def element_keys(element) -> list:
+    """
+    Every bucket a rule matching `element` can sit in.
+    """
+    keys = [element.name, "*"]
+    element_id = element.get("id")
+    if element_id:
+        keys.append("#" + element_id)
+    keys.extend("." + cls for cls in element.get("class", []))
+    return keys
+
+def _expand(name: str, value: str) -> list:
+    """
+    Splits the shorthands we care about into their color longhand
+    ('background: url(x) #fff' -> background-color: #fff). Other properties pass through.
+    """
+    if name == "background":
+        if value.strip().startswith("var(") and value.strip().endswith(")"):
+            return [("background-color", value.strip())]
+        colors = find_colors(value)
+        # The shorthand resets every longhand it does not mention
+        return [("background-color", colors[-1] if colors else "transparent")]
+    if name in ("border", "outline"):
+        colors = find_colors(value)
+        return [(f"{name}-color", colors[-1])] if colors else []
+    return [(name, value)]
+
+
+# --- 2. Rules And Declarations ---
+
+class Declaration:
+    """
+    One property value and where it came from.
+
+    Attributes:
+        rank: (important, specificity, source order); the highest rank wins the cascade.
+        origin: Human-readable provenance, e.g. '.contact-button in style.css'.
+    """
+    __slots__ = ("value", "important", "rank", "origin")
+
+    def __init__(self, value: str, important: bool, specificity: tuple, order: tuple, origin: str):
+        self.value = value
+        self.important = important
+        self.rank = (important, specificity, order)
+        self.origin = origin
+
+
+class StyleRule:
+    """
+    One selector of one style rule (a grouped rule 'h1, h2 {...}' becomes two).
+    """
+    __slots__ = ("selector", "specificity", "order", "declarations", "key", "_matcher")
+
+    def __init__(self, selector: str, specificity: tuple, order: tuple, declarations: list):
+        self.selector = selector
+        self.specificity = specificity
+        self.order = order
+        self.declarations = declarations
+        self.key = _rightmost_key(selector)
+        self._matcher = None
+
+    def matches(self, element) -> bool:
+        if self._matcher is None:
+            import soupsieve
+            try:
+                self._matcher = soupsieve.compile(self.selector)
+            except Exception:
+                # A selector soupsieve can't evaluate is treated as matching nothing
+                self._matcher = False
+        return bool(self._matcher) and self._matcher.match(element)
+
+
+class StyleSource:
+    """
+    The rules of one stylesheet (a file or a <style> block), bucketed by `_rightmost_key`
+    and sorted by (specificity, source order) inside each bucket.
+    """
+
+    def __init__(self, key: str, label: str, position: int, digest: str, sheet):
+        self.key = key
+        self.label = label
+        self.position = position
+        self.digest = digest
+        self.buckets = {}
+        self.rule_count = 0
+        self._collect(sheet.rules)
+        for rules in self.buckets.values():
+            rules.sort(key=lambda rule: (rule.specificity, rule.order))
+
+    def _collect(self, css_rules):
+        for rule in css_rules:
+            if rule.media and not all(_screen_media(media) for media in rule.media):
+                continue
+            declarations = []
+            for prop, value, important in rule.declarations:
+                for name, expanded in _expand(prop, value):
+                    declarations.append((name, expanded, important))
+            if not declarations:
+                continue
+
+            for text in rule.selectors():
+                if _DYNAMIC_RE.search(text):
+                    continue
+                self.rule_count += 1
+                style_rule = StyleRule(text, specificity(text),
+                                       (self.position, self.rule_count), declarations)
+                self.buckets.setdefault(style_rule.key, []).append(style_rule)
+
+    def candidates(self, keys: list) -> list:
+        found = []
+        for key in keys:
+            found.extend(self.buckets.get(key, ()))
+        return found
+
+
+def _screen_media(media_text: str) -> bool:
+    queries = [q.strip().lower() for q in (media_text or "").split(",")]
+    return any(q in SCREEN_MEDIA for q in queries)
+
+
+# --- 3. The Engine ---
+
+class ComputedStyleEngine:
+    """
+    Resolves the computed style of elements in one HTML file.
+
+    Cascaded values are cached per element. When a single stylesheet changes, only
+    the elements whose buckets that sheet's old or new rules touch are dropped; when
+    the HTML itself (or the set of stylesheets) changes, everything is rebuilt.
+    """
+
+    def __init__(self, html_path: str):
+        self.html_path = os.path.abspath(html_path)
+        self._lock = threading.RLock()
+        self._html_digest = None
+        self.soup = None
+        self._style_nodes = []
+        self.sources = []
+        self._cascaded = {}
+        self._computed = {}
+        self._selections = {}
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.invalidations = 0
+
+    # --- Loading ---
+
+    def refresh(self):
+        """
+        Re-checks index.html and every stylesheet, updating only what changed.
+        """
+        with self._lock:
+            version = world_files.current(self.html_path)
+            if version.digest != self._html_digest:
+                self._html_digest = version.digest
+                self._load_document(version)
+                return
+
+            order = self._walk_sources()
+            if [(key, digest) for key, _, digest, _ in order] != [(s.key, s.digest) for s in self.sources]:
+                self._reload_sources(order)
+
+    def _load_document(self, version):
+        # The DOM of this version of the file, shared with the element index
+        self.soup = version.dom()
+        self._style_nodes = self.soup.find_all(["link", "style"])
+        self.sources = []
+        self._cascaded.clear()
+        self._computed.clear()
+        self._selections.clear()
+        self.rebuilds += 1
+        self._reload_sources(self._walk_sources())
+
+    def _walk_sources(self) -> list:
+        """
+        Every stylesheet the document uses, in cascade order: <link>ed files and
+        <style> blocks in document order, each @import'ed file just before its importer.
+
+        Returns:
+            (key, label, digest, content) tuples, where content is a ParsedStylesheet
+            for files and the CSS text for <style> blocks.
+        """
+        base = os.path.dirname(self.html_path)
+        order, seen = [], set()
+
+        def visit(path: str):
+            if path in seen:
+                return
+            seen.add(path)
+            try:
+                parsed = stylesheet_cache.get(path)
+            except OSError:
+                return
+            for href, media in parsed.sheet.imports:
+                if _screen_media(media):
+                    target = _local_path(os.path.dirname(path), href)
+                    if target:
+                        visit(target)
+            order.append((path, os.path.relpath(path, base), parsed.digest, parsed))
+
+        block = 0
+        for node in self._style_nodes:
+            if not _screen_media(node.get("media", "")):
+                continue
+            if node.name == "style":
+                text = node.get_text()
+                digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                order.append((f"<style {block}>", "a <style> block", digest, text))
+                block += 1
+            elif "stylesheet" in [r.lower() for r in node.get("rel", [])]:
+                target = _local_path(base, node.get("href", ""))
+                if target:
+                    visit(target)
+        return order
+
+    def _reload_sources(self, order: list):
+        """
+        Rebuilds the source list, reusing every unchanged source, and drops the cached
+        styles of exactly the elements a changed source can affect.
+        """
+        reusable = {(s.key, s.digest, s.position): s for s in self.sources}
+        sources, changed = [], []
+        for position, (key, label, digest, content) in enumerate(order):
+            source = reusable.pop((key, digest, position), None)
+            if source is None:
+                if isinstance(content, str):
+                    source = StyleSource(key, label, position, digest, parse_stylesheet(content))
+                else:
+                    source = StyleSource(key, label, position, digest, content.sheet)
+                changed.append(source)
+            sources.append(source)
+        self.sources = sources
+        self._invalidate(changed + list(reusable.values()))
+
+    def _invalidate(self, sources: list):
+        if not sources:
+            return
+        self.invalidations += 1
+        self._computed.clear()
+        touched = set()
+        for source in sources:
+            touched.update(source.buckets)
+        if "*" in touched:
+            self._cascaded.clear()
+            return
+        for element_id, (element, keys, _) in list(self._cascaded.items()):
+            if touched.intersection(keys):
+                del self._cascaded[element_id]
+
+    # --- Querying ---
+
+    def select(self, selector: str) -> list:
+        """
+        Returns the elements `selector` matches in document order (cached per selector).
+        """
+        with self._lock:
+            elements = self._selections.get(selector)
+            if elements is None:
+                elements = self.soup.select(selector)
+                self._selections[selector] = elements
+            return elements
+
+    def cascaded(self, element) -> dict:
+        """
+        Returns {property: Declaration} for what the cascade sets on the element itself.
+        """
+        with self._lock:
+            entry = self._cascaded.get(id(element))
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+            keys = element_keys(element)
+            matched = [rule for source in self.sources for rule in source.candidates(keys)
+                       if rule.matches(element)]
+            matched.sort(key=lambda rule: (rule.specificity, rule.order))
+
+            declared = {}
+            for rule in matched:
+                origin = f"{rule.selector} in {self._label(rule.order[0])}"
+                for name, value, important in rule.declarations:
+                    _apply(declared, name, Declaration(value, important, rule.specificity, rule.order, origin))
+            inline = element.get("style")
+            if inline:
+                for name, value, important in _inline_declarations(inline):
+                    _apply(declared, name, Declaration(value, important, INLINE_SPECIFICITY,
+                                                       (len(self.sources), 0), "the style attribute"))
+
+            self._cascaded[id(element)] = (element, keys, declared)
+            return declared
+
+    def computed_value(self, element, prop: str):
+        """
+        Returns the Declaration that decides `prop` for the element (its value with
+        var() resolved and inheritance applied), or None if nothing sets it.
+        """
+        with self._lock:
+            cache_key = (id(element), prop)
+            if cache_key in self._computed:
+                return self._computed[cache_key]
+            result = self._compute(element, prop, 0)
+            self._computed[cache_key] = result
+            return result
+
+    def _compute(self, element, prop: str, depth: int):
+        inherits = prop in INHERITED_PROPERTIES or prop.startswith("--")
+        node = element
+        while node is not None and getattr(node, "name", None) and node.name != "[document]":
+            declaration = self.cascaded(node).get(prop)
+            value = declaration.value.strip().lower() if declaration else None
+            if declaration is None or value == "inherit" or (value == "unset" and inherits):
+                if declaration is None and not inherits:
+                    return None
+                node = node.parent
+                continue
+            if value in ("initial", "unset", "revert"):
+                return None
+            if "var(" in declaration.value:
+                resolved = self._substitute(node, declaration.value, depth)
+                if resolved is None:
+                    return None
+                return Declaration(resolved, declaration.important, declaration.rank[1],
+                                   declaration.rank[2], declaration.origin)
+            return declaration
+        return None
+
+    def _substitute(self, element, value: str, depth: int):
+        if depth >= MAX_VAR_DEPTH:
+            return None
+        failed = False
+
+        def replace(match):
+            nonlocal failed
+            custom = self._compute(element, match.group(1), depth + 1)
+            if custom is not None:
+                return custom.value
+            if match.group(2) is not None:
+                fallback = match.group(2).strip()
+                if "var(" in fallback:
+                    fallback = self._substitute(element, fallback, depth + 1) or ""
+                return fallback
+            failed = True
+            return ""
+
+        result = _VAR_RE.sub(replace, value)
+        return None if failed else result.strip()
+
+    def resolve(self, selector: str, prop: str):
+        """
+        Returns (Declaration or None, number of matching elements) for the first element
+        `selector` matches, or None if it matches no element.
+        """
+        with self._lock:
+            elements = self.select(selector)
+            if not elements:
+                return None
+            return self.computed_value(elements[0], prop), len(elements)
+
+    def _label(self, position: int) -> str:
+        return self.sources[position].label if position < len(self.sources) else "the style attribute"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached_elements": len(self._cascaded),
+                "sources": len(self.sources),
+                "rules": sum(s.rule_count for s in self.sources),
+                "rebuilds": self.rebuilds,
+                "invalidations": self.invalidations,
+            }
+
+
+def _apply(declared: dict, name: str, declaration: Declaration):
+    # Candidates arrive in ascending (specificity, order), so a later one wins
+    # unless only the earlier one is !important
+    current = declared.get(name)
+    if current is None or declaration.rank >= current.rank:
+        declared[name] = declaration
+
+_inline_cache = {}
+
+def _inline_declarations(text: str) -> list:
+    declarations = _inline_cache.get(text)
+    if declarations is None:
+        declarations = [(name, expanded, important)
+                        for prop, value, important in parse_declarations(text)
+                        for name, expanded in _expand(prop, value)]
+        if len(_inline_cache) > 4096:
+            _inline_cache.clear()
+        _inline_cache[text] = declarations
+    return declarations
+
+def _local_path(base_dir: str, href: str):
+    """
+    Resolves a stylesheet href to a local file, or None for remote URLs.
+    """
+    href = href.strip()
+    if not href or re.match(r"^[a-z][a-z0-9+.-]*:|^//", href, re.IGNORECASE):
+        return None
+    href = href.split("?", 1)[0].split("#", 1)[0]
+    return os.path.abspath(os.path.join(base_dir, href))
+
+
+# --- 4. One Engine Per HTML File ---
+
+class ComputedStyleCache:
+    """
+    Keeps one ComputedStyleEngine per HTML file; `get` returns it refreshed.
+    """
+
+    def __init__(self):
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> ComputedStyleEngine:
+        key = os.path.abspath(path)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = self._engines[key] = ComputedStyleEngine(key)
+        engine.refresh()
+        return engine
+
+    def stats(self) -> dict:
+        with self._lock:
+            engines = list(self._engines.values())
+        totals = {"engines": len(engines), "hits": 0, "misses": 0, "invalidations": 0}
+        for engine in engines:
+            stats = engine.stats()
+            for name in ("hits", "misses", "invalidations"):
+                totals[name] += stats[name]
+        return totals
+
+
+# The single shared instance used by all tools in this process.
+computed_style_cache = ComputedStyleCache()
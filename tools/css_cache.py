@@ -0,0 +1,135 @@
+import hashlib
+import threading
+
+from tools.css_tokenizer import normalize_selector_text, parse_stylesheet, retokenize
+from tools.world_watch import world_files
+
+# --- 1. The Cached Entry ---
+# One parsed version of a stylesheet. It is a view of that version of the file
+# (tools/world_watch.py), so it is built once per content and is never changed.
+
+class ParsedStylesheet:
+    """
+    A parsed stylesheet and its selector index.
+
+    Attributes:
+        sheet: The RuleSheet of its rules (tools/css_tokenizer.py).
+        digest: The sha256 of the content it was parsed from.
+        selector_index: Maps a top-level rule's selector text to the positions (in
+            `sheet.rules`) of the style rules using it, in source order.
+    """
+
+    def __init__(self, sheet, digest: str, selector_index: dict = None):
+        self.sheet = sheet
+        self.digest = digest
+        self._selector_index = selector_index
+
+    @property
+    def selector_index(self) -> dict:
+        # Built on first use: a re-parsed sheet that is never searched by selector skips it
+        if self._selector_index is None:
+            selector_index = {}
+            for position, rule in enumerate(self.sheet.rules):
+                if not rule.media:
+                    selector_index.setdefault(rule.selector, []).append(position)
+            self._selector_index = selector_index
+        return self._selector_index
+
+    def find_rules(self, selector_text: str) -> list:
+        """
+        Returns every top-level style rule whose selector is `selector_text` (O(1)),
+        however it is spaced ('a>b' finds 'a > b').
+        """
+        positions = self.selector_index.get(selector_text)
+        if positions is None:
+            positions = self.selector_index.get(normalize_selector_text(selector_text), ())
+        return [self.sheet.rules[position] for position in positions]
+
+
+# --- 2. The Process-Wide Cache ---
+
+class StylesheetCache:
+    """
+    The parsed stylesheets of the current versions of the files, keyed by path.
+
+    A file is only parsed again after it changed (tools/world_watch.py), and then,
+    when possible, incrementally: only the rules around the bytes that differ from
+    the previous version are tokenized again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+
+    def get(self, path: str) -> ParsedStylesheet:
+        """
+        Returns the parsed stylesheet for `path`, parsing it only if it changed.
+        """
+        return self.for_version(world_files.current(path))
+
+    def for_version(self, version) -> ParsedStylesheet:
+        """
+        Returns the parsed stylesheet of one FileVersion.
+        """
+        parsed = version.built("stylesheet")
+        if parsed is not None:
+            with self._lock:
+                self.hits += 1
+            return parsed
+        return version.view("stylesheet", self._parse)
+
+    def update(self, path: str, content: str, sheet=None, selectors_from: ParsedStylesheet = None) -> ParsedStylesheet:
+        """
+        Re-primes the cache after we wrote `content` to `path` ourselves,
+        so the next lookup is a hit instead of a re-parse.
+
+        Args:
+            sheet: An already-updated RuleSheet matching `content` (e.g., from
+                `with_body`). If omitted, `content` is parsed, incrementally
+                from the version it replaced when possible.
+            selectors_from: The ParsedStylesheet `sheet` was derived from by body
+                edits only; its selector index still holds and is kept.
+        """
+        raw = content.encode('utf-8')
+        if sheet is None:
+            return self.for_version(world_files.publish(path, raw))
+        index = selectors_from._selector_index if selectors_from is not None else None
+        parsed = ParsedStylesheet(sheet, hashlib.sha256(raw).hexdigest(), index)
+        return world_files.publish(path, raw, views={"stylesheet": parsed}).built("stylesheet")
+
+    def invalidate(self, path: str = None):
+        """
+        Drops the parsed version of `path`, or of every file if no path is given.
+        """
+        world_files.forget(path)
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and how many re-parses were incremental.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "incremental": self.incremental,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def _parse(self, version) -> ParsedStylesheet:
+        previous = version.previous
+        earlier = previous.built("stylesheet") if previous is not None else None
+        sheet = retokenize(earlier.sheet, previous.data, version.data) if earlier is not None else None
+        with self._lock:
+            self.misses += 1
+            self.incremental += sheet is not None
+        if sheet is None:
+            # The streaming tokenizer; cssutils only for CSS it can't read
+            sheet = parse_stylesheet(version.data)
+        return ParsedStylesheet(sheet, version.digest)
+
+
+# The single shared instance used by all tools in this process.
+stylesheet_cache = StylesheetCache()
@@ -0,0 +1,208 @@
+import bisect
+import contextlib
+import contextvars
+import re
+
+from tools.css_patch import iter_declarations, iter_rule_blocks, normalize_selector
+from tools.css_tokenizer import common_prefix, common_suffix
+
+# --- 1. Rule-Level Diffs ---
+# A write usually changes one value in one rule. The diff first trims the text
+# both versions share at the start and the end (compared a block at a time),
+# then parses only the rules that overlap what is left. So it describes the
+# change in terms of selectors and declarations. Given the rule records of the
+# old version (tools/css_tokenizer.py), the parse starts at the rule before the
+# change, so its cost depends on how big the change is, not on where it is.
+
+_COMMENT_RE = re.compile(r"/\*(?:[^*]|\*(?!/))*\*/")
+
+
+class CSSChange:
+    """
+    One declaration that a write added (old is None), removed (new is None) or changed.
+    """
+    __slots__ = ("selector", "property", "old", "new")
+
+    def __init__(self, selector: str, property: str, old: str = None, new: str = None):
+        self.selector = selector
+        self.property = property
+        self.old = old
+        self.new = new
+
+    def __str__(self):
+        return f"{self.selector} {{ {self.property}: {self.old or '(unset)'} -> {self.new or '(unset)'} }}"
+
+    def __repr__(self):
+        return f"CSSChange({self})"
+
+
+class CSSDiff:
+    """
+    What one or more writes to style.css changed, rule by rule.
+
+    Attributes:
+        changes: CSSChange objects, in source order.
+        other: Whether something outside top-level style rules changed too
+            (e.g., inside @media), which this diff can't describe.
+    """
+    __slots__ = ("changes", "other")
+
+    def __init__(self, changes: list = None, other: bool = False):
+        self.changes = changes or []
+        self.other = other
+
+    def __bool__(self):
+        return bool(self.changes) or self.other
+
+    def selectors(self) -> list:
+        """
+        The selectors of the rules that changed, once each, in order.
+        """
+        return list(dict.fromkeys(change.selector for change in self.changes))
+
+    def then(self, later: "CSSDiff") -> "CSSDiff":
+        """
+        The net effect of this diff followed by `later` (a change that is undone disappears).
+        """
+        net = {(change.selector, change.property): [change.old, change.new] for change in self.changes}
+        for change in later.changes:
+            key = (change.selector, change.property)
+            if key in net:
+                net[key][1] = change.new
+            else:
+                net[key] = [change.old, change.new]
+        changes = [CSSChange(selector, prop, old, new) for (selector, prop), (old, new) in net.items()
+                   if old != new]
+        return CSSDiff(changes, self.other or later.other)
+
+    def describe(self) -> str:
+        """
+        One line per changed declaration (e.g., "- .contact-button { background-color: blue -> red }").
+        """
+        lines = [f"- {change}" for change in self.changes]
+        if self.other:
+            lines.append("- (changes outside top-level style rules, e.g. inside @media)")
+        return "\n".join(lines) or "- (no rule changed)"
+
+
+def _scan_start(sheet, position: int) -> int:
+    """
+    Where a scan for the rules around `position` can start: just past the last
+    top-level rule of `sheet` that ends before it, or 0 without usable offsets.
+    """
+    if sheet is None or not sheet.has_offsets or not sheet.ascii:
+        return 0
+    rules = sheet.rules
+    i = bisect.bisect_right(rules, position, key=lambda rule: rule.body_end + 1) - 1
+    while i >= 0 and rules[i].media:
+        i -= 1
+    return rules[i].body_end + 1 if i >= 0 else 0
+
+def _rules_around(css: str, start: int, end: int, scan_from: int = 0):
+    """
+    Returns ([(selector, {property: value})], rest) for the style rules that
+    overlap css[start:end] (or contain `start`, if the range is empty), where
+    `rest` is the part of the range outside those rules (e.g., an @media block),
+    without comments and with whitespace collapsed. The rules are read from
+    `scan_from`, a top-level rule boundary at or before `start`.
+    """
+    rules, rest, covered_to = [], [], start
+    stop = max(end, start + 1)
+    for prelude, body_start, body_end in iter_rule_blocks(css, scan_from):
+        rule_start, rule_end = body_start - 1 - len(prelude), body_end + 1
+        if rule_start >= stop:
+            break
+        if rule_end <= start:
+            continue
+        declarations = {}
+        for name, value_start, value_end, _ in iter_declarations(css, body_start, body_end):
+            declarations[name] = css[value_start:value_end]  # the last one wins
+        rules.append((normalize_selector(prelude), declarations))
+        rest.append(css[covered_to:max(covered_to, rule_start)])
+        covered_to = max(covered_to, rule_end)
+    rest.append(css[covered_to:max(covered_to, end)])
+    return rules, " ".join(_COMMENT_RE.sub(" ", "".join(rest)).split())
+
+def _keyed(rules: list) -> dict:
+    # A selector can have several rules: the nth one is matched with the nth one
+    keyed, seen = {}, {}
+    for selector, declarations in rules:
+        n = seen[selector] = seen.get(selector, -1) + 1
+        keyed[(selector, n)] = declarations
+    return keyed
+
+def diff_css(old_css: str, new_css: str, old_sheet=None) -> CSSDiff:
+    """
+    Returns the rule-level CSSDiff between two versions of a stylesheet.
+
+    Args:
+        old_sheet: The RuleSheet read from `old_css`, if known.
+    """
+    if old_css == new_css:
+        return CSSDiff()
+    prefix = common_prefix(old_css, new_css, min(len(old_css), len(new_css)))
+    suffix = common_suffix(old_css, new_css, min(len(old_css), len(new_css)) - prefix)
+    # The text before `prefix` is the same in both versions, so is the rule boundary
+    scan_from = _scan_start(old_sheet, prefix)
+    old_rules, old_rest = _rules_around(old_css, prefix, len(old_css) - suffix, scan_from)
+    new_rules, new_rest = _rules_around(new_css, prefix, len(new_css) - suffix, scan_from)
+
+    old_keyed, new_keyed = _keyed(old_rules), _keyed(new_rules)
+    changes = []
+    for key in list(dict.fromkeys(list(new_keyed) + list(old_keyed))):
+        before, after = old_keyed.get(key, {}), new_keyed.get(key, {})
+        for prop in dict.fromkeys(list(before) + list(after)):
+            if before.get(prop) != after.get(prop):
+                changes.append(CSSChange(key[0], prop, before.get(prop), after.get(prop)))
+    return CSSDiff(changes, other=old_rest != new_rest)
+
+
+# --- 2. Recording The Writes Of One Step ---
+# `save_css_text` reports the diff of every write to whichever recorders are
+# active in its context, so a pipeline step sees its own writes (made by its
+# agent's tools, sync or async) and never those of a concurrent pipeline.
+
+_recorders = contextvars.ContextVar("css_change_recorders", default=())
+
+
+class CSSChangeLog:
+    """
+    The diffs of the writes made while a `record_css_changes` block ran.
+    """
+    __slots__ = ("diffs",)
+
+    def __init__(self):
+        self.diffs = []
+
+    def combined(self) -> CSSDiff:
+        """
+        The net effect of every recorded write.
+        """
+        net = CSSDiff()
+        for diff in self.diffs:
+            net = net.then(diff)
+        return net
+
+
+@contextlib.contextmanager
+def record_css_changes():
+    """
+    Records the CSSDiff of every style.css write made inside the block (in this
+    context, and in threads or tasks started from it). Yields a CSSChangeLog.
+    """
+    log = CSSChangeLog()
+    token = _recorders.set(_recorders.get() + (log,))
+    try:
+        yield log
+    finally:
+        _recorders.reset(token)
+
+def is_recording() -> bool:
+    return bool(_recorders.get())
+
+def note_css_diff(diff: CSSDiff):
+    """
+    Hands the diff of a write to every active recorder.
+    """
+    for log in _recorders.get():
+        log.diffs.append(diff)
@@ -0,0 +1,361 @@
+import difflib
+import re
+
+from tools.colors import normalize_color
+from tools.css_cache import stylesheet_cache
+from tools.file_manager import css_write_lock, save_css_text
+from tools.site import current_site
+from tools.world_watch import world_files
+
+# --- 1. Finding Rules And Declarations In The Source Text ---
+# The cached rule records (tools/css_tokenizer.py) tell us *whether* a rule exists
+# and where it is, but edits are made directly on the source text: only the bytes
+# of the one value change, and every other rule keeps its formatting.
+
+_COMMENT = r"/\*(?:[^*]|\*(?!/))*\*/"
+_COMMENT_RE = re.compile(_COMMENT)
+_PADDING_START_RE = re.compile(r"(?:\s|%s)*" % _COMMENT)
+_PADDING_END_RE = re.compile(r"(?:\s|%s)*$" % _COMMENT)
+_IMPORTANT_RE = re.compile(r"!\s*important\s*$", re.IGNORECASE)
+
+
+def _skip_comment_or_string(css: str, i: int) -> int:
+    """
+    If a comment or string starts at `i`, returns the index just past it; otherwise `i`.
+    """
+    if css.startswith("/*", i):
+        end = css.find("*/", i + 2)
+        return len(css) if end < 0 else end + 2
+    if css[i] in "\"'":
+        quote, j = css[i], i + 1
+        while j < len(css) and css[j] != quote:
+            j += 2 if css[j] == "\\" else 1
+        return j + 1
+    return i
+
+
+def normalize_selector(selector: str) -> str:
+    """
+    Canonical form for comparing selectors: no comments, single spaces,
+    no spaces around ',', '>', '+' and '~'.
+    """
+    text = " ".join(_COMMENT_RE.sub(" ", selector).split())
+    return re.sub(r"\s*([,>+~])\s*", r"\1", text)
+
+
+# Everything that can open or close a rule, or hide a brace (a comment or a string)
+_RULE_TOKEN_RE = re.compile(r"""/\*|["'{};]""")
+
+
+def iter_rule_blocks(css: str, start: int = 0):
+    """
+    Yields (selector, body_start, body_end) for each top-level style rule,
+    where css[body_start:body_end] is the text between its braces.
+    At-rules (@media, @import, ...) are skipped.
+
+    Args:
+        start: Where to start reading: the top of the file, or just past the
+            closing '}' of a top-level rule.
+    """
+    # Jumps from token to token instead of looking at every character
+    search = _RULE_TOKEN_RE.search
+    i, depth, prelude_start, block_open = start, 0, start, start
+    while True:
+        match = search(css, i)
+        if match is None:
+            return
+        i = match.start()
+        char = css[i]
+        if char == "{":
+            if depth == 0:
+                block_open = i
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                prelude = css[prelude_start:block_open]
+                if not _COMMENT_RE.sub("", prelude).strip().startswith("@"):
+                    yield prelude, block_open + 1, i
+                prelude_start = i + 1
+        elif char == ";":
+            if depth == 0:
+                prelude_start = i + 1  # e.g. @import / @charset statements
+        else:
+            i = _skip_comment_or_string(css, i)
+            continue
+        i += 1
+
+
+def find_rule_block(css: str, selector: str):
+    """
+    Returns (body_start, body_end) of the first top-level rule for `selector`, or None.
+    """
+    wanted = normalize_selector(selector)
+    for prelude, body_start, body_end in iter_rule_blocks(css):
+        if normalize_selector(prelude) == wanted:
+            return body_start, body_end
+    return None
+
+
+def iter_declarations(css: str, body_start: int, body_end: int):
+    """
+    Yields (name, value_start, value_end, segment_end) for each declaration in a rule body.
+    css[value_start:value_end] is the value without surrounding whitespace or comments.
+    """
+    i, depth, segment_start = body_start, 0, body_start
+    while i <= body_end:
+        if i < body_end:
+            skipped = _skip_comment_or_string(css, i)
+            if skipped != i:
+                i = skipped
+                continue
+            char = css[i]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+        if i == body_end or (css[i] == ";" and depth == 0):
+            segment = css[segment_start:i]
+            colon = _COMMENT_RE.sub(lambda m: " " * len(m.group(0)), segment).find(":")
+            if colon >= 0:
+                name = _COMMENT_RE.sub("", segment[:colon]).strip().lower()
+                value_start = segment_start + colon + 1
+                raw = css[value_start:i]
+                # Trim whitespace and comments from both ends of the value
+                lead = _PADDING_START_RE.match(raw).end()
+                trail = _PADDING_END_RE.search(raw, lead).start()
+                value_end = value_start + trail
+                value_start += lead
+                if name:
+                    yield name, value_start, value_end, i
+            segment_start = i + 1
+        i += 1
+
+
+# --- 2. Patching ---
+
+class CSSPatchError(Exception):
+    """
+    Raised when a patch cannot be applied (unknown selector, invalid value...).
+    """
+
+
+# Values any property takes, and color values `normalize_color` can't turn into RGB
+_ANY_PROPERTY_VALUES = {"inherit", "initial", "unset", "revert", "revert-layer"}
+_OTHER_COLOR_RE = re.compile(
+    r"currentcolor|(?:oklch|oklab|lch|lab|hwb|color|color-mix|light-dark)\(.*\)", re.IGNORECASE | re.DOTALL)
+_VARIABLE_RE = re.compile(r"\b(?:var|env)\(", re.IGNORECASE)
+_STRING_RE = re.compile(r""""(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'""")
+
+
+def _is_color_property(property_name: str) -> bool:
+    return property_name in ("color", "fill", "stroke") or property_name.endswith("-color")
+
+def _top_level_parts(value: str):
+    """
+    Splits a value at the whitespace outside parentheses, comments and strings
+    ('1px solid rgb(0 0 0)' -> ['1px', 'solid', 'rgb(0 0 0)']). None if a
+    parenthesis, comment or string is left open.
+    """
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(value):
+        skipped = _skip_comment_or_string(value, i)
+        if skipped != i:
+            closed = value.endswith("*/", i + 2, skipped) if value.startswith("/*", i) else skipped <= len(value)
+            if not closed:
+                return None
+            i = skipped
+            continue
+        char = value[i]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif char.isspace() and depth == 0:
+            parts.append(value[start:i])
+            start = i + 1
+        i += 1
+    parts.append(value[start:])
+    return [part for part in parts if part] if depth == 0 else None
+
+def _is_color(value: str) -> bool:
+    return bool(_VARIABLE_RE.search(value) or _OTHER_COLOR_RE.fullmatch(value)) or normalize_color(value) is not None
+
+def _validate(property_name: str, value: str):
+    """
+    Rejects a declaration that is malformed, or a color property whose value is
+    not a color. Other properties' values are only checked for well-formedness.
+    """
+    if not re.fullmatch(r"-?[a-zA-Z][\w-]*", property_name):
+        raise CSSPatchError(f"'{property_name}' is not a valid CSS property name.")
+    bare = _IMPORTANT_RE.sub("", value).strip()
+    parts = _top_level_parts(bare)
+    if any(char in value for char in ";{}") or "!" in _STRING_RE.sub("", bare) or not parts:
+        raise CSSPatchError(f"'{value}' is not a valid CSS value.")
+    name = property_name.lower()
+    if not _is_color_property(name) or bare.lower() in _ANY_PROPERTY_VALUES:
+        return
+    # border-color takes one color per side
+    if _is_color(bare) or (name == "border-color" and len(parts) <= 4 and all(map(_is_color, parts))):
+        return
+    raise CSSPatchError(f"'{value}' is not a valid value for '{property_name}': it is not a color.")
+
+
+def patch_css_text(css: str, selector: str, property_name: str, value: str, block: tuple = None):
+    """
+    Sets `property_name: value` in the first top-level rule for `selector`.
+    Everything outside that one value is left byte-for-byte unchanged.
+
+    Args:
+        block: The rule's (body_start, body_end), if already known (e.g., from a
+            rule record's offsets); the rule is then not searched for.
+
+    Returns:
+        (new_css, old_value) - old_value is None if the property was added.
+    """
+    if block is None:
+        block = find_rule_block(css, selector)
+    if block is None:
+        raise CSSPatchError(f"CSS selector '{selector}' not found in style.css.")
+    body_start, body_end = block
+    property_name = property_name.lower()
+
+    declarations = list(iter_declarations(css, body_start, body_end))
+    matches = [d for d in declarations if d[0] == property_name]
+    if matches:
+        # The last declaration of a property is the one that wins
+        _, value_start, value_end, _ = matches[-1]
+        old_value = css[value_start:value_end]
+        new_value = value.strip()
+        if _IMPORTANT_RE.search(old_value) and not _IMPORTANT_RE.search(new_value):
+            new_value += " !important"
+        return css[:value_start] + new_value + css[value_end:], old_value
+
+    # Not declared yet: append a declaration, matching the rule's indentation
+    body = css[body_start:body_end]
+    if declarations:
+        last_end = declarations[-1][3]
+        needs_semicolon = last_end >= body_end or css[last_end] != ";"
+        insert_at = last_end if needs_semicolon else last_end + 1
+    else:
+        needs_semicolon, insert_at = False, body_start
+    indent_match = re.search(r"\n([ \t]+)\S", body)
+    if "\n" in body:
+        indent = indent_match.group(1) if indent_match else "    "
+        addition = f"\n{indent}{property_name}: {value.strip()};"
+    else:
+        addition = f" {property_name}: {value.strip()};"
+    if needs_semicolon:
+        addition = ";" + addition
+    return css[:insert_at] + addition + css[insert_at:], None
+
+
+def _compact_diff(old_css: str, new_css: str) -> str:
+    lines = difflib.unified_diff(old_css.splitlines(), new_css.splitlines(), lineterm="", n=0)
+    return "\n".join(line for line in lines if not line.startswith(("---", "+++")))
+
+
+def set_css_properties(changes: list) -> str:
+    """
+    Applies several property edits with a single write to 'style.css'.
+    Either every edit is applied or none is.
+
+    Args:
+        changes: A list of {"selector": ..., "property": ..., "value": ...} dicts.
+
+    Returns:
+        A compact diff of what changed, or an error message.
+    """
+    try:
+        for change in changes:
+            _validate(change["property"], change["value"])
+
+        css_path = current_site().css_path
+        with css_write_lock():
+            # The text and its parsed rules, from the same version of the file
+            version = world_files.current(css_path)
+            parsed = stylesheet_cache.for_version(version)
+            old_css = version.text()
+
+            targets = []
+            for change in changes:
+                rules = parsed.find_rules(change["selector"])
+                if not rules:
+                    raise CSSPatchError(f"CSS selector '{change['selector']}' not found in style.css.")
+                targets.append(rules[0])
+
+            # With ASCII text, the records' byte offsets are character offsets, so each
+            # rule is patched where it is, without a search. Rules are patched from the end
+            # of the file back, so an edit never moves a rule that is still to be patched.
+            sheet = parsed.sheet
+            use_offsets = sheet.has_offsets and sheet.ascii and all(
+                old_css[rule.body_start - 1:rule.body_start] == "{" and old_css[rule.body_end:rule.body_end + 1] == "}"
+                for rule in targets)
+            order = range(len(changes))
+            if use_offsets:
+                order = sorted(order, key=lambda n: targets[n].body_start, reverse=True)
+            new_css, summary, bodies = old_css, [None] * len(changes), {}
+            for n in order:
+                change, rule = changes[n], targets[n]
+                selector, prop, value = change["selector"], change["property"], change["value"]
+                block = None
+                if use_offsets:
+                    # The rule's body as the earlier edits of this same rule left it
+                    body = bodies.get(id(rule), old_css[rule.body_start:rule.body_end])
+                    block = (rule.body_start, rule.body_start + len(body))
+                length = len(new_css)
+                new_css, old_value = patch_css_text(new_css, rule.selector, prop, value, block=block)
+                if use_offsets:
+                    bodies[id(rule)] = new_css[block[0]:block[1] + len(new_css) - length]
+                summary[n] = f"{selector} {{ {prop}: {old_value or '(unset)'} -> {value} }}"
+
+            if new_css == old_css:
+                return "No change: style.css already has these values.\n" + "\n".join(summary)
+
+            save_css_text(new_css, old_css, parsed.sheet)
+
+            if use_offsets:
+                # Update the patched records and shift the ones after them, instead of
+                # re-parsing the file (again from the end back, so offsets stay valid)
+                for rule in sorted({id(rule): rule for rule in targets}.values(),
+                                   key=lambda rule: rule.body_start, reverse=True):
+                    sheet = sheet.with_body(rule, bodies[id(rule)])
+                stylesheet_cache.update(css_path, new_css, sheet=sheet, selectors_from=parsed)
+            else:
+                stylesheet_cache.update(css_path, new_css)
+
+        return "Patched style.css:\n" + "\n".join(summary) + "\n" + _compact_diff(old_css, new_css)
+
+    except (CSSPatchError, KeyError) as e:
+        return f"Error: {e}"
+    except Exception as e:
+        stylesheet_cache.invalidate(current_site().css_path)
+        return f"Error patching CSS: {e}"
+
+
+def set_css_property(selector_text: str, property_name: str, value: str) -> str:
+    """
+    Sets one property on the rule with this exact selector (e.g., '.contact-button',
+    'background-color', '#ff0000') and saves 'style.css'. Unrelated rules are untouched.
+
+    Returns:
+        A compact diff of the change, or an error message.
+    """
+    return set_css_properties([{"selector": selector_text, "property": property_name, "value": value}])
+
+
+def get_css_rule(selector_text: str) -> str:
+    """
+    Returns the source text of the rule for one selector (instead of the whole file).
+    """
+    try:
+        css = world_files.current(current_site().css_path).text()
+        block = find_rule_block(css, selector_text)
+        if block is None:
+            return f"Error: CSS selector '{selector_text}' not found in style.css."
+        body_start, body_end = block
+        return f"{selector_text} {{{css[body_start:body_end]}}}"
+    except Exception as e:
+        return f"Error reading CSS rule: {e}"
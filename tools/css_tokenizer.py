@@ -0,0 +1,620 @@
+import contextlib
+import mmap
+import os
+import re
+
+# --- 1. Rule Records ---
+# The inspection tools only need each style rule's selector, its declarations and
+# the @media it sits in, so a stylesheet is read into flat, slotted records rather
+# than a full CSSOM. Each record keeps the byte offsets of its rule, so a patch can
+# go straight to the rule's text, and the records can be brought up to date after
+# the patch without parsing the sheet again. Records are never changed once a sheet
+# holds them: an update builds a new sheet that shares the records it didn't touch,
+# so readers of an older version of the file keep a consistent view.
+
+# Files at least this big are memory-mapped rather than read into memory
+MMAP_THRESHOLD = 1 << 20
+
+_IMPORTANT_RE = re.compile(r"!\s*important\s*$", re.IGNORECASE)
+
+
+class UnsupportedCSS(Exception):
+    """
+    Raised when the tokenizer meets CSS it doesn't handle (nested rules, unbalanced
+    braces, an unterminated string...); `parse_stylesheet` then falls back to cssutils.
+    """
+
+
+class CSSRule:
+    """
+    One style rule.
+
+    Attributes:
+        selector: The selector text, normalized by `normalize_selector_text`
+            (a grouped rule keeps its whole group, e.g. 'h1, h2').
+        start / body_start / body_end: Byte offsets of the selector, of the first byte
+            after '{' and of the closing '}' (None when cssutils parsed the sheet).
+        media: The media texts of the @media blocks the rule is nested in, outermost first.
+        declarations: (name, value, important) tuples in source order.
+    """
+    __slots__ = ("selector", "start", "body_start", "body_end", "media", "declarations")
+
+    def __init__(self, selector: str, start, body_start, body_end, media: tuple, declarations: list):
+        self.selector = selector
+        self.start = start
+        self.body_start = body_start
+        self.body_end = body_end
+        self.media = media
+        self.declarations = declarations
+
+    def selectors(self) -> list:
+        """
+        The members of the selector group ('h1, h2' -> ['h1', 'h2']).
+        """
+        return split_selector_group(self.selector)
+
+    def get(self, prop: str, default: str = ""):
+        """
+        Returns the value the rule gives `prop` (the last !important declaration,
+        else the last one), or `default`.
+        """
+        value, important = default, False
+        for name, declared, declared_important in self.declarations:
+            if name == prop and (declared_important or not important):
+                value, important = declared, declared_important
+        return value
+
+    def __repr__(self):
+        return f"CSSRule({self.selector!r} @ {self.body_start})"
+
+
+class RuleSheet:
+    """
+    The style rules of one stylesheet, in source order.
+
+    Attributes:
+        rules: CSSRule records, including those nested in @media blocks.
+        imports: (href, media text) of the @import rules before the first style rule.
+        ascii: Whether the source is pure ASCII, i.e. byte offsets are also
+            character offsets into the decoded text.
+        source: "tokenizer", or "cssutils" if the sheet needed the fallback.
+        fallback: Why the tokenizer gave up, when it did.
+    """
+    __slots__ = ("rules", "imports", "ascii", "source", "fallback")
+
+    def __init__(self, rules: list, imports: list, ascii: bool, source: str = "tokenizer", fallback: str = None):
+        self.rules = rules
+        self.imports = imports
+        self.ascii = ascii
+        self.source = source
+        self.fallback = fallback
+
+    @property
+    def has_offsets(self) -> bool:
+        return self.source == "tokenizer"
+
+    def top_level(self) -> list:
+        """
+        The rules that are not inside an @media block.
+        """
+        return [rule for rule in self.rules if not rule.media]
+
+    def with_body(self, rule: CSSRule, body: str) -> "RuleSheet":
+        """
+        The sheet after the text between `rule`'s braces was replaced with `body` in
+        the file: the rule's declarations are re-read and every later rule's offsets
+        move by the change in length. Nothing is re-parsed.
+        """
+        position = self.rules.index(rule)
+        size = len(body) if body.isascii() else len(body.encode('utf-8'))
+        delta = size - (rule.body_end - rule.body_start)
+        patched = CSSRule(rule.selector, rule.start, rule.body_start, rule.body_end + delta,
+                          rule.media, parse_declarations(body))
+        rules = self.rules[:position] + [patched] + _shifted(self.rules[position + 1:], delta)
+        return RuleSheet(rules, self.imports, self.ascii and body.isascii())
+
+
+def _shifted(rules: list, delta: int) -> list:
+    # Copies of the records, moved `delta` bytes
+    if not delta:
+        return list(rules)
+    return [CSSRule(rule.selector, rule.start + delta, rule.body_start + delta, rule.body_end + delta,
+                    rule.media, rule.declarations) for rule in rules]
+
+
+# --- 2. The Tokenizer ---
+# One pass over the bytes (or an mmap of them), jumping from one structural
+# character to the next with a compiled regex; the text in between is never
+# looked at character by character. Comments and strings are skipped as whole
+# tokens, so a '{' or ';' inside them is never mistaken for structure.
+
+_TOKEN_RE = re.compile(rb"""/\*|["'{};\\]""")
+_BODY_TOKEN_RE = re.compile(rb"""/\*|["'{}\\]""")
+_STRING_RES = {
+    ord('"'): re.compile(rb'"(?:[^"\\\n]|\\[\s\S])*"'),
+    ord("'"): re.compile(rb"'(?:[^'\\\n]|\\[\s\S])*'"),
+}
+_PADDING_RE = re.compile(rb"(?:\s|/\*(?:[^*]|\*(?!/))*\*/)*")
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+_COMMENT_RE = re.compile(r"/\*(?:[^*]|\*(?!/))*\*/")
+_AT_KEYWORD_RE = re.compile(r"@[\w-]+")
+_IMPORT_RE = re.compile(
+    r"""@import\s+(?:url\(\s*(["']?)(.*?)\1\s*\)|(["'])(.*?)\3)\s*(.*)$""", re.IGNORECASE | re.DOTALL)
+_BOM = b"\xef\xbb\xbf"
+
+_OPEN, _CLOSE, _SEMICOLON, _BACKSLASH, _SLASH = (ord(c) for c in "{};\\/")
+
+
+def _skip(buf, i: int) -> int:
+    """
+    Returns the index just past the comment or string that starts at `i`.
+    """
+    if buf[i] == _SLASH:
+        end = buf.find(b"*/", i + 2)
+        return len(buf) if end < 0 else end + 2
+    match = _STRING_RES[buf[i]].match(buf, i)
+    if match is None:
+        raise UnsupportedCSS(f"unterminated string at byte {i}")
+    return match.end()
+
+def _clean(raw: bytes) -> str:
+    text = raw.decode('utf-8')
+    if "/*" in text:
+        text = _COMMENT_RE.sub(" ", text)
+    return text.strip()
+
+def _body_end(buf, i: int) -> int:
+    # The '}' that closes a style rule's body, which starts at `i`
+    search = _BODY_TOKEN_RE.search
+    while True:
+        match = search(buf, i)
+        if match is None:
+            raise UnsupportedCSS("unclosed rule at end of file")
+        i = match.start()
+        char = buf[i]
+        if char == _CLOSE:
+            return i
+        if char == _OPEN:
+            raise UnsupportedCSS(f"nested block at byte {i}")
+        i = i + 2 if char == _BACKSLASH else _skip(buf, i)
+
+def _block_end(buf, i: int) -> int:
+    # Past the '}' that balances the block starting at `i` (an at-rule we don't read)
+    search, depth = _BODY_TOKEN_RE.search, 1
+    while True:
+        match = search(buf, i)
+        if match is None:
+            raise UnsupportedCSS("unclosed block at end of file")
+        i = match.start()
+        char = buf[i]
+        if char == _OPEN:
+            depth += 1
+        elif char == _CLOSE:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        elif char == _BACKSLASH:
+            i += 2
+            continue
+        else:
+            i = _skip(buf, i)
+            continue
+        i += 1
+
+def tokenize(buf) -> RuleSheet:
+    """
+    Reads the rules of a stylesheet from bytes (or an mmap) in one pass.
+    Raises UnsupportedCSS for anything it can't read the way a browser would.
+    """
+    rules, imports, _ = _tokenize(buf)
+    return RuleSheet(rules, imports, _NON_ASCII_RE.search(buf) is None)
+
+def _tokenize(buf) -> tuple:
+    # (rules, imports, where the text after the last rule or statement starts)
+    rules, imports, media = [], [], []
+    search = _TOKEN_RE.search
+    i = prelude_start = 3 if buf[:3] == _BOM else 0
+    imports_allowed = True
+    while True:
+        match = search(buf, i)
+        if match is None:
+            break
+        i = match.start()
+        char = buf[i]
+        if char == _OPEN:
+            prelude = _clean(buf[prelude_start:i])
+            if prelude.startswith("@"):
+                keyword = _AT_KEYWORD_RE.match(prelude)
+                if keyword and keyword.group(0).lower() == "@media":
+                    media.append(" ".join(prelude[keyword.end():].split()))
+                    i += 1
+                else:
+                    # @font-face, @keyframes, @supports, @page...: nothing to inspect
+                    i = _block_end(buf, i + 1)
+            else:
+                end = _body_end(buf, i + 1)
+                if prelude:
+                    start = _PADDING_RE.match(buf, prelude_start).end()
+                    rules.append(CSSRule(normalize_selector_text(prelude), start, i + 1, end, tuple(media),
+                                         parse_declarations(buf[i + 1:end].decode('utf-8'))))
+                i = end + 1
+            imports_allowed = False
+            prelude_start = i
+        elif char == _CLOSE:
+            if not media:
+                raise UnsupportedCSS(f"unbalanced '}}' at byte {i}")
+            media.pop()
+            i += 1
+            prelude_start = i
+        elif char == _SEMICOLON:
+            prelude = _clean(buf[prelude_start:i])
+            if prelude.startswith("@"):
+                keyword = _AT_KEYWORD_RE.match(prelude)
+                keyword = keyword.group(0).lower() if keyword else "@"
+                if keyword == "@import" and imports_allowed and not media:
+                    found = _IMPORT_RE.match(prelude)
+                    if found:
+                        imports.append((found.group(2) if found.group(2) is not None else found.group(4),
+                                        " ".join(found.group(5).split())))
+                elif keyword not in ("@charset", "@import", "@layer"):
+                    imports_allowed = False
+            elif prelude:
+                raise UnsupportedCSS(f"';' in a selector at byte {i}")
+            i += 1
+            prelude_start = i
+        elif char == _BACKSLASH:
+            i += 2
+        else:
+            i = _skip(buf, i)
+    if media:
+        raise UnsupportedCSS("unclosed @media block at end of file")
+    return rules, imports, prelude_start
+
+
+# --- 3. Incremental Updates ---
+# When a file changes, usually only a rule or two did. The bytes both versions
+# share at the start and the end are trimmed (a block at a time), and only the
+# top-level rules around what is left are tokenized again; the rules before them
+# are shared with the old sheet and the ones after are shifted copies.
+
+_BLOCK = 4096
+
+
+def common_prefix(a, b, limit: int) -> int:
+    """
+    The length of the common start of `a` and `b` (str or bytes), up to `limit`.
+    """
+    i = 0
+    while i + _BLOCK <= limit and a[i:i + _BLOCK] == b[i:i + _BLOCK]:
+        i += _BLOCK
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+def common_suffix(a, b, limit: int) -> int:
+    """
+    The length of the common end of `a` and `b` (str or bytes), up to `limit`.
+    """
+    i, a_end, b_end = 0, len(a), len(b)
+    while i + _BLOCK <= limit and a[a_end - i - _BLOCK:a_end - i] == b[b_end - i - _BLOCK:b_end - i]:
+        i += _BLOCK
+    while i < limit and a[a_end - i - 1] == b[b_end - i - 1]:
+        i += 1
+    return i
+
+def _first(rules: list, lo: int, test) -> int:
+    # The first position from `lo` where `test(rule)` holds (it holds for every later one too)
+    hi = len(rules)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if test(rules[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def retokenize(sheet: RuleSheet, old: bytes, new: bytes):
+    """
+    Returns the RuleSheet of `new`, given that `sheet` was read from `old`, tokenizing
+    only the top-level rules around the bytes that differ. Returns None when that
+    wouldn't be safe (the change reaches into an @media block, or leaves an unclosed
+    comment or a stray selector); the caller then parses `new` in full.
+    """
+    if not sheet.has_offsets:
+        return None
+    limit = min(len(old), len(new))
+    prefix = common_prefix(old, new, limit)
+    old_end = len(old) - common_suffix(old, new, limit - prefix)
+    delta = len(new) - len(old)
+
+    rules = sheet.rules
+    first = _first(rules, 0, lambda rule: rule.body_end >= prefix)
+    after = _first(rules, first, lambda rule: rule.start >= old_end)
+    # The window starts at the top of the file or just past a top-level rule, and ends
+    # at the end of the file or where a top-level rule starts
+    if (first and rules[first - 1].media) or (after < len(rules) and rules[after].media):
+        return None
+    window_start = rules[first - 1].body_end + 1 if first else 0
+    window_end = (rules[after].start if after < len(rules) else len(old)) + delta
+    window = bytes(new[window_start:window_end])
+    if window.rfind(b"/*") > window.rfind(b"*/"):
+        return None
+    try:
+        found, imports, tail = _tokenize(window)
+    except UnsupportedCSS:
+        return None
+    # Leftover text would belong to the next rule's selector, and an @import after
+    # the first rule is ignored
+    if (first and imports) or _clean(window[tail:]):
+        return None
+
+    updated = rules[:first] + _shifted(found, window_start) + _shifted(rules[after:], delta)
+    return RuleSheet(updated, sheet.imports if first else imports, _NON_ASCII_RE.search(new) is None)
+
+
+def parse_with_cssutils(text: str):
+    """
+    Returns cssutils' CSSStyleSheet for `text`, without fetching @import targets
+    (each one is its own cache entry, see tools/computed_style.py, so editing one
+    sheet never re-parses another).
+    """
+    import cssutils
+    parser = cssutils.CSSParser(fetcher=lambda url: (None, ""))
+    return parser.parseString(text)
+
+def from_cssutils(stylesheet, fallback: str = None) -> RuleSheet:
+    """
+    The same records, without offsets, from a cssutils CSSStyleSheet.
+    """
+    rules, imports = [], []
+
+    def collect(css_rules, media: tuple):
+        for rule in css_rules:
+            if rule.type == rule.MEDIA_RULE:
+                collect(rule.cssRules, media + (rule.media.mediaText,))
+            elif rule.type == rule.STYLE_RULE:
+                declarations = [(prop.name, prop.value, prop.priority == "important")
+                                for prop in rule.style.getProperties(all=True)]
+                rules.append(CSSRule(normalize_selector_text(rule.selectorText), None, None, None,
+                                     media, declarations))
+
+    for rule in stylesheet.cssRules:
+        # @import is only valid before every other rule
+        if rule.type not in (rule.IMPORT_RULE, rule.CHARSET_RULE, rule.COMMENT):
+            break
+        if rule.type == rule.IMPORT_RULE and rule.href:
+            imports.append((rule.href, rule.media.mediaText))
+    collect(stylesheet.cssRules, ())
+    return RuleSheet(rules, imports, False, source="cssutils", fallback=fallback)
+
+def parse_stylesheet(data) -> RuleSheet:
+    """
+    Reads a stylesheet (bytes, an mmap, or str) with the tokenizer, falling back
+    to cssutils for CSS the tokenizer doesn't handle.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    try:
+        return tokenize(data)
+    except UnsupportedCSS as e:
+        return from_cssutils(parse_with_cssutils(bytes(data).decode('utf-8')), str(e))
+
+@contextlib.contextmanager
+def open_stylesheet(path: str):
+    """
+    Yields the bytes of a stylesheet: an mmap for files of MMAP_THRESHOLD bytes
+    or more (nothing is copied until a rule is read), the contents otherwise.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            yield f.read()
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+# --- 4. Declarations And Selectors ---
+
+_COMPLEX_BODY_RE = re.compile(r"""["'()\\]|/\*""")
+_DECLARATION_TOKEN_RE = re.compile(r"""/\*|["'();\\]""")
+_TEXT_STRING_RES = {
+    '"': re.compile(r'"(?:[^"\\]|\\[\s\S])*"?'),
+    "'": re.compile(r"'(?:[^'\\]|\\[\s\S])*'?"),
+}
+_PROPERTY_NAME_RE = re.compile(r"-{0,2}[a-zA-Z_][\w-]*")
+_COMPLEX_SELECTOR_RE = re.compile(r"""[()\[\]"'\\]|/\*""")
+_COMBINATOR_RE = re.compile(r"\s*([,>+~])\s*")
+
+
+def _split_declarations(text: str) -> list:
+    # Splits on the ';' that are outside strings, comments and parentheses,
+    # dropping the comments
+    parts, current, depth, i = [], [], 0, 0
+    search = _DECLARATION_TOKEN_RE.search
+    while True:
+        match = search(text, i)
+        if match is None:
+            current.append(text[i:])
+            break
+        j = match.start()
+        token = match.group(0)
+        current.append(text[i:j])
+        if token == "/*":
+            end = text.find("*/", j + 2)
+            current.append(" ")
+            i = len(text) if end < 0 else end + 2
+            continue
+        if token in "\"'":
+            i = _TEXT_STRING_RES[token].match(text, j).end()
+            current.append(text[j:i])
+            continue
+        if token == ";" and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(depth - 1, 0)
+            current.append(text[j:j + 2] if token == "\\" else token)
+            if token == "\\":
+                i = j + 2
+                continue
+        i = j + 1
+    parts.append("".join(current))
+    return parts
+
+def parse_declarations(text: str) -> list:
+    """
+    Returns the (name, value, important) declarations of a rule body or a style=""
+    attribute, in source order. Property names are lowercased (custom properties
+    keep their case); values are kept as written, minus '!important'.
+    """
+    parts = _split_declarations(text) if _COMPLEX_BODY_RE.search(text) else text.split(";")
+    declarations = []
+    for part in parts:
+        name, colon, value = part.partition(":")
+        if not colon:
+            continue
+        name, value = name.strip(), value.strip()
+        if not value or not _PROPERTY_NAME_RE.fullmatch(name):
+            continue
+        if not name.startswith("--"):
+            name = name.lower()
+        important = False
+        if "!" in value:
+            found = _IMPORTANT_RE.search(value)
+            if found:
+                important, value = True, value[:found.start()].rstrip()
+        declarations.append((name, value, important))
+    return declarations
+
+def normalize_selector_text(text: str) -> str:
+    """
+    The form selectors are indexed under: no comments, whitespace collapsed,
+    ', ' between group members and one space around '>', '+' and '~'
+    ('h1,h2 >a' -> 'h1, h2 > a'), as cssutils writes them.
+    """
+    if "/*" in text:
+        text = _COMMENT_RE.sub(" ", text)
+    text = " ".join(text.split())
+    if not _COMPLEX_SELECTOR_RE.search(text):
+        return _COMBINATOR_RE.sub(lambda m: ", " if m.group(1) == "," else f" {m.group(1)} ", text)
+
+    # Leave '+' in ':nth-child(2n+1)', '~' in '[class~=x]' and escaped characters alone
+    out, depth, quote, i = [], 0, None, 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            out.append(text[i:i + 2])
+            i += 2
+            continue
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif depth == 0 and char in ",>+~":
+            while out and out[-1] == " ":
+                out.pop()
+            out.append(", " if char == "," else f" {char} ")
+            i += 1
+            while i < len(text) and text[i] == " ":
+                i += 1
+            continue
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+def split_selector_group(selector_text: str) -> list:
+    """
+    Splits 'h1, a[title="x,y"]' into ['h1', 'a[title="x,y"]'].
+    """
+    if "," not in selector_text:
+        return [selector_text.strip()]
+    parts, depth, start, quote = [], 0, 0, None
+    for i, char in enumerate(selector_text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(selector_text[start:i].strip())
+            start = i + 1
+    parts.append(selector_text[start:].strip())
+    return parts
+
+
+# --- 5. Specificity ---
+# (0, ids, classes/attributes/pseudo-classes, types/pseudo-elements), the tuple
+# cssutils reports, counted the Selectors Level 4 way: :not(), :is() and :has()
+# count their most specific argument, :where() counts nothing.
+
+_SPECIFICITY_RE = re.compile(r"""
+    (?P<skip>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<id>\#(?:[\w-]|\\.)+)
+  | (?P<cls>\.(?:[\w-]|\\.)+)
+  | (?P<attr>\[[^\]]*\])
+  | (?P<element>::[\w-]+|:(?:before|after|first-line|first-letter)\b)
+  | (?P<function>:[\w-]+\()
+  | (?P<pseudo>:[\w-]+)
+  | (?P<type>(?:[\w-]|\\.)+(?:\|(?:[\w-]+|\*))?)
+""", re.VERBOSE)
+_ARGUMENT_FUNCTIONS = {":not(", ":is(", ":matches(", ":-webkit-any(", ":-moz-any(", ":has("}
+
+
+def _closing_paren(text: str, i: int) -> int:
+    depth = 1
+    while i < len(text):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(text)
+
+def specificity(selector: str) -> tuple:
+    """
+    Returns the specificity of one selector (not a group), e.g. '#nav a.cta' -> (0, 1, 1, 1).
+    """
+    ids = classes = types = 0
+    i = 0
+    while True:
+        match = _SPECIFICITY_RE.search(selector, i)
+        if match is None:
+            break
+        kind = match.lastgroup
+        i = match.end()
+        if kind == "id":
+            ids += 1
+        elif kind in ("cls", "attr", "pseudo"):
+            classes += 1
+        elif kind == "element":
+            types += 1
+        elif kind == "type":
+            types += 1
+        elif kind == "function":
+            end = _closing_paren(selector, i)
+            name = match.group(0).lower()
+            if name in _ARGUMENT_FUNCTIONS:
+                best = max(specificity(argument) for argument in split_selector_group(selector[i:end]))
+                ids, classes, types = ids + best[1], classes + best[2], types + best[3]
+            elif name != ":where(":
+                # :nth-child(2n+1), :lang(en)...
+                classes += 1
+            i = end + 1
+    return (0, ids, classes, types)
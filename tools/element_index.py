@@ -0,0 +1,262 @@
+import difflib
+import re
+import threading
+
+from tools.colors import NAMED_COLORS
+from tools.world_watch import world_files
+
+# --- 1. What We Index ---
+# Every visible element in index.html, described by the words a user might use for it
+# (its text, aria-label, id, classes and tag), plus the CSS selectors that target it.
+
+SKIPPED_TAGS = {"html", "head", "meta", "link", "script", "style", "title", "noscript", "template"}
+
+# Plain-English names for tags ("the title" -> <h1>, "the link" -> <a>)
+TAG_SYNONYMS = {
+    "a": {"link", "anchor"},
+    "button": {"button", "btn"},
+    "h1": {"heading", "header", "headline", "title"},
+    "h2": {"heading", "subheading", "subtitle"},
+    "h3": {"heading", "subheading"},
+    "p": {"paragraph", "text"},
+    "img": {"image", "picture", "logo", "icon"},
+    "input": {"input", "field", "box"},
+    "textarea": {"textarea", "field", "box"},
+    "nav": {"navigation", "menu", "nav"},
+    "footer": {"footer"},
+    "header": {"header", "banner"},
+    "ul": {"list"},
+    "ol": {"list"},
+    "li": {"item"},
+    "form": {"form"},
+}
+
+# Words in a bug report that never describe *which* element it is about
+STOPWORDS = {
+    "the", "a", "an", "is", "are", "it", "its", "should", "be", "on", "in", "of", "our",
+    "site", "page", "website", "color", "colour", "wrong", "but", "and", "to", "this",
+    "that", "they", "them", "instead", "currently", "now", "looks", "look", "appears",
+    "background", "was", "were", "has", "have",
+} | set(NAMED_COLORS)
+
+# Tags whose nested text is their own label (e.g. <button><span>Send</span></button>).
+# For any other element only its direct text counts; the rest belongs to its children.
+LABEL_TAGS = {
+    "a", "button", "label", "summary", "option", "li", "th", "td", "p", "span",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+}
+# Text longer than this is content, not a label
+MAX_LABEL_CHARS = 80
+
+# Elements a user can act on; they come first in a page digest
+INTERACTIVE_TAGS = {"a", "button", "input", "select", "textarea", "label", "summary", "option"}
+INTERACTIVE_ATTRIBUTES = ("href", "onclick", "role", "tabindex")
+
+
+def _words(text: str) -> list:
+    return [w for w in re.split(r"[^a-z0-9]+", text.lower()) if w]
+
+
+class IndexedElement:
+    """
+    One element of the page: its description words and candidate selectors.
+    """
+    __slots__ = ("tag", "text", "element_id", "classes", "aria_label", "interactive", "words", "selectors")
+
+    def __init__(self, tag, text, element_id, classes, aria_label, interactive=False):
+        self.tag = tag
+        self.text = text
+        self.element_id = element_id
+        self.classes = classes
+        self.aria_label = aria_label
+        self.interactive = interactive
+
+        words = set(_words(text)) | set(_words(aria_label)) | set(_words(element_id))
+        for cls in classes:
+            words |= set(_words(cls))
+        words |= TAG_SYNONYMS.get(tag, {tag})
+        self.words = words
+
+        # Most specific first: id, then classes, then the bare tag
+        self.selectors = []
+        if element_id:
+            self.selectors.append(f"#{element_id}")
+        if len(classes) > 1:
+            self.selectors.append("." + ".".join(classes))
+        self.selectors.extend(f".{cls}" for cls in classes)
+        self.selectors.append(tag)
+
+    def describe(self) -> str:
+        attrs = ""
+        if self.element_id:
+            attrs += f' id="{self.element_id}"'
+        if self.classes:
+            attrs += f' class="{" ".join(self.classes)}"'
+        label = self.text or self.aria_label
+        return f"<{self.tag}{attrs}> '{label[:40]}'" if label else f"<{self.tag}{attrs}>"
+
+
+# --- 2. The Index ---
+
+class ElementIndex:
+    """
+    A precomputed index over one version of an HTML file.
+    """
+
+    def __init__(self, soup):
+        self.elements = []
+        # How many elements each selector matches, so we can prefer unique ones
+        self.selector_counts = {}
+        # Inverted index: description word -> positions of the elements it describes
+        self.postings = {}
+        # max_chars -> the page digest of that size
+        self._digests = {}
+
+        for node in soup.find_all(True):
+            if node.name in SKIPPED_TAGS:
+                continue
+            if node.name in LABEL_TAGS:
+                text = node.get_text(" ", strip=True)
+            else:
+                text = " ".join(s.strip() for s in node.find_all(string=True, recursive=False) if s.strip())
+            text = text[:MAX_LABEL_CHARS]
+            element = IndexedElement(
+                tag=node.name,
+                text=text,
+                element_id=node.get("id", ""),
+                classes=list(node.get("class", [])),
+                aria_label=node.get("aria-label", "") or node.get("title", "") or node.get("alt", ""),
+                interactive=node.name in INTERACTIVE_TAGS or any(node.has_attr(a) for a in INTERACTIVE_ATTRIBUTES),
+            )
+            position = len(self.elements)
+            self.elements.append(element)
+            for word in element.words:
+                self.postings.setdefault(word, []).append(position)
+            for selector in element.selectors:
+                self.selector_counts[selector] = self.selector_counts.get(selector, 0) + 1
+
+    def _expand(self, query_word: str) -> dict:
+        """
+        Returns the indexed words matching `query_word` with their similarity:
+        the word itself, or close spellings of it ("contakt" -> "contact").
+        """
+        if query_word in self.postings:
+            return {query_word: 1.0}
+        close = difflib.get_close_matches(query_word, self.postings.keys(), n=3, cutoff=0.75)
+        return {w: difflib.SequenceMatcher(None, query_word, w).ratio() for w in close}
+
+    def resolve(self, description: str, known_selectors=None, limit: int = 5) -> list:
+        """
+        Ranks candidate selectors for a plain-English element description.
+
+        Args:
+            description: e.g. "Contact us button" (a whole bug report works too).
+            known_selectors: Selectors that have a rule in the stylesheet; these are preferred.
+            limit: How many candidates to return.
+
+        Returns:
+            A list of (selector, score, element) tuples, best first.
+        """
+        query = [w for w in _words(description) if w not in STOPWORDS]
+        if not query:
+            return []
+        known_selectors = known_selectors or set()
+
+        # Score each element by how well it covers the query words
+        per_element = {}
+        for query_word in query:
+            for word, similarity in self._expand(query_word).items():
+                for position in self.postings[word]:
+                    matched = per_element.setdefault(position, {})
+                    matched[query_word] = max(matched.get(query_word, 0.0), similarity)
+
+        best = {}
+        for position, matched in per_element.items():
+            element = self.elements[position]
+            score = sum(matched.values()) / len(query)
+            for rank, selector in enumerate(element.selectors):
+                candidate = score
+                if selector in known_selectors:
+                    candidate += 0.2
+                if self.selector_counts.get(selector, 0) == 1:
+                    candidate += 0.1
+                # Small tie-breaker in favour of more specific selectors
+                candidate -= 0.01 * rank
+                if candidate > best.get(selector, (None, -1.0))[1]:
+                    best[selector] = (selector, candidate, element)
+
+        ranked = sorted(best.values(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def digest(self, max_chars: int) -> str:
+        """
+        A compact listing of the page for an agent, instead of its raw HTML: one
+        `describe()` line per element in document order, within `max_chars`.
+        Elements with no text, id or class (bare wrappers) are left out. If the
+        page is bigger than that, interactive elements are kept first, then those
+        with an id, then the rest.
+        """
+        digest = self._digests.get(max_chars)
+        if digest is None:
+            digest = self._digests[max_chars] = self._digest(max_chars)
+        return digest
+
+    def _digest(self, max_chars: int) -> str:
+        candidates = [(0 if element.interactive else 1 if element.element_id else 2, position)
+                      for position, element in enumerate(self.elements)
+                      if element.interactive or element.element_id or element.classes
+                      or element.text or element.aria_label]
+        # What is left after the header and footer lines
+        room, kept, used = max_chars - 160, [], 0
+        for _, position in sorted(candidates):
+            size = len(self.elements[position].describe()) + 1
+            if used + size > room:
+                continue
+            kept.append(position)
+            used += size
+        kept.sort()
+        lines = [f"index.html: {len(kept)} of {len(candidates)} elements with text, an id or a class "
+                 f"(tag, id, classes, text; raw HTML left out)"]
+        lines.extend(self.elements[position].describe() for position in kept)
+        if len(kept) < len(candidates):
+            lines.append(f"... {len(candidates) - len(kept)} more elements not shown; "
+                         f"search them with `find_selector`.")
+        return "\n".join(lines)
+
+
+# --- 3. One Index Per HTML File Version ---
+
+class ElementIndexCache:
+    """
+    Keeps one ElementIndex per version of an HTML file (tools/world_watch.py),
+    built from the DOM that version shares with the other tools.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> ElementIndex:
+        return self.for_version(world_files.current(path))
+
+    def for_version(self, version) -> ElementIndex:
+        index = version.built("element_index")
+        if index is not None:
+            with self._lock:
+                self.hits += 1
+            return index
+        return version.view("element_index", self._build)
+
+    def _build(self, version) -> ElementIndex:
+        with self._lock:
+            self.misses += 1
+        return ElementIndex(version.dom())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+# The single shared instance used by all tools in this process.
+element_index_cache = ElementIndexCache()
@@ -1,9 +1,24 @@
+import contextlib
+import contextvars
 import os
-import json
 
-# Define the file paths our tools will use
+from tools.css_cache import stylesheet_cache
+from tools.memory_store import MEMORY_LOG_PATH, get_memory_store, shared_file_lock
+from tools.site import current_site
+from tools.snapshots import atomic_write, get_snapshot_store
+from tools.world_watch import world_files
+
+# The default site's file paths; the tools use the current site's (tools/site.py)
 CSS_FILE_PATH = os.path.join("world", "style.css")
-MEMORY_FILE_PATH = os.path.join("memory", "procedural_memory.json")
+MEMORY_FILE_PATH = MEMORY_LOG_PATH
+
+def css_write_lock():
+    """
+    The lock that serializes every change to the current site's style.css,
+    across threads *and* processes. It is re-entrant, so a caller can hold it
+    around a whole read-modify-write.
+    """
+    return shared_file_lock(current_site().css_path)
 
 def read_css_file() -> str:
     """
@@ -11,45 +26,139 @@ def read_css_file() -> str:
     Returns the content as a string.
     """
     try:
-        with open(CSS_FILE_PATH, 'r') as f:
-            return f.read()
+        return world_files.current(current_site().css_path).text()
     except Exception as e:
         return f"Error reading CSS file: {e}"
 
+def save_css_text(new_content: str, old_content: str = None, old_sheet=None):
+    """
+    Writes 'style.css' under the write lock. Raises on failure.
+    The file is replaced atomically (readers see the old or the new version, never
+    half of one), the new version is recorded in the snapshot store and published to
+    the watched world files, so the next read doesn't go back to disk. Callers that
+    already hold the new rules can hand them over with `stylesheet_cache.update`.
+
+    Args:
+        old_content: The text being replaced, if the caller already read it.
+        old_sheet: The RuleSheet of `old_content`, if the caller has it; its rule
+            offsets let the diff start at the change instead of the top of the file.
+
+    Returns:
+        The rule-level CSSDiff of the write (tools/css_diff.py), which is also
+        handed to any active `record_css_changes` block.
+    """
+    # Imported here: css_diff builds on css_patch, which imports this module
+    from tools.css_diff import diff_css, note_css_diff
+
+    data = new_content.encode('utf-8')
+    css_path = current_site().css_path
+    with css_write_lock():
+        if old_content is None:
+            try:
+                version = world_files.current(css_path)
+                old_content = version.text()
+                parsed = version.built("stylesheet")
+                old_sheet = parsed.sheet if parsed is not None else None
+            except FileNotFoundError:
+                old_content = ""
+        atomic_write(css_path, data)
+        world_files.publish(css_path, data)
+        get_snapshot_store().record_write(css_path, data)
+    diff = diff_css(old_content, new_content, old_sheet)
+    note_css_diff(diff)
+    return diff
+
 def write_css_file(new_content: str) -> str:
     """
     Overwrites the 'style.css' file with new content.
     Takes the new content as a string.
-    Returns a success or error message.
+    Returns a success or error message, listing the declarations that changed.
     """
     try:
-        with open(CSS_FILE_PATH, 'w') as f:
-            f.write(new_content)
-        return "CSS file updated successfully."
+        with css_write_lock():
+            diff = save_css_text(new_content)
+            # Keep the parsed-stylesheet cache in step with what we just wrote
+            stylesheet_cache.update(current_site().css_path, new_content)
+        return "CSS file updated successfully. Changed:\n" + diff.describe()
     except Exception as e:
         return f"Error writing to CSS file: {e}"
 
+# Memories saved inside a `hold_procedural_memory()` block are kept back instead of
+# written: the Triage Agent writes a fix only once QA has passed it.
+
+class HeldMemories:
+    """
+    The {"bug", "fix"} memories saved while a `hold_procedural_memory()` block ran.
+    """
+    __slots__ = ("entries",)
+
+    def __init__(self):
+        self.entries = []
+
+    def last_fix(self):
+        """
+        The fix saved last, or None.
+        """
+        return self.entries[-1]["fix"] if self.entries else None
+
+    def fix_for(self, bug_description: str):
+        """
+        The fix saved last for this bug text (case/whitespace-insensitive), or None.
+        """
+        wanted = " ".join(bug_description.lower().split())
+        for entry in reversed(self.entries):
+            if " ".join(entry["bug"].lower().split()) == wanted:
+                return entry["fix"]
+        return None
+
+
+_held_memories = contextvars.ContextVar("held_memories", default=None)
+
+@contextlib.contextmanager
+def hold_procedural_memory():
+    """
+    Holds back every memory saved inside the block (in this context, and in threads
+    or tasks started from it) instead of writing it. Yields a HeldMemories.
+    """
+    held = HeldMemories()
+    token = _held_memories.set(held)
+    try:
+        yield held
+    finally:
+        _held_memories.reset(token)
+
 def update_procedural_memory(bug_description: str, fix_applied: str) -> str:
     """
-    Adds a new memory to the 'procedural_memory.json' file.
+    Appends a new memory to the procedural memory log.
     Takes a description of the bug and the fix that was applied.
     Returns a success or error message.
     """
+    held = _held_memories.get()
+    if held is not None:
+        held.entries.append({"bug": bug_description, "fix": fix_applied})
+        return "Procedural memory updated."
     try:
-        # Read existing memories
-        with open(MEMORY_FILE_PATH, 'r') as f:
-            memories = json.load(f)
-        
-        # Add the new memory
-        memories.append({
-            "bug": bug_description,
-            "fix": fix_applied
-        })
-        
-        # Write the updated list back to the file
-        with open(MEMORY_FILE_PATH, 'w') as f:
-            json.dump(memories, f, indent=2)
-            
+        # One appended line; the existing memories are never re-read or rewritten
+        get_memory_store().append(bug_description, fix_applied)
         return "Procedural memory updated."
     except Exception as e:
-        return f"Error updating memory: {e}"
\ No newline at end of file
+        return f"Error updating memory: {e}"
+
+def update_procedural_memory_many(entries: list) -> str:
+    """
+    Appends several {"bug", "fix"} memories to the procedural memory log with
+    one write (for a change set that fixed several bugs at once).
+    Returns a success or error message.
+    """
+    try:
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("bug") or not entry.get("fix"):
+                return 'Error updating memory: every entry needs a "bug" and a "fix".'
+        held = _held_memories.get()
+        if held is not None:
+            held.entries.extend({"bug": entry["bug"], "fix": entry["fix"]} for entry in entries)
+            return f"Procedural memory updated ({len(entries)} memories)."
+        written = get_memory_store().append_many(entries)
+        return f"Procedural memory updated ({written} memories)."
+    except Exception as e:
+        return f"Error updating memory: {e}"
@@ -0,0 +1,190 @@
+import re
+import threading
+
+from tools.colors import family_of, find_colors
+from tools.memory_store import get_memory_store
+from tools.site import PerSite
+
+# --- 1. Normalized Keys ---
+# A memory is keyed by WHAT was changed, not by how the user phrased it:
+#     (selector, property, target color family)
+# e.g. "Changed .contact-button background-color to #ff0000"
+#      -> ('.contact-button', 'background-color', 'red')
+
+_FIX_SELECTOR_RE = re.compile(r"(?<![\w-])([.#][A-Za-z_][\w-]*)")
+_FIX_PROPERTY_RE = re.compile(r"\b(background-color|border-color|color)\b")
+_FIX_VALUE_RE = re.compile(r"(#[0-9a-fA-F]{3,8}\b|\b[a-zA-Z]+\b)")
+_SHOULD_RE = re.compile(r"\bshould\b", re.IGNORECASE)
+_NEGATED_RE = re.compile(r"^\s*(?:not|never)\b", re.IGNORECASE)
+# "text color", or "the text / label / font ... is <color>"
+_TEXT_COLOR_RE = re.compile(r"\b(?:text|font)\s+colou?r\b|\b(?:text|font|label|lettering|writing|caption)s?"
+                            r"(?:\s+(?:on|of|in)\s+[\w\s'-]+?)?\s+(?:is|are|looks|appears|seems)\b")
+_TEXT_WORD_RE = re.compile(r"\b(?:text|font|label|lettering|writing|caption)s?\b")
+
+
+def parse_fix(fix_text: str):
+    """
+    Extracts (selector, property, value) from a fix description such as
+    "Changed .contact-button background-color to #ff0000".
+
+    Returns:
+        The tuple, or None if any part is missing.
+    """
+    selector = _FIX_SELECTOR_RE.search(fix_text)
+    prop = _FIX_PROPERTY_RE.search(fix_text)
+    if not selector or not prop:
+        return None
+    # The value is the first color-like token after the property name
+    # (or after "to", for "changed X from blue to red")
+    start = prop.end()
+    to_match = re.search(r"\bto\b", fix_text[start:])
+    if to_match:
+        start += to_match.end()
+    for match in _FIX_VALUE_RE.finditer(fix_text, start):
+        value = match.group(1)
+        if family_of(value):
+            return selector.group(1), prop.group(1), value
+    return None
+
+
+def report_property(bug_report: str):
+    """
+    Guesses which property a report is about. Reports talk about "the button is blue",
+    which is its background; text ("the text is white", "text color") and border
+    colors must be called out.
+
+    Returns:
+        The property, or None if the report mentions text in a way that could be
+        about either color (the caller then leaves the report to an LLM).
+    """
+    text = bug_report.lower()
+    if _TEXT_COLOR_RE.search(text):
+        return "color"
+    if re.search(r"\bborder\b", text):
+        return "border-color"
+    if _TEXT_WORD_RE.search(text):
+        return None
+    return "background-color"
+
+
+def report_target_color(bug_report: str):
+    """
+    Returns the color the report says the element *should* be, as written
+    (e.g., 'red', '#ff0000', 'rgb(255, 0, 0)'), or None.
+    """
+    match = _SHOULD_RE.search(bug_report)
+    if not match or _NEGATED_RE.match(bug_report[match.end():]):
+        return None
+    colors = find_colors(bug_report[match.end():])
+    return colors[0] if colors else None
+
+
+def report_claimed_color(bug_report: str):
+    """
+    Returns the color the report says the element *is* now, or None if it
+    names no color or several different ones.
+    """
+    match = _SHOULD_RE.search(bug_report)
+    before = bug_report[:match.start()] if match else bug_report
+    colors = {color.lower() for color in find_colors(before)}
+    return colors.pop() if len(colors) == 1 else None
+
+
+def report_target_family(bug_report: str):
+    """
+    Returns the color family the report says the element *should* be, or None.
+    """
+    target = report_target_color(bug_report)
+    return family_of(target) if target else None
+
+
+def _selector_words(selector: str) -> set:
+    return {w for w in re.split(r"[^a-z0-9]+", selector.lower()) if w}
+
+
+def _report_words(bug_report: str) -> set:
+    words = set(re.findall(r"[a-z0-9]+", bug_report.lower()))
+    # Tolerate simple plurals ("buttons" -> "button")
+    return words | {w[:-1] for w in words if w.endswith("s")}
+
+
+# --- 2. The Replay Index ---
+
+class ReplayHit:
+    """
+    A confident procedural-memory match for a bug report.
+    """
+
+    def __init__(self, selector: str, prop: str, value: str, memory: dict):
+        self.selector = selector
+        self.property = prop
+        self.value = value
+        self.memory = memory
+
+    def __repr__(self):
+        return f"ReplayHit({self.selector} {{ {self.property}: {self.value} }})"
+
+
+class ReplayIndex:
+    """
+    Maps (selector, property, target family) -> the latest memory that made that change.
+    Built from the procedural memory store and updated incrementally as it grows.
+    """
+
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._generation = None
+        self._by_key = {}
+
+    def _sync(self):
+        store = self._store or get_memory_store()
+        new_entries = store.since(self._seen)
+        if store.generation != self._generation:
+            # The store was cleared or compacted; rebuild from scratch
+            self._generation = store.generation
+            self._seen = 0
+            self._by_key = {}
+            new_entries = store.since(0)
+        for entry in new_entries:
+            parsed = parse_fix(entry["fix"])
+            if parsed:
+                selector, prop, value = parsed
+                self._by_key[(selector, prop, family_of(value))] = (value, entry)
+        self._seen += len(new_entries)
+
+    def lookup(self, bug_report: str):
+        """
+        Returns a ReplayHit if exactly one remembered fix matches the report's
+        (selector, property, target family) key, otherwise None.
+        """
+        target = report_target_family(bug_report)
+        if target is None:
+            return None
+        prop = report_property(bug_report)
+        words = _report_words(bug_report)
+
+        with self._lock:
+            self._sync()
+            candidates = [
+                (selector, value, entry)
+                for (selector, p, family), (value, entry) in self._by_key.items()
+                if p == prop and family == target and _selector_words(selector) <= words
+            ]
+
+        # Only replay when the report names exactly one known element
+        if len(candidates) != 1:
+            return None
+        selector, value, entry = candidates[0]
+        return ReplayHit(selector, prop, value, entry)
+
+
+# One index per site, used by the Triage Agent.
+_replay_indexes = PerSite(lambda site: ReplayIndex(get_memory_store(site)))
+
+def get_replay_index() -> ReplayIndex:
+    """
+    Returns the current site's replay index.
+    """
+    return _replay_indexes.get()
@@ -0,0 +1,209 @@
+import functools
+import re
+import threading
+import zlib
+
+from tools.colors import family_of
+from tools.memory_store import get_memory_store
+from tools.site import PerSite
+
+# --- 1. MinHash Signatures ---
+# A report is reduced to the set of words that name its element ("contact",
+# "button"; colors are left out, so the same element matches whatever the colors),
+# and the set to NUM_HASHES minimum hash values. Two signatures agree in
+# about the same share of positions as the two word sets overlap (their Jaccard
+# similarity), so comparing one query against every memory is a single NumPy
+# equality test over a (memories x NUM_HASHES) array, with no network embeddings.
+# Only the top 16 bits of each minimum are kept: half the memory to scan, and two
+# different minimums collide 1 time in 65536, which barely moves a score.
+
+NUM_HASHES = 64
+
+_WORD_RE = re.compile(r"[a-z0-9#]+")
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its it's of on or so
+that the their them then there these this to was were which will with should
+now instead please looks look seems
+""".split())
+
+@functools.lru_cache(maxsize=65536)
+def _is_color_word(word: str) -> bool:
+    return family_of(word) is not None
+
+def report_words(text: str) -> set:
+    """
+    The content words of a bug report other than colors, lowercased, with
+    simple plurals folded.
+    """
+    words = set()
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOPWORDS or _is_color_word(word):
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+class MinHasher:
+    """
+    NUM_HASHES multiply-shift hash functions over 32-bit word hashes, keeping
+    16 bits of each minimum.
+    The seeds are fixed, so signatures are stable across processes.
+    """
+
+    def __init__(self, num_hashes: int = NUM_HASHES, seed: int = 1):
+        import numpy as np
+
+        self._np = np
+        rng = np.random.default_rng(seed)
+        # Odd 64-bit multipliers; uint64 products wrap, which is what multiply-shift wants
+        self._a = rng.integers(1, 2 ** 63, size=num_hashes, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_hashes, dtype=np.uint64)
+        self.num_hashes = num_hashes
+
+    def signature(self, words: set):
+        return self.signatures([words])[0]
+
+    def signatures(self, word_sets: list):
+        """
+        Returns a (len(word_sets) x num_hashes) uint16 array, one row per set,
+        hashing every word of every set in one pass.
+        """
+        np = self._np
+        # Scores near zero against everything
+        rows = np.full((len(word_sets), self.num_hashes), 0xffff, dtype=np.uint16)
+        filled = [i for i, words in enumerate(word_sets) if words]
+        if not filled:
+            return rows
+        hashes = np.fromiter((zlib.crc32(word.encode('utf-8'))
+                              for i in filled for word in word_sets[i]), dtype=np.uint64)
+        starts = np.cumsum([0] + [len(word_sets[i]) for i in filled[:-1]])
+        # Multiply-shift: the high bits of the product are the well-mixed ones
+        mixed = (hashes[:, None] * self._a + self._b) >> np.uint64(48)
+        rows[filled] = np.minimum.reduceat(mixed, starts, axis=0).astype(np.uint16)
+        return rows
+
+
+# --- 2. The Similarity Index ---
+
+class SimilarFix:
+    """
+    A remembered fix for a report that resembles the one being fixed.
+    """
+    __slots__ = ("bug", "fix", "score")
+
+    def __init__(self, bug: str, fix: str, score: float):
+        self.bug = bug
+        self.fix = fix
+        self.score = score
+
+    def __repr__(self):
+        return f"SimilarFix({self.score:.2f}: {self.fix!r})"
+
+
+class MemorySearchIndex:
+    """
+    MinHash signatures of every remembered bug report, in one growable NumPy array.
+    Like the replay index, it catches up with the memory store on each lookup, so a
+    new memory costs one signature, not a rebuild.
+    """
+
+    def __init__(self, store=None, num_hashes: int = NUM_HASHES):
+        self._store = store
+        self._lock = threading.Lock()
+        self._hasher = None
+        self._num_hashes = num_hashes
+        self._signatures = None
+        self._entries = []
+        self._seen = 0
+        self._generation = None
+
+    def _add(self, entries: list):
+        np = self._hasher._np
+        needed = len(self._entries) + len(entries)
+        if self._signatures is None or needed > len(self._signatures):
+            # Grow by doubling, so appending n memories costs O(n) copies overall
+            grown = np.empty((max(needed, 2 * len(self._entries), 64), self._num_hashes), dtype=np.uint16)
+            if self._entries:
+                grown[:len(self._entries)] = self._signatures[:len(self._entries)]
+            self._signatures = grown
+        # In chunks, so the (words x hashes) scratch array stays a few MB
+        for start in range(0, len(entries), 4096):
+            chunk = entries[start:start + 4096]
+            rows = self._hasher.signatures([report_words(entry["bug"]) for entry in chunk])
+            self._signatures[len(self._entries):len(self._entries) + len(chunk)] = rows
+            self._entries.extend(chunk)
+
+    def _sync(self):
+        if self._hasher is None:
+            self._hasher = MinHasher(self._num_hashes)
+        store = self._store or get_memory_store()
+        new_entries = store.since(self._seen)
+        if store.generation != self._generation:
+            # The store was cleared or compacted; rebuild from scratch
+            self._generation = store.generation
+            self._seen = 0
+            self._entries = []
+            new_entries = store.since(0)
+        self._add(new_entries)
+        self._seen += len(new_entries)
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._entries)
+
+    def search(self, bug_report: str, k: int = 3, min_score: float = 0.5) -> list:
+        """
+        Returns up to `k` remembered fixes for the reports most similar to this one,
+        best first, one per distinct fix.
+
+        Args:
+            min_score: The lowest estimated word overlap (0..1) worth returning.
+        """
+        with self._lock:
+            self._sync()
+            count = len(self._entries)
+            words = report_words(bug_report)
+            if not count or not words or k <= 0:
+                return []
+            np = self._hasher._np
+            query = self._hasher.signature(words)
+            scores = (self._signatures[:count] == query).sum(axis=1, dtype=np.uint8)
+            # Over-fetch, since several memories may record the same fix
+            top = min(count, k * 4)
+            candidates = np.argpartition(scores, count - top)[count - top:]
+            # Best score first; among equals, the newest memory
+            order = candidates[np.lexsort((-candidates, -scores[candidates].astype(np.int16)))]
+            entries = [self._entries[i] for i in order]
+            matched = [int(scores[i]) for i in order]
+
+        results, seen_fixes = [], set()
+        for entry, score in zip(entries, matched):
+            score = score / self._num_hashes
+            if score < min_score:
+                break
+            if entry["fix"] in seen_fixes:
+                continue
+            seen_fixes.add(entry["fix"])
+            results.append(SimilarFix(entry["bug"], entry["fix"], score))
+            if len(results) == k:
+                break
+        return results
+
+
+# One index per site, used by the Dev Agent.
+_search_indexes = PerSite(lambda site: MemorySearchIndex(get_memory_store(site)))
+
+def get_memory_search_index() -> MemorySearchIndex:
+    """
+    Returns the current site's similarity index.
+    """
+    return _search_indexes.get()
+
+def similar_fixes(bug_report: str, k: int = 3) -> list:
+    """
+    Returns up to `k` SimilarFix results for `bug_report` from the current site's memory.
+    """
+    return get_memory_search_index().search(bug_report, k)
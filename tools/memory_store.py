@@ -0,0 +1,401 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from tools.site import PerSite
+
+# Tools don't print: agents/tracing.py's console is above this layer
+logger = logging.getLogger(__name__)
+
+# --- 1. Where Procedural Memory Lives ---
+# Memories are stored as an append-only JSON Lines log: one {"bug", "fix"} object per line.
+# The old format (a single JSON array rewritten on every save) is migrated on first use.
+MEMORY_LOG_PATH = os.path.join("memory", "procedural_memory.jsonl")
+LEGACY_MEMORY_PATH = os.path.join("memory", "procedural_memory.json")
+
+
+# --- 2. Cross-Process File Lock ---
+
+class FileLock:
+    """
+    An exclusive lock on `<path>.lock` that works across processes
+    (fcntl on POSIX, msvcrt on Windows). Use it as a context manager.
+    """
+
+    def __init__(self, path: str):
+        self.lock_path = path + ".lock"
+        self._handle = None
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            self._handle = open(self.lock_path, 'a+')
+            if os.name == 'nt':
+                import msvcrt
+                self._handle.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._handle.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.01)
+            else:
+                import fcntl
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if os.name == 'nt':
+                import msvcrt
+                self._handle.seek(0)
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._thread_lock.release()
+
+
+_shared_locks = {}
+_shared_locks_guard = threading.Lock()
+
+def shared_file_lock(path: str) -> FileLock:
+    """
+    Returns this process's one FileLock for `path`. Two FileLocks on the same path
+    in one process would block each other, so code that must serialize with another
+    module's writes takes the lock from here.
+    """
+    # Keyed like FileLock resolves it: a relative path follows the working directory
+    key = os.path.normpath(path)
+    with _shared_locks_guard:
+        lock = _shared_locks.get(key)
+        if lock is None:
+            lock = _shared_locks[key] = FileLock(path)
+        return lock
+
+
+# --- 3. The Append-Only Store ---
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class ProceduralMemoryStore:
+    """
+    Append-only procedural memory.
+
+    - Saving a memory appends one line under a cross-process lock: O(1), never a rewrite.
+    - fsync is batched: every `fsync_batch` appends, or `fsync_interval` seconds after
+      the first unsynced append, whichever comes first (and always at exit).
+    - All memories are loaded into memory once; later reads only parse lines that
+      other processes appended since (tail read from the last known offset).
+    - Compaction (dropping duplicate and torn lines) runs on a background thread once
+      the log has at least `compact_min_lines` lines and enough of them are redundant.
+    """
+
+    def __init__(self, path: str = MEMORY_LOG_PATH, legacy_path: str = LEGACY_MEMORY_PATH,
+                 fsync_batch: int = 16, fsync_interval: float = 1.0,
+                 compact_min_lines: int = 1000, compact_ratio: float = 0.3):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.compact_min_lines = compact_min_lines
+        self.compact_ratio = compact_ratio
+
+        self._lock = FileLock(path)
+        self._state_lock = threading.RLock()
+        self._entries = []
+        self._by_bug = {}
+        self._seen = set()
+        self._lines = 0
+        self._offset = 0
+        self._inode = None
+        self._handle = None
+        self._unsynced = 0
+        self._flush_timer = None
+        self._compacting = False
+        # Bumped whenever the in-memory index is rebuilt (compaction / clear),
+        # so incremental readers of `since()` know to start over
+        self.generation = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            self._migrate_legacy()
+            if not os.path.exists(path):
+                open(path, 'a').close()
+            self._load()
+
+        atexit.register(self.close)
+
+    # --- Migration ---
+
+    def _migrate_legacy(self):
+        """
+        Moves entries from the old JSON array file into the log (once), then empties it.
+        """
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r') as f:
+                legacy = json.load(f)
+        except (ValueError, OSError):
+            return
+        if not isinstance(legacy, list) or not legacy:
+            return
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for item in legacy:
+                f.write(json.dumps({"bug": item.get("bug", ""), "fix": item.get("fix", "")}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Leave an empty array behind so the migration never runs twice
+        with open(self.legacy_path, 'w') as f:
+            json.dump([], f)
+        logger.info("Migrated %d memories from %s to %s.", len(legacy), self.legacy_path, self.path)
+
+    # --- Loading / Index ---
+
+    def _reset_index(self):
+        self.generation += 1
+        self._entries = []
+        self._by_bug = {}
+        self._seen = set()
+        self._lines = 0
+        self._offset = 0
+
+    def _index(self, entry: dict):
+        self._entries.append(entry)
+        self._by_bug.setdefault(_normalize(entry["bug"]), []).append(entry)
+        self._seen.add((entry["bug"], entry["fix"]))
+
+    def _load(self):
+        """
+        Reads any lines appended since the last load. Does a full reload
+        if the log was replaced (compacted or cleared) by another process.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset_index()
+            self._inode = None
+            return
+
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset_index()
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read()
+
+        # Only consume complete lines; a half-written tail is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            self._lines += 1
+            try:
+                entry = json.loads(line)
+                self._index({"bug": entry["bug"], "fix": entry["fix"]})
+            except (ValueError, KeyError, TypeError):
+                continue  # torn or corrupt line; compaction will drop it
+        self._offset += end
+
+    def refresh(self):
+        with self._state_lock:
+            self._load()
+
+    # --- Writing ---
+
+    def _writer(self):
+        """
+        Returns an append handle for the current log file, reopening it
+        if the file was swapped out from under us by compaction.
+        """
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self._handle is None or inode is None or os.fstat(self._handle.fileno()).st_ino != inode:
+            if self._handle is not None:
+                self._handle.close()
+            self._handle = open(self.path, 'ab')
+        return self._handle
+
+    def append_many(self, entries: list) -> int:
+        """
+        Appends several {"bug", "fix"} memories with a single write.
+        Returns the number of memories written.
+        """
+        if not entries:
+            return 0
+        payload = b"".join(
+            (json.dumps({"bug": e["bug"], "fix": e["fix"]}) + "\n").encode('utf-8') for e in entries
+        )
+        with self._state_lock, self._lock:
+            # Catch up with other processes first, so our offset stays contiguous
+            self._load()
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self._offset:
+                # A crashed writer left a torn line; terminate it so ours stays intact
+                payload = b"\n" + payload
+            handle = self._writer()
+            handle.write(payload)
+            handle.flush()
+            # Index what we just wrote (and anything that raced in before the lock)
+            self._load()
+
+            self._unsynced += len(entries)
+            if self._unsynced >= self.fsync_batch:
+                self._fsync()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.fsync_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+        self._maybe_compact()
+        return len(entries)
+
+    def append(self, bug: str, fix: str) -> dict:
+        """
+        Appends one memory. O(1) in the size of the store.
+        """
+        entry = {"bug": bug, "fix": fix}
+        self.append_many([entry])
+        return entry
+
+    def _fsync(self):
+        if self._handle is not None and self._unsynced:
+            os.fsync(self._handle.fileno())
+        self._unsynced = 0
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def flush(self):
+        """
+        Forces any batched appends to disk.
+        """
+        with self._state_lock:
+            self._fsync()
+
+    # --- Reading ---
+
+    def all(self) -> list:
+        """
+        Returns every memory, oldest first.
+        """
+        with self._state_lock:
+            self._load()
+            return list(self._entries)
+
+    def since(self, start: int) -> list:
+        """
+        Returns the memories after the first `start` ones (for incremental indexes).
+        """
+        with self._state_lock:
+            self._load()
+            return self._entries[start:]
+
+    def find(self, bug_description: str) -> list:
+        """
+        Returns the memories recorded for this exact bug text (case/whitespace-insensitive).
+        """
+        with self._state_lock:
+            self._load()
+            return list(self._by_bug.get(_normalize(bug_description), []))
+
+    def __len__(self):
+        with self._state_lock:
+            self._load()
+            return len(self._entries)
+
+    # --- Compaction ---
+
+    def _maybe_compact(self):
+        with self._state_lock:
+            if self._compacting or self._lines < self.compact_min_lines:
+                return
+            redundant = self._lines - len(self._seen)
+            if redundant < self._lines * self.compact_ratio:
+                return
+            self._compacting = True
+        thread = threading.Thread(target=self.compact, daemon=True)
+        thread.start()
+
+    def compact(self):
+        """
+        Rewrites the log without duplicate or corrupt lines (temp file + atomic rename).
+        """
+        try:
+            with self._state_lock, self._lock:
+                self._load()
+                self._fsync()
+                unique, seen = [], set()
+                for entry in self._entries:
+                    key = (entry["bug"], entry["fix"])
+                    if key not in seen:
+                        seen.add(key)
+                        unique.append(entry)
+
+                tmp_path = self.path + ".compact"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in unique:
+                        f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+
+                if self._handle is not None:
+                    self._handle.close()
+                    self._handle = None
+                self._inode = None
+                self._load()
+        finally:
+            self._compacting = False
+
+    def clear(self):
+        """
+        Deletes every memory (used by reset.py).
+        """
+        with self._state_lock, self._lock:
+            tmp_path = self.path + ".compact"
+            open(tmp_path, 'w').close()
+            os.replace(tmp_path, self.path)
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            self._unsynced = 0
+            self._inode = None
+            self._load()
+
+    def close(self):
+        with self._state_lock:
+            self._fsync()
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+# --- 4. The Shared Store ---
+# One store per site (see tools/site.py), each loaded on first use.
+_stores = PerSite(lambda site: ProceduralMemoryStore(site.memory_log_path, site.legacy_memory_path))
+
+def get_memory_store(site=None) -> ProceduralMemoryStore:
+    """
+    Returns the memory store of `site` (default: the current site), loading the index on first use.
+    """
+    return _stores.get(site)
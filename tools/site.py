@@ -0,0 +1,130 @@
+import contextlib
+import contextvars
+import os
+import threading
+
+# --- 1. What A Site Is ---
+# A site is a directory holding the two folders the agents work on:
+#   <root>/world/   index.html, style.css (and whatever else the page uses)
+#   <root>/memory/  the procedural memory and pipeline timings for that site
+# The original single site lives at the repository root ("default"); more sites
+# live under sites/<name>/. Every tool looks up its paths on `current_site()`,
+# so one process (or one worker per site) can heal many sites.
+
+SITES_DIR = "sites"
+DEFAULT_SITE_NAME = "default"
+
+
+class Site:
+    """
+    The paths of one site. Relative roots follow the working directory, like
+    every other path in this project.
+    """
+    __slots__ = ("name", "root")
+
+    def __init__(self, name: str, root: str):
+        self.name = name
+        self.root = root
+
+    @property
+    def world_dir(self) -> str:
+        return os.path.join(self.root, "world")
+
+    @property
+    def memory_dir(self) -> str:
+        return os.path.join(self.root, "memory")
+
+    @property
+    def html_path(self) -> str:
+        return os.path.join(self.world_dir, "index.html")
+
+    @property
+    def css_path(self) -> str:
+        return os.path.join(self.world_dir, "style.css")
+
+    @property
+    def memory_log_path(self) -> str:
+        return os.path.join(self.memory_dir, "procedural_memory.jsonl")
+
+    @property
+    def legacy_memory_path(self) -> str:
+        return os.path.join(self.memory_dir, "procedural_memory.json")
+
+    @property
+    def key(self) -> str:
+        """
+        Identifies the site's files regardless of how its root was spelled.
+        """
+        return os.path.abspath(self.root)
+
+    def __repr__(self):
+        return f"Site({self.name!r}, {self.root!r})"
+
+
+DEFAULT_SITE = Site(DEFAULT_SITE_NAME, os.curdir)
+
+def resolve_site(spec=None) -> Site:
+    """
+    Turns a site name or directory into a Site.
+
+    Args:
+        spec: None or 'default' for the repository's own world/ and memory/;
+            a path to a directory containing world/; or a name under sites/.
+    """
+    if isinstance(spec, Site):
+        return spec
+    if spec is None or spec == DEFAULT_SITE_NAME:
+        return DEFAULT_SITE
+    if os.path.isdir(os.path.join(spec, "world")):
+        return Site(os.path.basename(os.path.normpath(spec)) or spec, spec)
+    return Site(spec, os.path.join(SITES_DIR, spec))
+
+
+# --- 2. The Current Site ---
+# A ContextVar, so it follows each pipeline through threads (`asyncio.to_thread`
+# copies it) and concurrent asyncio tasks without being passed to every tool.
+
+_current_site = contextvars.ContextVar("current_site", default=DEFAULT_SITE)
+
+def current_site() -> Site:
+    return _current_site.get()
+
+@contextlib.contextmanager
+def use_site(site):
+    """
+    Runs the block against `site` (a Site, a name, or a directory).
+    """
+    token = _current_site.set(resolve_site(site))
+    try:
+        yield _current_site.get()
+    finally:
+        _current_site.reset(token)
+
+
+# --- 3. Per-Site Singletons ---
+
+class PerSite:
+    """
+    Lazily builds one object per site with `factory(site)`: the memory store,
+    snapshot store and replay index are shared within a site, never across sites.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, site: Site = None):
+        site = site or current_site()
+        key = site.key
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = self._instances[key] = self._factory(site)
+        return instance
+
+    def instances(self) -> list:
+        with self._lock:
+            return list(self._instances.values())
@@ -0,0 +1,276 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import stat
+import tempfile
+import threading
+import time
+
+from tools.memory_store import shared_file_lock
+from tools.site import PerSite
+from tools.world_watch import world_files
+
+# --- 1. Atomic Writes ---
+
+def atomic_write(path: str, data: bytes, fsync: bool = True):
+    """
+    Replaces `path` with `data` in one step: the bytes go to a temp file in the same
+    directory, which is fsynced and then renamed over the target. A reader (or a crash)
+    sees either the old file or the new one, never a truncated mix.
+
+    Args:
+        fsync: Set to False for files that are verified on read anyway; a crash may
+            then lose the new content, but never half-replace the old.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = None
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the permissions the old file had
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+# --- 2. The Snapshot Store ---
+# A tiny content-addressed store, like git's object database:
+#   objects/ab/cdef...  every file version ever written, named by its sha256
+#   objects/..          snapshot manifests ({"files": {name: digest}}), also by sha256
+#   refs/<name>         a named snapshot: just the digest of a manifest
+#   history.jsonl       an append-only journal of every recorded write
+# Writing, naming and restoring touch a fixed number of files, so they cost the
+# same whether the store holds ten versions or ten million.
+
+WORLD_DIR = "world"
+SNAPSHOT_DIR = os.path.join(WORLD_DIR, ".snapshots")
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_REF_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]*$")
+
+
+class SnapshotError(Exception):
+    """
+    Raised for unknown snapshots and refused restores.
+    """
+
+
+class SnapshotConflict(SnapshotError):
+    """
+    Raised when a restore expected the world to be in one state but it is in another
+    (e.g., another fix landed after the one being rolled back).
+    """
+
+
+class SnapshotStore:
+    """
+    Content-addressed snapshots of the files in the world directory.
+    """
+
+    def __init__(self, world_dir: str = WORLD_DIR, root: str = None):
+        self.world_dir = world_dir
+        self.root = root or os.path.join(world_dir, ".snapshots")
+        # Digests of the objects known to be stored, so a file version is stored once
+        self._stored = set()
+        self._lock = threading.Lock()
+
+    # --- Objects ---
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def put(self, data: bytes) -> str:
+        """
+        Stores `data` (once; identical content is deduplicated) and returns its digest.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Not fsynced: `get` re-checks the hash, so a lost write is caught, not served
+            atomic_write(path, data, fsync=False)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                data = f.read()
+        except OSError:
+            raise SnapshotError(f"Snapshot object {digest[:12]} is missing.") from None
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f"Snapshot object {digest[:12]} is corrupt.")
+        return data
+
+    # --- Tracking World Files ---
+    # The current content of each file comes from the watched world files
+    # (tools/world_watch.py), so unchanged files are never re-read or re-hashed.
+
+    def _stored_digest(self, version) -> str:
+        with self._lock:
+            if version.digest in self._stored:
+                return version.digest
+        digest = self.put(version.data)
+        with self._lock:
+            self._stored.add(digest)
+        return digest
+
+    def _file_digest(self, name: str) -> str:
+        return self._stored_digest(world_files.current(os.path.join(self.world_dir, name)))
+
+    def record_write(self, path: str, data: bytes) -> str:
+        """
+        Records a version of a world file we just wrote. Call it right after the
+        write, under the same lock. Returns the version's digest.
+        """
+        digest = self.put(data)
+        with self._lock:
+            self._stored.add(digest)
+        entry = {"time": time.time(), "file": os.path.basename(path), "digest": digest}
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "history.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        return digest
+
+    # --- Snapshots And Refs ---
+
+    def snapshot(self, name: str = None) -> str:
+        """
+        Captures the current world files. Unchanged files are not re-read.
+
+        Args:
+            name: Also save the snapshot under this name (e.g., 'default').
+
+        Returns:
+            The snapshot's digest.
+        """
+        files = {os.path.basename(path): self._stored_digest(version)
+                 for path, version in world_files.snapshot_dir(self.world_dir).versions.items()}
+        digest = self.put(json.dumps({"files": files}, sort_keys=True).encode('utf-8'))
+        if name is not None:
+            self.set_ref(name, digest)
+        return digest
+
+    def set_ref(self, name: str, digest: str):
+        if not _REF_RE.match(name):
+            raise SnapshotError(f"Invalid snapshot name '{name}'.")
+        os.makedirs(os.path.join(self.root, "refs"), exist_ok=True)
+        atomic_write(os.path.join(self.root, "refs", name), digest.encode('ascii'))
+
+    def resolve(self, ref: str) -> str:
+        """
+        Returns the snapshot digest a name (or a full digest) refers to.
+        """
+        if _REF_RE.match(ref):
+            try:
+                with open(os.path.join(self.root, "refs", ref), 'r', encoding='ascii') as f:
+                    return f.read().strip()
+            except OSError:
+                pass
+        if _DIGEST_RE.match(ref) and os.path.exists(self._object_path(ref)):
+            return ref
+        raise SnapshotError(f"No snapshot named '{ref}'.")
+
+    def refs(self) -> dict:
+        """
+        Returns {name: snapshot digest} for every named snapshot.
+        """
+        refs_dir = os.path.join(self.root, "refs")
+        try:
+            names = sorted(os.listdir(refs_dir))
+        except OSError:
+            return {}
+        return {name: self.resolve(name) for name in names if _REF_RE.match(name)}
+
+    def manifest(self, ref: str) -> dict:
+        """
+        Returns {file name: version digest} for a snapshot.
+        """
+        try:
+            return json.loads(self.get(self.resolve(ref)))["files"]
+        except (ValueError, KeyError):
+            raise SnapshotError(f"'{ref}' is not a snapshot.") from None
+
+    def restore(self, ref: str, expected: str = None) -> list:
+        """
+        Puts every file of a snapshot back in the world directory. Files that already
+        match are left alone; the others are swapped in atomically.
+
+        Args:
+            ref: A snapshot name or digest.
+            expected: If given, only restore while the world is still exactly in this
+                snapshot's state (compare-and-swap); otherwise raise SnapshotConflict.
+
+        Returns:
+            The names of the files that were replaced.
+        """
+        target = self.manifest(ref)
+        locks = [shared_file_lock(os.path.join(self.world_dir, name)) for name in sorted(target)]
+        with contextlib.ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            if expected is not None and self.snapshot() != expected:
+                raise SnapshotConflict("The world changed since that snapshot was taken; not restoring.")
+
+            restored = []
+            for name, digest in target.items():
+                path = os.path.join(self.world_dir, name)
+                try:
+                    if self._file_digest(name) == digest:
+                        continue
+                except OSError:
+                    pass
+                data = self.get(digest)
+                atomic_write(path, data)
+                world_files.publish(path, data)
+                self.record_write(path, data)
+                restored.append(name)
+        return restored
+
+    def history(self, limit: int = 20) -> list:
+        """
+        Returns the last `limit` recorded writes, oldest first. Only the tail of the
+        journal is read.
+        """
+        path = os.path.join(self.root, "history.jsonl")
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - 256 * (limit + 1)))
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        entries = []
+        for line in lines[-limit:]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # the first line may be cut in half by the seek
+        return entries
+
+
+# One store per site, under that site's world/.snapshots
+_snapshot_stores = PerSite(lambda site: SnapshotStore(site.world_dir))
+
+def get_snapshot_store(site=None) -> SnapshotStore:
+    """
+    Returns the snapshot store of `site` (default: the current site).
+    """
+    return _snapshot_stores.get(site)
@@ -1,7 +1,12 @@
-import cssutils
 import os
-from bs4 import BeautifulSoup
 
+from tools.computed_style import computed_style_cache
+from tools.css_cache import stylesheet_cache
+from tools.element_index import element_index_cache
+from tools.site import current_site
+from tools.world_watch import world_files
+
+# The default site's file paths; the tools use the current site's (tools/site.py)
 HTML_FILE_PATH = os.path.join("world", "index.html")
 CSS_FILE_PATH = os.path.join("world", "style.css")
 
@@ -11,40 +16,117 @@ def get_html_content() -> str:
     The agent can use this to find CSS selectors.
     """
     try:
-        with open(HTML_FILE_PATH, 'r', encoding='utf-8') as f:
-            return f.read()
+        return world_files.current(current_site().html_path).text()
+    except Exception as e:
+        return f"Error reading HTML file: {e}"
+
+def get_page_digest(max_chars: int) -> str:
+    """
+    Returns a compact digest of 'index.html' instead of its raw text: one line
+    per visible or interactive element (tag, id, classes, text), within `max_chars`.
+    """
+    try:
+        return element_index_cache.get(current_site().html_path).digest(max_chars)
     except Exception as e:
         return f"Error reading HTML file: {e}"
     
+def find_element_selectors(element_description: str, limit: int = 5) -> str:
+    """
+    Maps a plain-English element description (e.g., 'Contact us button')
+    to ranked CSS selectors, without reading the whole HTML.
+    
+    Args:
+        element_description: How the user refers to the element.
+        limit: The maximum number of candidates to return.
+    
+    Returns:
+        A ranked list of selectors with the element each one targets, or an error message.
+    """
+    try:
+        site = current_site()
+        index = element_index_cache.get(site.html_path)
+        try:
+            known_selectors = set(stylesheet_cache.get(site.css_path).selector_index)
+        except OSError:
+            known_selectors = set()
+        
+        ranked = index.resolve(element_description, known_selectors, limit)
+        if not ranked:
+            return f"No element matching '{element_description}' was found in index.html."
+        
+        lines = [f"Candidate selectors for '{element_description}' (best first):"]
+        for position, (selector, score, element) in enumerate(ranked, start=1):
+            lines.append(f"{position}. {selector} (score {score:.2f}) -> {element.describe()}")
+        return "\n".join(lines)
+    
+    except Exception as e:
+        return f"Error resolving element: {e}"
+
 def get_element_color(selector_text: str) -> str:
     """
-    Finds a specific CSS rule by its selector (e.g., '.contact-button')
-    and returns its 'background-color' property.
+    Finds the elements a CSS selector matches (e.g., '.contact-button') and returns
+    the 'background-color' the cascade actually gives the first one, across every
+    stylesheet, <style> block and inline style the page uses.
     
     Args:
         selector_text: The CSS selector to find (e.g., '.contact-button').
     
     Returns:
-        The color value (e.g., '#007bff') or an error message.
+        The color value (e.g., '#007bff') and the rule that set it, or an error message.
     """
     try:
-        # Use cssutils to parse the CSS file
-        parser = cssutils.CSSParser()
-        stylesheet = parser.parseFile(CSS_FILE_PATH)
+        # Resolved styles are cached per element until a stylesheet or the HTML changes
+        site = current_site()
+        resolved = computed_style_cache.get(site.html_path).resolve(selector_text, 'background-color')
+        if resolved is not None:
+            declaration, count = resolved
+            if declaration is None:
+                return f"Selector '{selector_text}' found, but 'background-color' property is not set."
+            result = f"Found color: {declaration.value}\nSet by: {declaration.origin}"
+            if count > 1:
+                result += f" (first of {count} matching elements)"
+            return result
         
-        # Loop through the rules in the stylesheet
-        for rule in stylesheet:
-            if rule.type == rule.STYLE_RULE:
-                # Check if this rule is the one we're looking for
-                if rule.selectorText == selector_text:
-                    # Find the background-color property
-                    color = rule.style.getPropertyValue('background-color')
-                    if color:
-                        return f"Found color: {color}"
-                    else:
-                        return f"Selector '{selector_text}' found, but 'background-color' property is not set."
+        # No element matches: fall back to a rule with exactly this selector
+        parsed = stylesheet_cache.get(site.css_path)
+        rules = parsed.find_rules(selector_text)
+        if rules:
+            # Find the background-color property
+            color = rules[0].get('background-color')
+            if color:
+                return f"Found color: {color}"
+            else:
+                return f"Selector '{selector_text}' found, but 'background-color' property is not set."
                         
         return f"Error: CSS selector '{selector_text}' not found in style.css."
         
     except Exception as e:
-        return f"Error inspecting CSS: {e}"
\ No newline at end of file
+        return f"Error inspecting CSS: {e}"
+
+def get_computed_value(selector_text: str, property_name: str):
+    """
+    Returns the value the cascade gives `property_name` on the first element
+    `selector_text` matches, or None if no element matches or nothing sets it.
+    """
+    resolved = computed_style_cache.get(current_site().html_path).resolve(selector_text, property_name)
+    if resolved is None or resolved[0] is None:
+        return None
+    return resolved[0].value
+
+def get_stylesheet_cache_stats() -> dict:
+    """
+    Returns the hit/miss counters of the shared parsed-stylesheet cache.
+    """
+    return stylesheet_cache.stats()
+
+def get_computed_style_stats() -> dict:
+    """
+    Returns the hit/miss counters of the per-element computed-style cache.
+    """
+    return computed_style_cache.stats()
+
+def get_world_files_stats() -> dict:
+    """
+    Returns the file watcher's mode and how many lookups it answered without a read.
+    """
+    return world_files.stats()
\ No newline at end of file
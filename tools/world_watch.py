@@ -0,0 +1,459 @@
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import struct
+import sys
+import threading
+import types
+
+# --- 1. Knowing When A File Changed ---
+# On Linux the directories of the files we have read are watched with inotify, so
+# "has index.html changed?" is answered from the kernel's event queue without
+# touching the file. The kernel queues an event while the write happens, so a
+# change, ours or a hand edit, is seen by the very next lookup. Anywhere else
+# (or if inotify can't be set up) every lookup reads the file and compares its
+# hash: a stat() can't tell a same-size rewrite within the mtime granularity, or
+# one whose mtime was put back, from no change at all.
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+# Events that add or remove a name in the directory
+_LISTING_EVENTS = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """
+    A non-blocking inotify instance, through libc.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, directory: str) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"can't watch {directory}")
+        return wd
+
+    def events(self) -> list:
+        """
+        Every queued (wd, mask, name) event; an empty list when there is none.
+        """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """
+    Tells whether a file may have changed since we last looked at it.
+
+    Attributes:
+        mode: "inotify", or "polling" when every lookup has to read the file.
+    """
+
+    def __init__(self, mode: str = None):
+        self._lock = threading.Lock()
+        self._requested = mode
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._inotify = None
+        self._directories = {}      # directory -> wd
+        self._watched = {}          # wd -> directory
+        self._clean = set()         # files unchanged since `begin_check`
+        self._clean_listings = set()
+        self.mode = "polling"
+        if self._requested != "polling" and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+                self.mode = "inotify"
+            except (OSError, AttributeError):
+                pass
+
+    def _ensure(self):
+        # A forked worker must not read (and steal) its parent's events
+        if os.getpid() != self._pid:
+            self._start()
+
+    def _drain(self):
+        for wd, mask, name in self._inotify.events():
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: nothing can be trusted until it is checked again
+                self._clean.clear()
+                self._clean_listings.clear()
+                continue
+            directory = self._watched.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self._forget_directory(wd, directory)
+                continue
+            if name:
+                self._clean.discard(os.path.join(directory, name))
+                if mask & _LISTING_EVENTS and not name.startswith("."):
+                    self._clean_listings.discard(directory)
+            else:
+                self._clean_listings.discard(directory)
+
+    def _forget_directory(self, wd: int, directory: str):
+        self._watched.pop(wd, None)
+        self._directories.pop(directory, None)
+        self._clean = {path for path in self._clean if os.path.dirname(path) != directory}
+        self._clean_listings.discard(directory)
+
+    def _watch(self, directory: str) -> bool:
+        if directory not in self._directories:
+            try:
+                wd = self._inotify.add(directory)
+            except OSError:
+                return False
+            self._directories[directory] = wd
+            self._watched[wd] = directory
+        return True
+
+    def needs_check(self, path: str) -> bool:
+        """
+        Whether `path` (absolute) may have changed since `begin_check(path)`.
+        """
+        with self._lock:
+            self._ensure()
+            if self._inotify is None:
+                return True
+            self._drain()
+            return path not in self._clean
+
+    def begin_check(self, path: str):
+        """
+        Call just before reading `path` (absolute): any change from now on makes
+        `needs_check` true again.
+        """
+        with self._lock:
+            self._ensure()
+            if self._inotify is None or not self._watch(os.path.dirname(path)):
+                return
+            self._drain()
+            self._clean.add(path)
+
+    def listing_changed(self, directory: str) -> bool:
+        """
+        Whether files may have been added to or removed from `directory` (absolute)
+        since `begin_listing(directory)`.
+        """
+        with self._lock:
+            self._ensure()
+            if self._inotify is None:
+                return True
+            self._drain()
+            return directory not in self._clean_listings
+
+    def begin_listing(self, directory: str):
+        with self._lock:
+            self._ensure()
+            if self._inotify is None or not self._watch(directory):
+                return
+            self._drain()
+            self._clean_listings.add(directory)
+
+    def reset(self, path: str = None):
+        """
+        Forgets that `path` (or every file) is unchanged, so it is checked again.
+        """
+        with self._lock:
+            if path is None:
+                self._clean.clear()
+                self._clean_listings.clear()
+            else:
+                self._clean.discard(path)
+
+
+# --- 2. Versions And Snapshots ---
+# Each content of a file we see becomes a FileVersion: its bytes, plus the views
+# the tools build from them (the decoded text, the DOM, the parsed rules...).
+# A version never changes once published, and each view is built at most once
+# per version, by whoever asks first. A change publishes a new version instead,
+# so a pipeline holding the old one keeps reading it undisturbed.
+
+_MISSING = object()
+
+
+class FileVersion:
+    """
+    One content of one file.
+
+    Attributes:
+        path: The absolute path of the file.
+        number: 1 for the first content seen in this process, then one more per change.
+        data: The file's bytes.
+        digest: The sha256 of `data`.
+        previous: The version this one replaced (only kept one step back), so a view
+            can be updated from the previous version's instead of built from scratch.
+    """
+    __slots__ = ("path", "number", "data", "digest", "previous", "_views", "_lock")
+
+    def __init__(self, path: str, number: int, data: bytes, digest: str,
+                 previous: "FileVersion" = None, views: dict = None):
+        self.path = path
+        self.number = number
+        self.data = data
+        self.digest = digest
+        self.previous = previous
+        self._views = dict(views or {})
+        self._lock = threading.RLock()
+
+    def view(self, name: str, build):
+        """
+        Returns the view `name` of this version, calling `build(version)` to make it
+        the first time it is asked for. Views are shared: treat them as read-only.
+        """
+        view = self._views.get(name, _MISSING)
+        if view is _MISSING:
+            with self._lock:
+                view = self._views.get(name, _MISSING)
+                if view is _MISSING:
+                    view = self._views[name] = build(self)
+        return view
+
+    def built(self, name: str):
+        """
+        Returns the view `name` if something already built it, else None.
+        """
+        view = self._views.get(name, _MISSING)
+        return None if view is _MISSING else view
+
+    def adopt(self, name: str, view):
+        # A view someone built for identical content (e.g., a patched stylesheet's rules)
+        with self._lock:
+            self._views.setdefault(name, view)
+
+    def text(self) -> str:
+        return self.view("text", lambda version: version.data.decode('utf-8'))
+
+    def dom(self):
+        """
+        The BeautifulSoup tree of an HTML file, shared by every tool reading this version.
+        """
+        def build(version):
+            from bs4 import BeautifulSoup
+            return BeautifulSoup(version.text(), "html.parser")
+        return self.view("dom", build)
+
+    def __repr__(self):
+        return f"FileVersion({os.path.basename(self.path)!r} #{self.number}, {self.digest[:12]})"
+
+
+class WorldSnapshot:
+    """
+    A consistent set of file versions: {absolute path: FileVersion}.
+    """
+    __slots__ = ("versions",)
+
+    def __init__(self, versions: dict):
+        self.versions = types.MappingProxyType(dict(versions))
+
+    def __getitem__(self, path: str) -> FileVersion:
+        return self.versions[os.path.abspath(path)]
+
+    def get(self, path: str, default=None):
+        return self.versions.get(os.path.abspath(path), default)
+
+    def __iter__(self):
+        return iter(self.versions)
+
+    def __len__(self):
+        return len(self.versions)
+
+    def fingerprint(self) -> str:
+        """
+        A content hash of the snapshot's files, by file name.
+        """
+        combined = hashlib.sha256()
+        for name, digest in sorted((os.path.basename(path), version.digest)
+                                   for path, version in self.versions.items()):
+            combined.update(f"{name}\0{digest}\n".encode('utf-8'))
+        return combined.hexdigest()
+
+
+# --- 3. The World Files ---
+
+# Versions kept per file, so going back to recent content (a rollback) reuses its views
+KEEP_VERSIONS = 3
+
+
+class WorldFiles:
+    """
+    The current version of every file the tools read, kept up to date by a FileWatcher.
+
+    Lookups don't take the publishing lock: they read the current version and, in
+    inotify mode, only go to disk after the watcher saw the file change (their
+    counters have a lock of their own). Publishing a new version takes a short lock,
+    and never waits for a view being built on an old one.
+    """
+
+    def __init__(self, watcher: FileWatcher = None):
+        self.watcher = watcher or FileWatcher()
+        self._versions = {}     # path -> its current FileVersion
+        self._recent = {}       # path -> its last KEEP_VERSIONS versions, oldest first
+        self._numbers = {}      # path -> the number of its last version
+        self._listings = {}     # directory -> the names of the world files in it
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self.generation = 0
+        self.disk_reads = 0
+        self.unchanged_reads = 0
+        self.watcher_hits = 0
+
+    def current(self, path: str) -> FileVersion:
+        """
+        Returns the current version of `path`, reading it only if it changed.
+        Raises OSError if the file can't be read.
+        """
+        key = os.path.abspath(path)
+        version = self._versions.get(key)
+        if version is not None and not self.watcher.needs_check(key):
+            with self._count_lock:
+                self.watcher_hits += 1
+            return version
+
+        # The content decides whether it changed, never the file's stat
+        self.watcher.begin_check(key)
+        with open(key, 'rb') as f:
+            data = f.read()
+        installed = self._install(key, data)
+        with self._count_lock:
+            self.disk_reads += 1
+            self.unchanged_reads += installed is version
+        return installed
+
+    def publish(self, path: str, data: bytes, views: dict = None) -> FileVersion:
+        """
+        Records `data` as the new version of `path` right after we wrote it (under the
+        file's write lock), so the next lookup doesn't read it back.
+
+        Args:
+            views: Views already built for `data` (e.g., {"stylesheet": ...}).
+        """
+        key = os.path.abspath(path)
+        self.watcher.begin_check(key)
+        return self._install(key, data, views)
+
+    def _install(self, key: str, data: bytes, views: dict = None) -> FileVersion:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            current = self._versions.get(key)
+            if current is not None and current.digest == digest:
+                # Touched, or written back unchanged
+                for name, view in (views or {}).items():
+                    current.adopt(name, view)
+                return current
+            recent = self._recent.setdefault(key, [])
+            for earlier in recent:
+                if earlier.digest == digest:
+                    views = {**earlier._views, **(views or {})}
+                    break
+            number = self._numbers[key] = self._numbers.get(key, 0) + 1
+            version = FileVersion(key, number, data, digest, current, views)
+            if current is not None:
+                current.previous = None
+            recent.append(version)
+            del recent[:-KEEP_VERSIONS]
+            self._versions[key] = version
+            self.generation += 1
+        return version
+
+    def snapshot(self, paths) -> WorldSnapshot:
+        """
+        The current versions of `paths` (files that don't exist are left out).
+        """
+        versions = {}
+        for path in paths:
+            try:
+                version = self.current(path)
+            except OSError:
+                continue
+            versions[version.path] = version
+        return WorldSnapshot(versions)
+
+    def snapshot_dir(self, directory: str) -> WorldSnapshot:
+        """
+        The current versions of the files in `directory`, skipping hidden and .lock files.
+        """
+        key = os.path.abspath(directory)
+        names = self._listings.get(key)
+        if names is None or self.watcher.listing_changed(key):
+            self.watcher.begin_listing(key)
+            try:
+                names = [name for name in sorted(os.listdir(key))
+                         if not name.startswith(".") and not name.endswith(".lock")
+                         and os.path.isfile(os.path.join(key, name))]
+            except OSError:
+                names = []
+            self._listings[key] = names
+        return self.snapshot(os.path.join(key, name) for name in names)
+
+    def forget(self, path: str = None):
+        """
+        Drops the versions of `path` (or of every file), so the next lookup reads it again.
+        """
+        with self._lock:
+            if path is None:
+                self._versions.clear()
+                self._recent.clear()
+                self._listings.clear()
+                self.watcher.reset()
+            else:
+                key = os.path.abspath(path)
+                self._versions.pop(key, None)
+                self._recent.pop(key, None)
+                self.watcher.reset(key)
+
+    def stats(self) -> dict:
+        """
+        Returns the watcher mode and how often lookups were answered without a read.
+        """
+        with self._lock, self._count_lock:
+            return {
+                "mode": self.watcher.mode,
+                "files": len(self._versions),
+                "generation": self.generation,
+                "disk_reads": self.disk_reads,
+                "unchanged_reads": self.unchanged_reads,
+                "watcher_hits": self.watcher_hits,
+            }
+
+
+# The single shared instance used by all tools in this process.
+world_files = WorldFiles()